@@ -1,12 +1,173 @@
-from flask import Flask, render_template
+from flask import Flask, Response, abort, jsonify, render_template, request, send_file
+from pathlib import Path
 import argparse
+import gzip
+import json
+import os
+import queue
+import shutil
+import tempfile
+
+from core.live import LiveHub, decode_payload
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 app = Flask(__name__)
 
+data_dir = Path(app.root_path) / 'data'
+
+# 允许通过/data访问的文件
+served_files = ['complex_graph.json', 'complex_graph_dedup.json', 'graph.json', 'tree.json']
+
+# 按优先级排列的预压缩格式：Content-Encoding -> 文件后缀
+encodings = [('br', '.br'), ('gzip', '.gz')]
+
+# 训练任务推送的实时数据，只保存在内存中
+live_hub = LiveHub()
+
+# 没有新的step时发送注释行的间隔（秒），防止代理断开空闲连接
+keepalive_interval = 15
+
+
+def _write_atomic(path: Path, write) -> None:
+    # 先写到同目录的临时文件再替换，并发请求不会读到写了一半的文件
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def precompress(path: Path) -> None:
+    """
+    为json文件生成.gz和.br（安装了brotli时）版本，源文件未变化时跳过
+    """
+    mtime = path.stat().st_mtime
+    gz_path = path.with_name(path.name + '.gz')
+    if not gz_path.exists() or gz_path.stat().st_mtime < mtime:
+        def write_gz(f):
+            with open(path, 'rb') as src, gzip.GzipFile(fileobj=f, mode='wb', compresslevel=9) as dst:
+                shutil.copyfileobj(src, dst)
+        _write_atomic(gz_path, write_gz)
+    br_path = path.with_name(path.name + '.br')
+    if brotli is not None and (not br_path.exists() or br_path.stat().st_mtime < mtime):
+        _write_atomic(br_path, lambda f: f.write(brotli.compress(path.read_bytes(), quality=11)))
+
+
+def accepted_encodings(header: str) -> dict:
+    """
+    解析Accept-Encoding，返回编码 -> q值，如"br;q=0.5, gzip, *;q=0" -> {"br": 0.5, "gzip": 1.0, "*": 0.0}
+    """
+    accepted = {}
+    for item in header.split(','):
+        name, *params = [part.strip() for part in item.split(';')]
+        if not name:
+            continue
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[name.lower()] = q
+    return accepted
+
+
+def list_captures():
+    captures = []
+    for folder in sorted(p for p in data_dir.iterdir() if p.is_dir()):
+        files = {name: (folder / name).stat().st_size for name in served_files if (folder / name).exists()}
+        if 'complex_graph.json' in files or 'complex_graph_dedup.json' in files:
+            captures.append({
+                "name": folder.name,
+                "files": files,
+                "mtime": max((folder / name).stat().st_mtime for name in files),
+            })
+    return captures
+
+
 @app.route('/')
 def index():
     return render_template('index.html')
 
+@app.route('/api/captures')
+def captures():
+    return jsonify(list_captures())
+
+@app.route('/data/<name>/<filename>')
+def capture_file(name, filename):
+    if filename not in served_files or name not in {c["name"] for c in list_captures()}:
+        abort(404)
+    path = data_dir / name / filename
+    if not path.exists():
+        abort(404)
+    precompress(path)
+
+    # 选择浏览器支持的预压缩版本，ETag、条件请求和Range由send_file处理
+    accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+    # q值高的优先，q值相同时按encodings的顺序
+    for encoding, suffix in sorted(encodings, key=lambda e: -accepted.get(e[0], accepted.get('*', 0.0))):
+        encoded_path = path.with_name(path.name + suffix)
+        if accepted.get(encoding, accepted.get('*', 0.0)) > 0 and encoded_path.exists():
+            response = send_file(encoded_path, mimetype='application/json', conditional=True, etag=True, max_age=0)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_file(path, mimetype='application/json', conditional=True, etag=True, max_age=0)
+    # 浏览器缓存后每次用ETag重新校验，文件未变化时返回304
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+@app.route('/api/live')
+def live_runs():
+    return jsonify(live_hub.runs())
+
+@app.route('/api/live/<name>', methods=['POST'])
+def live_publish(name):
+    # 训练任务每步推送一次，见core.live.LiveStream
+    try:
+        payload = decode_payload(request.get_data(), request.headers.get('Content-Encoding'))
+    except (ValueError, OSError) as e:
+        abort(400, description=str(e))
+    needs_graph = live_hub.publish(name, payload)
+    return jsonify({"needs_graph": needs_graph})
+
+@app.route('/api/live/<name>/graph')
+def live_graph(name):
+    graph = live_hub.graph(name)
+    if graph is None:
+        abort(404)
+    return jsonify(graph)
+
+@app.route('/api/live/<name>/events')
+def live_events(name):
+    # server-sent events：连接时先发送保存的最近若干步，之后每步一个step事件
+    subscriber, state = live_hub.subscribe(name)
+
+    def stream():
+        try:
+            yield f"event: snapshot\ndata: {json.dumps(state)}\n\n"
+            while True:
+                try:
+                    event, data = subscriber.get(timeout=keepalive_interval)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event}\ndata: {data}\n\n"
+        finally:
+            live_hub.unsubscribe(name, subscriber)
+
+    return Response(stream(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 if __name__ == '__main__':
     # app.run(debug=True)
     parser = argparse.ArgumentParser(description="ip")
@@ -15,4 +176,10 @@ if __name__ == '__main__':
 
     args = parser.parse_args()
 
-    app.run(host=args.ip, port=5000, debug=True)
+    # 启动时预先生成压缩版本
+    for capture in list_captures():
+        for filename in capture["files"]:
+            precompress(data_dir / capture["name"] / filename)
+
+    # 实时模式下每个浏览器连接占用一个线程
+    app.run(host=args.ip, port=5000, debug=True, threaded=True)
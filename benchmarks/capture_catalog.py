@@ -0,0 +1,46 @@
+# 对比GPT2采集的加载开销：手动上传（整个文件读入浏览器） vs 服务端预压缩 + ETag缓存
+# 运行方式：python -m benchmarks.capture_catalog --model=GPT2
+import argparse
+import json
+import time
+
+from app import app, data_dir
+
+
+def measure(client, path: str, headers: dict) -> tuple:
+    start = time.perf_counter()
+    response = client.get(path, headers=headers)
+    body = response.get_data()
+    return response.status_code, len(body), (time.perf_counter() - start) * 1000, response.headers
+
+
+def main(model: str = 'GPT2'):
+    raw_path = data_dir / model / 'complex_graph.json'
+
+    # 改动前：每次访问都由用户选择文件，浏览器读入并解析整个文件
+    start = time.perf_counter()
+    raw = raw_path.read_bytes()
+    json.loads(raw)
+    print(f"{'upload (before)':>24}: {len(raw):>10} bytes, {(time.perf_counter() - start) * 1000:8.1f} ms read+parse")
+
+    client = app.test_client()
+    url = f'/data/{model}/complex_graph.json'
+    for name, encoding in [('identity', 'identity'), ('gzip', 'gzip'), ('br', 'br, gzip')]:
+        status, size, elapsed, headers = measure(client, url, {'Accept-Encoding': encoding})
+        print(f"{name + ' first fetch':>24}: {size:>10} bytes, {elapsed:8.1f} ms, status {status}, encoding {headers.get('Content-Encoding', 'identity')}")
+        etag = headers.get('ETag')
+        status, size, elapsed, _ = measure(client, url, {'Accept-Encoding': encoding, 'If-None-Match': etag})
+        print(f"{name + ' revalidate':>24}: {size:>10} bytes, {elapsed:8.1f} ms, status {status}")
+
+    status, size, elapsed, _ = measure(client, url, {'Accept-Encoding': 'gzip', 'Range': 'bytes=0-65535'})
+    print(f"{'gzip range 64KiB':>24}: {size:>10} bytes, {elapsed:8.1f} ms, status {status}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="capture catalog load benchmark")
+
+    parser.add_argument("--model", type=str, default='GPT2', help="capture name under ./data", required=False)
+
+    args = parser.parse_args()
+
+    main(args.model)
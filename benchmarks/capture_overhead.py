@@ -0,0 +1,131 @@
+# 采集开销：在CPU上对DNN和ResNet示例分别打开profiler选项的各种组合，统计每步耗时的膨胀、提取耗时和输出大小
+# 运行方式：python -m benchmarks.capture_overhead --models DNN ResNet --steps=10
+import argparse
+import itertools
+import json
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import torch
+import torch.profiler as profiler
+
+from hijack_function.hijack_profiler import capture, capture_presets, capture_trace_handler
+
+option_names = ["record_shapes", "with_stack", "profile_memory", "with_flops"]
+
+
+def make_step(model_name: str) -> Callable[[], None]:
+    """
+    用示例中的模型、优化器和训练步骤在CPU上构造一步训练，测量的就是用户实际采集的代码
+    """
+    if model_name == "DNN":
+        from examples.DNN import model as example
+    elif model_name == "ResNet":
+        from examples.ResNet import model as example
+    else:
+        raise ValueError(f"unknown model {model_name}, expected DNN or ResNet")
+    device = torch.device("cpu")
+    model, criterion, optimizer = example.build(device)
+    return lambda: example.train_step(model, criterion, optimizer, device)
+
+
+def time_steps(step: Callable[[], None], steps: int, prof: Optional[profiler.profile] = None) -> List[float]:
+    times: List[float] = []
+    for _ in range(steps):
+        start = time.perf_counter()
+        step()
+        times.append(time.perf_counter() - start)
+        if prof is not None:
+            prof.step()
+    return times
+
+
+def run(model_name: str, options: Dict[str, bool], steps: int, out_dir: str) -> Dict:
+    """
+    预热一步后采集steps步（profiler的active阶段），返回每步耗时、trace处理耗时（构建MemoryProfile+提取+写出）和输出大小
+    """
+    step = make_step(model_name)
+    time_steps(step, 2)
+    result: Dict = {"model": model_name, "options": options}
+    handler_time: List[float] = []
+
+    def trace_handler(prof: profiler.profile) -> None:
+        start = time.perf_counter()
+        try:
+            capture_trace_handler(prof)
+        except Exception as e:
+            # 缺少提取需要的信息（如没有record_shapes）时MemoryProfile可能无法构建
+            result["error"] = f"{type(e).__name__}: {e}"
+        handler_time.append(time.perf_counter() - start)
+
+    name = "_".join(k for k, v in options.items() if v) or "none"
+    # CPU上运行，保留cpu上的tensor，否则graph.json为空
+    with capture(f"{model_name}_{name}", out_dir, devices=["*"]) as c:
+        prof = profiler.profile(
+            activities=[profiler.ProfilerActivity.CPU],
+            schedule=profiler.schedule(wait=0, warmup=1, active=steps, repeat=1),
+            on_trace_ready=trace_handler,
+            **options,
+        )
+        with prof:
+            times = time_steps(step, steps + 1, prof)[1:]
+    result["step_time"] = statistics.median(times)
+    result["handler_time"] = sum(handler_time)
+    result["extract_time"] = c.extract_time
+    result["output_size"] = c.output_size
+    graph_path = c.folder_path / "graph.json"
+    if "error" not in result:
+        graph_data = json.loads(graph_path.read_text())
+        result["ops"] = len(graph_data)
+        result["edges"] = sum(len(op["in_edges"]) + len(op["out_edges"]) for op in graph_data)
+        result["modules"] = sum(1 for n in json.loads((c.folder_path / "tree.json").read_text()) if not n["is_leaf"])
+        # 没有op的graph.json说明缺少提取需要的选项，此时的提取耗时没有意义
+        if not graph_data:
+            result["error"] = "empty graph.json"
+    return result
+
+
+def main(models: List[str], steps: int, out: Optional[str]) -> None:
+    torch.set_num_threads(1)
+    results: List[Dict] = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for model_name in models:
+            # 不开profiler时的每步耗时作为基准
+            step = make_step(model_name)
+            time_steps(step, 2)
+            baseline = statistics.median(time_steps(step, steps))
+            print(f"{model_name}: baseline {baseline * 1000:.1f} ms per step (median of {steps})")
+            print(f"{'options':<52}{'step ms':>9}{'inflation':>11}{'handler ms':>12}{'extract ms':>12}{'output KB':>11}{'ops':>7}{'edges':>7}{'modules':>9}  preset")
+            for values in itertools.product([False, True], repeat=len(option_names)):
+                options = dict(zip(option_names, values))
+                result = run(model_name, options, steps, tmp_dir)
+                result["baseline_step_time"] = baseline
+                result["inflation"] = result["step_time"] / baseline - 1
+                result["preset"] = next((p for p, o in capture_presets.items() if o == options), None)
+                results.append(result)
+                label = ",".join(k for k, v in options.items() if v) or "(profiler only)"
+                if "error" in result:
+                    detail = f'{"-":>12}{"-":>11}{"-":>7}{"-":>7}{"-":>9}  {result["error"][:60]}'
+                else:
+                    detail = (f'{result["extract_time"] * 1000:>12.1f}{result["output_size"] / 1e3:>11.1f}{result["ops"]:>7}{result["edges"]:>7}'
+                              f'{result["modules"]:>9}  {result["preset"] or ""}')
+                print(f'{label:<52}{result["step_time"] * 1000:>9.1f}{result["inflation"] * 100:>10.0f}%{result["handler_time"] * 1000:>12.1f}' + detail)
+
+    if out:
+        Path(out).write_text(json.dumps(results, indent=4))
+        print(f"Generated {out}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="measure what each profiler option and the extraction cost per captured step")
+
+    parser.add_argument("--models", type=str, nargs="+", default=["DNN", "ResNet"], choices=["DNN", "ResNet"], help="examples to run on CPU", required=False)
+    parser.add_argument("--steps", type=int, default=10, help="number of profiled steps per combination, step time is their median", required=False)
+    parser.add_argument("--out", type=str, default=None, help="also write all results to this json file", required=False)
+
+    args = parser.parse_args()
+
+    main(args.models, args.steps, args.out)
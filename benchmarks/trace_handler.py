@@ -0,0 +1,77 @@
+# 对比两种on_trace_ready的耗时：export_memory_timeline（构建完整内存时间线并导出html） vs capture_trace_handler（只构建MemoryProfile）
+# 运行方式：python -m benchmarks.trace_handler --repeat=5
+import argparse
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+import torch
+import torch.nn as nn
+import torch.optim as optim
+import torch.profiler as profiler
+
+from examples.DNN.model import TwoLayerNet
+from hijack_function.hijack_profiler import capture_trace_handler
+
+
+def run_once(timings: Dict[str, List[float]]) -> None:
+    model = TwoLayerNet()
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.SGD(model.parameters(), lr=0.1)
+    batch_size = 10
+
+    def trace_handler(prof: torch.profiler.profile):
+        # 同一份采集结果分别交给两种handler处理
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            start = time.perf_counter()
+            prof.export_memory_timeline(os.path.join(tmp_dir, "prof_result.html"), device="cpu")
+            timings["export_memory_timeline"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        capture_trace_handler(prof)
+        timings["capture_trace_handler"].append(time.perf_counter() - start)
+
+    prof = profiler.profile(
+        activities=[profiler.ProfilerActivity.CPU],
+        schedule=profiler.schedule(wait=0, warmup=2, active=1, repeat=1),
+        on_trace_ready=trace_handler,
+        record_shapes=True,
+        with_stack=True,
+        profile_memory=True,
+    )
+
+    with prof:
+        for _ in range(3):
+            images = torch.rand(batch_size, 1, 28, 28)
+            labels = torch.randint(0, 10, (batch_size,))
+
+            outputs = model(images)
+            loss = criterion(outputs, labels)
+
+            loss.backward()
+            optimizer.step()
+            optimizer.zero_grad(set_to_none=True)
+
+            prof.step()
+
+
+def main(repeat: int = 5):
+    timings: Dict[str, List[float]] = {"export_memory_timeline": [], "capture_trace_handler": []}
+    for _ in range(repeat):
+        run_once(timings)
+
+    for name, values in timings.items():
+        print(f"{name:>24}: mean {sum(values) / len(values) * 1000:.1f} ms, min {min(values) * 1000:.1f} ms per captured step")
+    saved = sum(timings["export_memory_timeline"]) / repeat - sum(timings["capture_trace_handler"]) / repeat
+    print(f"{'saved':>24}: {saved * 1000:.1f} ms per captured step")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="trace handler benchmark")
+
+    parser.add_argument("--repeat", type=int, default=5, help="number of captured steps", required=False)
+
+    args = parser.parse_args()
+
+    main(args.repeat)
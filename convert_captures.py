@@ -0,0 +1,50 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from core.batch import convert_capture, expand_capture_dirs, output_formats, summarize_timings
+
+
+def main(patterns, outputs, jobs) -> int:
+    capture_dirs = expand_capture_dirs(patterns)
+    if not capture_dirs:
+        print(f"No captures found in {patterns}")
+        return 1
+
+    wall_start = time.perf_counter()
+    results = []
+    if jobs <= 1 or len(capture_dirs) == 1:
+        for capture_dir in capture_dirs:
+            results.append(convert_capture(capture_dir, outputs))
+            print(f"[{len(results)}/{len(capture_dirs)}] {capture_dir}")
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(capture_dirs))) as executor:
+            futures = [executor.submit(convert_capture, capture_dir, outputs) for capture_dir in capture_dirs]
+            for future in as_completed(futures):
+                results.append(future.result())
+                print(f"[{len(results)}/{len(capture_dirs)}] {results[-1]['capture']}")
+    wall_time = time.perf_counter() - wall_start
+
+    failures = [r for r in results if r["error"] is not None]
+    for r in failures:
+        print(f"FAILED: {r['capture']}: {r['error']}")
+
+    print(f"{'stage':<10}{'count':>8}{'total(s)':>12}{'mean(s)':>12}{'max(s)':>12}  slowest")
+    for row in summarize_timings(results):
+        print(f'{row["stage"]:<10}{row["count"]:>8}{row["total"]:>12.3f}{row["mean"]:>12.3f}{row["max"]:>12.3f}  {row["slowest"]}')
+    print(f"Converted {len(results) - len(failures)}/{len(results)} captures in {wall_time:.2f}s with {jobs} jobs")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="convert many captures to complex graph json/dot/png/svg in parallel, without importing torch")
+
+    parser.add_argument("captures", type=str, nargs="+", help="capture dirs or glob patterns, e.g. './data/*'")
+    parser.add_argument("--outputs", type=str, nargs="+", default=["json"], choices=output_formats, help="outputs to generate", required=False)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="number of worker processes", required=False)
+
+    args = parser.parse_args()
+
+    sys.exit(main(args.captures, args.outputs, args.jobs))
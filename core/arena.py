@@ -0,0 +1,140 @@
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+
+from core.capture import MemoryTimeline, collect_tensors, get_storage_key
+
+lifetime_modes = ["allocation", "usage"]
+
+
+def collect_lifetimes(graph_data: List[Dict], device: Optional[str] = None, lifetime: str = "allocation") -> Tuple[List[Dict], int]:
+    """
+    收集需要放入arena的临时tensor（按存储去重）及其生命周期[start, end)
+
+    allocation: profiler记录的申请到释放
+    usage: 第一个生产者op开始到最后一个消费者op结束（没有生产者的从第一个消费者开始），即理想的释放时机
+
+    采集前已存在且采集结束时仍未释放的tensor（参数、优化器状态等）不放入arena，单独计为常驻内存；
+    只有一端未知的tensor（如反向中产生、采集结束时仍存在的梯度）把未知的一端延伸到采集的开始或结束
+
+    :return: ([{"key", "size", "start_time", "end_time"}], 常驻字节数)
+    """
+    tensors = collect_tensors(graph_data)
+    first_use: Dict[str, int] = {}
+    last_use: Dict[str, int] = {}
+    if lifetime == "usage":
+        for op in graph_data:
+            for tensor in op["out_edges"] + op["in_edges"]:
+                key = get_storage_key(tensor)
+                first_use[key] = min(first_use.get(key, op["start_time"]), op["start_time"])
+                last_use[key] = max(last_use.get(key, op["end_time"]), op["end_time"])
+
+    op_times = [op["start_time"] for op in graph_data] + [op["end_time"] for op in graph_data]
+    begin, horizon = min(op_times, default=0), max(op_times, default=0) + 1
+
+    transient: List[Dict] = []
+    persistent = 0
+    for key, tensor in tensors.items():
+        if device is not None and tensor["device"] != device:
+            continue
+        if tensor["start_time"] == -1 and tensor["end_time"] == -1:
+            persistent += tensor["size"]
+            continue
+        if lifetime == "usage":
+            start, end = first_use[key], last_use[key]
+        else:
+            start, end = tensor["start_time"], tensor["end_time"]
+        start = begin if tensor["start_time"] == -1 else start
+        end = horizon if tensor["end_time"] == -1 else end
+        transient.append({"key": key, "size": tensor["size"], "start_time": start, "end_time": max(end, start + 1)})
+    return transient, persistent
+
+
+def _aligned(size: int, alignment: int) -> int:
+    return (size + alignment - 1) // alignment * alignment
+
+
+def _place(blocks: List[Dict], order: List[int], alignment: int, best_fit: bool) -> Tuple[List[int], int]:
+    """
+    按order依次为每个tensor选择偏移：在与它生命周期重叠的已放置tensor之间找空隙，
+    best_fit时取能放下的最小空隙，否则取最低的空隙，都放不下时放在最高处之上
+
+    :return: (每个tensor的偏移, arena大小)
+    """
+    offsets = [-1] * len(blocks)
+    # 已放置的tensor按开始时间排序，只检查开始时间早于当前tensor结束时间的
+    placed: List[Tuple[int, int]] = []
+    arena = 0
+    for i in order:
+        block = blocks[i]
+        size = _aligned(block["size"], alignment)
+        overlapping = sorted(
+            (offsets[j], offsets[j] + _aligned(blocks[j]["size"], alignment))
+            for _, j in placed[:bisect_left(placed, (block["end_time"], -1))]
+            if block["start_time"] < blocks[j]["end_time"]
+        )
+        best_offset, best_gap = None, None
+        cursor = 0
+        for low, high in overlapping:
+            gap = low - cursor
+            if gap >= size and (best_gap is None or (best_fit and gap < best_gap)):
+                best_offset, best_gap = cursor, gap
+                if not best_fit:
+                    break
+            cursor = max(cursor, high)
+        if best_offset is None:
+            best_offset = cursor
+        offsets[i] = best_offset
+        arena = max(arena, best_offset + size)
+        insort(placed, (block["start_time"], i))
+    return offsets, arena
+
+
+def plan_arena(graph_data: List[Dict], device: Optional[str] = None, lifetime: str = "allocation", alignment: int = 512) -> Dict:
+    """
+    把所有临时tensor按生命周期打包到一块arena中，给出每个tensor的偏移
+
+    两种策略取较小的结果：
+    best_fit_by_size: 按大小从大到小放置，每次选能放下的最小空隙（大tensor先占位，小tensor填缝）
+    first_fit_by_start: 按申请时间顺序放置，每次选最低的空隙，即区间图的贪心着色
+
+    下界为临时tensor同时存活字节数的最大值，任何偏移分配都不能更小；arena与下界之差就是碎片。
+    observed_peak为按profiler记录的申请/释放时间得到的全部tensor的峰值（含常驻内存），不包括缓存分配器预留但未使用的内存
+
+    :param alignment: 每个tensor的大小按该字节数对齐，默认与CUDA缓存分配器的512字节粒度一致
+    :return: {"arena_size", "lower_bound", "observed_peak", "persistent_bytes", "fragmentation", "strategies", "allocations", ...}
+    """
+    if lifetime not in lifetime_modes:
+        raise ValueError(f"unknown lifetime {lifetime}, expected one of {lifetime_modes}")
+    blocks, persistent = collect_lifetimes(graph_data, device, lifetime)
+
+    aligned = {b["key"]: {"size": _aligned(b["size"], alignment), "start_time": b["start_time"], "end_time": b["end_time"], "device": None}
+               for b in blocks}
+    lower_bound = MemoryTimeline(aligned).peak() if blocks else 0
+    observed_peak = MemoryTimeline(collect_tensors(graph_data), device).peak()
+
+    strategies = {
+        "best_fit_by_size": (sorted(range(len(blocks)), key=lambda i: (-blocks[i]["size"], blocks[i]["start_time"] - blocks[i]["end_time"])), True),
+        "first_fit_by_start": (sorted(range(len(blocks)), key=lambda i: (blocks[i]["start_time"], -blocks[i]["size"])), False),
+    }
+    results: Dict[str, Tuple[List[int], int]] = {name: _place(blocks, order, alignment, best_fit)
+                                                 for name, (order, best_fit) in strategies.items()}
+    strategy = min(results, key=lambda name: results[name][1])
+    offsets, arena_size = results[strategy]
+
+    allocations = [dict(block, offset=offset) for block, offset in zip(blocks, offsets)]
+    allocations.sort(key=lambda a: (a["offset"], a["start_time"]))
+    return {
+        "device": device,
+        "lifetime": lifetime,
+        "alignment": alignment,
+        "num_tensors": len(blocks),
+        "persistent_bytes": persistent,
+        "observed_peak": observed_peak,
+        "lower_bound": lower_bound,
+        "arena_size": arena_size,
+        "planned_peak": arena_size + persistent,
+        "fragmentation": arena_size / lower_bound - 1 if lower_bound else 0.0,
+        "strategies": {name: size for name, (_, size) in results.items()},
+        "strategy": strategy,
+        "allocations": allocations,
+    }
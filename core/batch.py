@@ -0,0 +1,127 @@
+import copy
+import glob
+import json
+import subprocess
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from core.capture import load_capture
+from core.extractor import DeviceFilter, ModuleFilter, read_manifest, rebuild_from_snapshot, snapshot_file
+from core.json_to_complex_dot import json_to_complex_dot
+from core.json_to_complex_json import json_to_complex_json
+from core.structural_hash import dedup_complex_json
+from core.validate import stamp_complex_json
+
+output_formats = ["json", "dedup", "dot", "png", "svg"]
+
+# 汇总时各阶段的显示顺序
+stages = ["snapshot", "load", "convert", "validate", "write", "dedup", "dot", "render"]
+
+
+def expand_capture_dirs(patterns: List[str]) -> List[str]:
+    """
+    展开目录或glob模式，只保留包含graph.json/tree.json或快照的采集目录，去重并保持顺序
+    """
+    result: List[str] = []
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)) or [pattern]:
+            folder = Path(path)
+            if not ((folder / 'graph.json').exists() and (folder / 'tree.json').exists()) and not (folder / snapshot_file).exists():
+                continue
+            if str(folder) not in result:
+                result.append(str(folder))
+    return result
+
+
+def convert_capture(capture_dir: str, outputs: List[str]) -> Dict:
+    """
+    转换一个采集目录，只依赖core，可在进程池中运行
+
+    快照比graph.json/tree.json新（提取器版本变化）时先从快照重新提取
+
+    :param outputs: output_formats中的若干项，png/svg会先生成complex_graph.dot
+    :return: {"capture", "timings": 阶段 -> 秒, "outputs": 生成的文件, "error"}
+    """
+    folder_path = Path(capture_dir)
+    timings: Dict[str, float] = {}
+    generated: List[str] = []
+    result = {"capture": capture_dir, "timings": timings, "outputs": generated, "error": None}
+
+    def stage(name: str, start: float) -> float:
+        now = time.perf_counter()
+        timings[name] = timings.get(name, 0.0) + now - start
+        return now
+
+    try:
+        t = time.perf_counter()
+        if (folder_path / snapshot_file).exists():
+            # 沿用采集时的过滤条件，只在提取器版本变化时重新提取
+            manifest = read_manifest(folder_path)
+            rebuild_from_snapshot(folder_path, ModuleFilter(manifest.get("include"), manifest.get("exclude")),
+                                  device_filter=DeviceFilter(manifest.get("devices")))
+            t = stage("snapshot", t)
+
+        graph_data, tree_data = load_capture(capture_dir)
+        t = stage("load", t)
+
+        # json_to_complex_json会修改tree_data，生成dot时使用副本
+        needs_dot = any(f in outputs for f in ["dot", "png", "svg"])
+        dot_inputs = copy.deepcopy((graph_data, tree_data)) if needs_dot else None
+
+        if "json" in outputs or "dedup" in outputs:
+            json_content = json_to_complex_json(graph_data, tree_data)
+            t = stage("convert", t)
+            stamped_content = stamp_complex_json(json_content)
+            t = stage("validate", t)
+            if "json" in outputs:
+                with open(folder_path / 'complex_graph.json', 'w') as f:
+                    json.dump(stamped_content, f, indent=4)
+                generated.append('complex_graph.json')
+                t = stage("write", t)
+            if "dedup" in outputs:
+                dedup_content = dedup_complex_json(json_content)
+                dedup_content.update({k: v for k, v in stamped_content.items() if k != "nodes"})
+                with open(folder_path / 'complex_graph_dedup.json', 'w') as f:
+                    json.dump(dedup_content, f)
+                generated.append('complex_graph_dedup.json')
+                t = stage("dedup", t)
+
+        if needs_dot:
+            with open(folder_path / 'complex_graph.dot', 'w') as f:
+                f.write(json_to_complex_dot(*dot_inputs))
+            generated.append('complex_graph.dot')
+            t = stage("dot", t)
+            for fmt in ["png", "svg"]:
+                if fmt in outputs:
+                    subprocess.run(['dot', f'-T{fmt}', str(folder_path / 'complex_graph.dot'), '-o', str(folder_path / f'complex_graph.{fmt}')],
+                                   check=True, capture_output=True)
+                    generated.append(f'complex_graph.{fmt}')
+                    t = stage("render", t)
+    except Exception as e:
+        # 单个采集失败不影响其他采集，汇总时统一报告
+        result["error"] = f"{type(e).__name__}: {e}"
+
+    return result
+
+
+def summarize_timings(results: List[Dict]) -> List[Dict]:
+    """
+    按阶段汇总耗时：执行次数、总耗时、平均、最大及最慢的采集
+    """
+    summary: List[Dict] = []
+    for name in stages:
+        samples = [(r["timings"][name], r["capture"]) for r in results if name in r["timings"]]
+        if not samples:
+            continue
+        total = sum(s for s, _ in samples)
+        slowest = max(samples)
+        summary.append({
+            "stage": name,
+            "count": len(samples),
+            "total": total,
+            "mean": total / len(samples),
+            "max": slowest[0],
+            "slowest": slowest[1],
+        })
+    return summary
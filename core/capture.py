@@ -0,0 +1,147 @@
+import json
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+scope_root_names = {
+    "forward": "[forward]",
+    "backward": "[backward]",
+    "postprocess": "[postprocess]",
+}
+
+
+def load_capture(capture_dir: str) -> Tuple[List[Dict], List[Dict]]:
+    """
+    读取一次采集的结果目录（包含graph.json和tree.json）
+
+    :param capture_dir: 采集目录，如./data/ResNet
+    :return: (graph_data, tree_data)
+    """
+    folder_path = Path(capture_dir)
+    with open(folder_path / 'graph.json', 'r') as graph_json_file, open(folder_path / 'tree.json', 'r') as tree_json_file:
+        return json.load(graph_json_file), json.load(tree_json_file)
+
+
+def iter_json_array(path: str, chunk_size: int = 1 << 20) -> Iterator[Dict]:
+    """
+    逐个读取json数组文件（如graph.json）中的元素，内存占用与单个元素大小相关，而不是整个文件
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r') as f:
+        buffer = ""
+        started = False
+        eof = False
+        while True:
+            pos = 0
+            while True:
+                # 跳过空白和分隔符
+                while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                    pos += 1
+                if not started and pos < len(buffer):
+                    if buffer[pos] != "[":
+                        raise ValueError(f"{path} is not a json array")
+                    started = True
+                    pos += 1
+                    continue
+                if pos < len(buffer) and buffer[pos] == "]":
+                    return
+                try:
+                    item, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    break
+                yield item
+                pos = end
+            buffer = buffer[pos:]
+            if eof:
+                return
+            chunk = f.read(chunk_size)
+            eof = chunk == ""
+            buffer += chunk
+
+
+def get_storage_key(tensor: Dict) -> str:
+    # 同一块内存的不同version共享存储，统计内存时只按id和device区分
+    return f'{tensor["id"]}_{tensor["device"]}'
+
+
+def collect_tensors(graph_data: List[Dict]) -> Dict[str, Dict]:
+    """
+    对graph.json中的tensor按存储去重，返回storage_key -> tensor（取第一次出现的记录）
+    """
+    tensors: Dict[str, Dict] = {}
+    for node in graph_data:
+        for tensor in node["in_edges"] + node["out_edges"]:
+            tensors.setdefault(get_storage_key(tensor), tensor)
+    return tensors
+
+
+def build_node_paths(tree_data: List[Dict]) -> Dict[int, str]:
+    """
+    为tree.json中的每个节点计算稳定的路径，用于在两次采集之间匹配节点
+
+    路径以"[forward]"/"[backward]"/"[postprocess]"为根，每一段为"name#k"，
+    k表示同一父节点下同名节点按时间顺序出现的次数，这样重复调用的module或op也能一一对应
+    """
+    node_map: Dict[int, Dict] = {n["id"]: n for n in tree_data}
+    paths: Dict[int, str] = {}
+
+    def visit(children: List[int], parent_path: str) -> None:
+        counter: Dict[str, int] = {}
+        for child_id in children:
+            node = node_map[child_id]
+            k = counter.get(node["name"], 0)
+            counter[node["name"]] = k + 1
+            path = f'{parent_path}/{node["name"]}#{k}'
+            paths[child_id] = path
+            visit(node["children"], path)
+
+    roots_by_scope: Dict[str, List[int]] = {}
+    for node in tree_data:
+        if node["parent"] is None:
+            roots_by_scope.setdefault(node["scope"], []).append(node["id"])
+    for scope, roots in roots_by_scope.items():
+        visit(roots, scope_root_names.get(scope, f"[{scope}]"))
+
+    return paths
+
+
+class MemoryTimeline:
+    """
+    根据tensor的申请、释放时间构建的内存占用曲线
+
+    start_time为-1表示采集前已存在，end_time为-1表示采集结束时仍未释放
+    """
+    def __init__(self, tensors: Dict[str, Dict], device: Optional[str] = None) -> None:
+        self.base = 0
+        deltas: Dict[int, int] = {}
+        for tensor in tensors.values():
+            if device is not None and tensor["device"] != device:
+                continue
+            if tensor["start_time"] == -1:
+                self.base += tensor["size"]
+            else:
+                deltas[tensor["start_time"]] = deltas.get(tensor["start_time"], 0) + tensor["size"]
+            if tensor["end_time"] != -1:
+                deltas[tensor["end_time"]] = deltas.get(tensor["end_time"], 0) - tensor["size"]
+
+        self.times: List[int] = sorted(deltas)
+        self.live: List[int] = []
+        current = self.base
+        for t in self.times:
+            current += deltas[t]
+            self.live.append(current)
+
+    def live_at(self, time: int) -> int:
+        idx = bisect_right(self.times, time)
+        return self.live[idx - 1] if idx > 0 else self.base
+
+    def peak(self) -> int:
+        return max(self.live, default=self.base)
+
+    def peak_between(self, start_time: int, end_time: int) -> int:
+        # 窗口起点的占用，加上窗口内每个事件之后的占用，取最大值
+        lo = bisect_left(self.times, start_time)
+        hi = bisect_right(self.times, end_time)
+        return max([self.live_at(start_time)] + self.live[lo:hi])
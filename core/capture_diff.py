@@ -0,0 +1,313 @@
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Tuple
+
+from core.capture import MemoryTimeline, build_node_paths, collect_tensors, scope_root_names
+
+metric_names = ["duration", "op_time", "peak_memory", "tensor_bytes"]
+
+
+def _node_metrics(graph_data: List[Dict], tree_data: List[Dict]) -> Dict[str, Dict]:
+    """
+    计算tree中每个节点（module或op）的指标，以节点路径为key
+
+    duration为节点自身的起止时间差（包括op之间的空隙），op_time为节点（子树）内所有op的耗时之和，
+    peak_memory为节点时间窗口内的最大内存占用，tensor_bytes为节点（子树）内所有op产生的输出tensor字节数
+    """
+    paths = build_node_paths(tree_data)
+    node_map: Dict[int, Dict] = {n["id"]: n for n in tree_data}
+    op_out_bytes: Dict[int, int] = {
+        n["id"]: sum(t["size"] for t in n["out_edges"]) for n in graph_data
+    }
+    timeline = MemoryTimeline(collect_tensors(graph_data))
+
+    metrics: Dict[str, Dict] = {}
+
+    # 后序遍历累加子树的tensor字节数和op耗时
+    def visit(node_id: int) -> Tuple[int, int]:
+        node = node_map[node_id]
+        tensor_bytes = op_out_bytes.get(node_id, 0)
+        op_time = node["end_time"] - node["start_time"] if node["is_leaf"] else 0
+        for child_id in node["children"]:
+            child_bytes, child_time = visit(child_id)
+            tensor_bytes += child_bytes
+            op_time += child_time
+        metrics[paths[node_id]] = {
+            "name": node["name"],
+            "is_leaf": node["is_leaf"],
+            "duration": node["end_time"] - node["start_time"],
+            "op_time": op_time,
+            "peak_memory": timeline.peak_between(node["start_time"], node["end_time"]),
+            "tensor_bytes": tensor_bytes,
+        }
+        return tensor_bytes, op_time
+
+    # [forward]等虚拟根节点由同一scope的所有根节点汇总得到
+    scope_roots: Dict[str, List[Dict]] = {}
+    for node in tree_data:
+        if node["parent"] is None:
+            scope_roots.setdefault(node["scope"], []).append(node)
+    for scope, roots in scope_roots.items():
+        totals = [visit(node["id"]) for node in roots]
+        start_time = min(node["start_time"] for node in roots)
+        end_time = max(node["end_time"] for node in roots)
+        metrics[scope_root_names.get(scope, f"[{scope}]")] = {
+            "name": scope_root_names.get(scope, f"[{scope}]"),
+            "is_leaf": False,
+            "duration": end_time - start_time,
+            "op_time": sum(op_time for _, op_time in totals),
+            "peak_memory": timeline.peak_between(start_time, end_time),
+            "tensor_bytes": sum(tensor_bytes for tensor_bytes, _ in totals),
+        }
+    return metrics
+
+
+def _summary(graph_data: List[Dict]) -> Dict:
+    start_time = min((n["start_time"] for n in graph_data), default=0)
+    end_time = max((n["end_time"] for n in graph_data), default=0)
+    return {
+        "duration": end_time - start_time,
+        "op_time": sum(n["end_time"] - n["start_time"] for n in graph_data),
+        "peak_memory": MemoryTimeline(collect_tensors(graph_data)).peak(),
+        "tensor_bytes": sum(t["size"] for n in graph_data for t in n["out_edges"]),
+    }
+
+
+def _delta(base: Optional[Dict], new: Optional[Dict], keys: List[str]) -> Dict:
+    """
+    新旧指标的差值和相对变化，旧值为0时相对变化为None（是否从0增长看差值）
+    """
+    delta: Dict = {}
+    for key in keys:
+        base_value = base[key] if base is not None else 0
+        new_value = new[key] if new is not None else 0
+        delta[key] = new_value - base_value
+        delta[f"{key}_ratio"] = (new_value - base_value) / base_value if base_value else None
+    return delta
+
+
+def align_node_paths(base_tree: List[Dict], new_tree: List[Dict]) -> Dict[str, str]:
+    """
+    对齐两次采集的tree，返回旧路径 -> 新路径
+
+    同一父节点下的子节点按名字序列求最长公共子序列（difflib）进行匹配，再递归匹配已对齐节点的子节点。
+    只按路径中的出现次数k匹配时，插入或删除一个op会使其后所有同名op错位，对齐后只有真正增删的节点不匹配
+    """
+    mapping: Dict[str, str] = {}
+
+    def children_by_path(tree_data: List[Dict]) -> Dict[str, List[Tuple[str, str]]]:
+        # 节点路径 -> [(子节点名, 子节点路径)]，[forward]等虚拟根节点的子节点为该scope的根节点
+        paths = build_node_paths(tree_data)
+        node_map: Dict[int, Dict] = {n["id"]: n for n in tree_data}
+        children: Dict[str, List[Tuple[str, str]]] = {}
+        for node in tree_data:
+            if node["parent"] is None:
+                root = scope_root_names.get(node["scope"], f'[{node["scope"]}]')
+                children.setdefault(root, []).append((node["name"], paths[node["id"]]))
+            children[paths[node["id"]]] = [(node_map[c]["name"], paths[c]) for c in node["children"]]
+        return children
+
+    base_children = children_by_path(base_tree)
+    new_children = children_by_path(new_tree)
+    pending = [(root, root) for root in base_children if "/" not in root and root in new_children]
+    while pending:
+        base_path, new_path = pending.pop()
+        mapping[base_path] = new_path
+        base_items = base_children.get(base_path, [])
+        new_items = new_children.get(new_path, [])
+        matcher = SequenceMatcher(None, [name for name, _ in base_items], [name for name, _ in new_items], autojunk=False)
+        for i, j, size in matcher.get_matching_blocks():
+            for k in range(size):
+                pending.append((base_items[i + k][1], new_items[j + k][1]))
+    return mapping
+
+
+def diff_captures(base_graph: List[Dict], base_tree: List[Dict],
+                  new_graph: List[Dict], new_tree: List[Dict]) -> Dict:
+    """
+    对比两次采集，按module路径对齐节点（见align_node_paths），给出每个module、每个op的差异
+
+    :return: {"summary": ..., "modules": [...], "ops": [...]}，
+             每条记录的status为matched/added/removed，path为新采集中的路径（removed为旧采集中的路径），
+             base_path为旧采集中的路径
+    """
+    base_metrics = _node_metrics(base_graph, base_tree)
+    new_metrics = _node_metrics(new_graph, new_tree)
+    base_to_new = align_node_paths(base_tree, new_tree)
+    new_to_base = {new_path: base_path for base_path, new_path in base_to_new.items()}
+
+    modules: List[Dict] = []
+    ops: List[Dict] = []
+    # 先按新采集的顺序输出，再补充只在旧采集中出现的节点
+    pairs: List[Tuple[Optional[str], Optional[str]]] = [(new_to_base.get(p), p) for p in new_metrics]
+    pairs += [(p, None) for p in base_metrics if p not in base_to_new]
+    for base_path, new_path in pairs:
+        base = base_metrics.get(base_path) if base_path is not None else None
+        new = new_metrics.get(new_path) if new_path is not None else None
+        record = {
+            "path": new_path if new_path is not None else base_path,
+            "base_path": base_path,
+            "name": (new or base)["name"],
+            "status": "matched" if base and new else ("added" if new else "removed"),
+            "base": {k: base[k] for k in metric_names} if base else None,
+            "new": {k: new[k] for k in metric_names} if new else None,
+            "delta": _delta(base, new, metric_names),
+        }
+        (ops if (new or base)["is_leaf"] else modules).append(record)
+
+    base_summary = _summary(base_graph)
+    new_summary = _summary(new_graph)
+    return {
+        "summary": {
+            "base": base_summary,
+            "new": new_summary,
+            "delta": _delta(base_summary, new_summary, list(base_summary)),
+        },
+        "modules": modules,
+        "ops": ops,
+    }
+
+
+def _exceeds(delta: Dict, key: str, limit: float) -> Optional[str]:
+    """
+    相对增长超过limit时返回描述；旧值为0而新值大于0时（从无到有）总是视为超出
+    """
+    ratio = delta.get(f"{key}_ratio")
+    if ratio is None:
+        return f"{key} grew from 0 by {delta[key]}" if delta.get(key, 0) > 0 else None
+    return f"{key} increased by {ratio:.2%} (limit {limit:.2%})" if ratio > limit else None
+
+
+def check_regressions(report: Dict, thresholds: Dict[str, float],
+                      per_module: bool = False, min_module_duration: int = 0) -> List[str]:
+    """
+    检查差异是否超过阈值
+
+    :param thresholds: 指标名 -> 允许的最大相对增长，如{"op_time": 0.1}。duration为step的起止时间差，
+                       op之间的空隙占比大时op变慢对它影响很小，检查计算变慢应使用op_time
+    :param per_module: 是否同时检查每个module，以及新增的module和op（从无到有）
+    :param min_module_duration: 检查module时忽略耗时低于该值(ns)的module和op，避免噪声
+    :return: 超出阈值的描述列表，为空表示通过
+    """
+    violations: List[str] = []
+    summary_delta = report["summary"]["delta"]
+    for key, limit in thresholds.items():
+        violation = _exceeds(summary_delta, key, limit)
+        if violation is not None:
+            violations.append(f"step {violation}")
+
+    if per_module:
+        for record in report["modules"]:
+            if record["status"] != "matched" or record["base"]["duration"] < min_module_duration:
+                continue
+            for key, limit in thresholds.items():
+                violation = _exceeds(record["delta"], key, limit)
+                if violation is not None:
+                    violations.append(f"{record['path']} {violation}")
+        # 新增的module和op没有旧值，无法按比例比较，直接列出
+        for record in report["modules"] + report["ops"]:
+            if record["status"] == "added" and record["new"]["duration"] >= min_module_duration:
+                violations.append(f"{record['path']} was added ({record['new']['duration']}ns)")
+    return violations
+
+
+def _complex_node_paths(complex_nodes: List[Dict]) -> Dict[int, str]:
+    # 与build_node_paths规则一致：complex_graph的根节点即[forward]等虚拟节点
+    node_map: Dict[int, Dict] = {n["id"]: n for n in complex_nodes}
+    paths: Dict[int, str] = {}
+
+    def visit(children: List[int], parent_path: str) -> None:
+        counter: Dict[str, int] = {}
+        for child_id in children:
+            node = node_map[child_id]
+            if node["isTensor"]:
+                continue
+            k = counter.get(node["label"], 0)
+            counter[node["label"]] = k + 1
+            path = f'{parent_path}/{node["label"]}#{k}'
+            paths[child_id] = path
+            visit(node["children"], path)
+
+    for node in complex_nodes:
+        if node["parent"] is None and not node["isTensor"]:
+            paths[node["id"]] = node["label"]
+            visit(node["children"], node["label"])
+    return paths
+
+
+def _diff_color(record: Optional[Dict], metric: str, tolerance: float) -> str:
+    if record is None or record["status"] == "added":
+        return "khaki"
+    ratio = record["delta"].get(f"{metric}_ratio")
+    if ratio is None or abs(ratio) <= tolerance:
+        return "white"
+    # 变化越大颜色越深
+    level = min(int(abs(ratio) / tolerance) - 1, 4)
+    reds = ["#fde0dd", "#fcbba1", "#fc9272", "#fb6a4a", "#de2d26"]
+    greens = ["#e5f5e0", "#c7e9c0", "#a1d99b", "#74c476", "#31a354"]
+    return reds[level] if ratio > 0 else greens[level]
+
+
+def annotate_complex_json(complex_nodes: List[Dict], report: Dict) -> List[Dict]:
+    """
+    将差异结果写入新采集的complex_graph节点的diff字段，供可视化使用
+    """
+    records: Dict[str, Dict] = {r["path"]: r for r in report["modules"] + report["ops"] if r["status"] != "removed"}
+    paths = _complex_node_paths(complex_nodes)
+    for node in complex_nodes:
+        record = records.get(paths.get(node["id"], ""))
+        if record is not None:
+            node["diff"] = {"status": record["status"], "delta": record["delta"]}
+    return complex_nodes
+
+
+def complex_json_to_diff_dot(complex_nodes: List[Dict], report: Dict,
+                             metric: str = "duration", tolerance: float = 0.05) -> str:
+    """
+    生成按差异着色的complex graph：变慢/变大为红色，变快/变小为绿色，新增节点为黄色
+    """
+    records: Dict[str, Dict] = {r["path"]: r for r in report["modules"] + report["ops"] if r["status"] != "removed"}
+    paths = _complex_node_paths(complex_nodes)
+    node_map: Dict[int, Dict] = {n["id"]: n for n in complex_nodes}
+
+    def label_of(node: Dict) -> str:
+        record = records.get(paths.get(node["id"], ""))
+        label = node["label"]
+        if record is not None and record["delta"].get(f"{metric}_ratio") is not None:
+            label += f'\\n{metric} {record["delta"][f"{metric}_ratio"]:+.1%}'
+        return label.replace('"', '\\"')
+
+    def dfs(children: List[int], depth: int) -> List[str]:
+        sub_dot_lines: List[str] = []
+        for node_id in children:
+            node = node_map[node_id]
+            if node["isTensor"]:
+                sub_dot_lines.append(f'{"    "*depth}"{node_id}" [label="{label_of(node)}", shape=ellipse];')
+                continue
+            color = _diff_color(records.get(paths.get(node_id, "")), metric, tolerance)
+            if node["isLeaf"]:
+                sub_dot_lines.append(f'{"    "*depth}"{node_id}" [label="{label_of(node)}", shape=box, style=filled, fillcolor="{color}"];')
+            else:
+                sub_dot_lines.append(f'{"    "*depth}subgraph cluster_{node_id} {{')
+                sub_dot_lines.append(f'{"    "*(depth+1)}label="{label_of(node)}";')
+                sub_dot_lines.append(f'{"    "*(depth+1)}style="rounded,filled";')
+                sub_dot_lines.append(f'{"    "*(depth+1)}fillcolor="{color}";')
+                sub_dot_lines.append(f'{"    "*(depth+1)}color=blue;')
+                sub_dot_lines += dfs(node["children"], depth+1)
+                sub_dot_lines.append(f'{"    "*depth}}}')
+        return sub_dot_lines
+
+    root_nodes = [n["id"] for n in complex_nodes if n["parent"] is None]
+    dot_lines = dfs(root_nodes, 1)
+    for node in complex_nodes:
+        for next_id in node["nextNodes"]:
+            dot_lines.append(f'    "{node["id"]}" -> "{next_id}";')
+
+    return "\n".join(["digraph G {", '    rankdir=LR;', '    node [fontname="Arial"];'] + dot_lines + ["}"])
+
+
+def top_changes(report: Dict, metric: str = "duration", kind: str = "ops", limit: int = 10) -> List[Tuple[str, int]]:
+    """
+    返回指定指标绝对变化最大的若干节点
+    """
+    records = sorted(report[kind], key=lambda r: abs(r["delta"][metric]), reverse=True)
+    return [(r["path"], r["delta"][metric]) for r in records[:limit]]
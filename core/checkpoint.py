@@ -0,0 +1,152 @@
+from typing import Dict, List, Optional, Set
+
+from core.capture import MemoryTimeline, build_node_paths, collect_tensors, get_storage_key
+from core.pipeline import module_prefix, subtree_op_time
+
+# 这些category的tensor不是前向产生的激活，checkpoint不会释放它们
+kept_categories = {"parameter", "optimizer_state", "gradient", "input"}
+
+
+def find_saved_activations(graph_data: List[Dict], tree_data: List[Dict]) -> Dict[int, Set[str]]:
+    """
+    找出每个前向module执行结束后仍然存活、且只在module内部被前向op使用的激活，即对该module做checkpoint后
+    可以在前向时释放、反向时重算的tensor。module的输出（被module外的前向op使用）和输入仍会保留
+
+    :return: module id -> 存储的storage_key集合
+    """
+    node_map: Dict[int, Dict] = {n["id"]: n for n in tree_data}
+    tensors = collect_tensors(graph_data)
+
+    # 先序编号，tin[a] <= tin[b] < tout[a]表示b在a的子树中
+    tin: Dict[int, int] = {}
+    tout: Dict[int, int] = {}
+    counter = 0
+    stack = [(n["id"], False) for n in tree_data if n["parent"] is None]
+    while stack:
+        node_id, visited = stack.pop()
+        if visited:
+            tout[node_id] = counter
+            continue
+        tin[node_id] = counter
+        counter += 1
+        stack.append((node_id, True))
+        stack.extend((c, False) for c in node_map[node_id]["children"])
+
+    def contains(module_id: int, node_id: int) -> bool:
+        return tin[module_id] <= tin[node_id] < tout[module_id]
+
+    producer: Dict[str, int] = {}
+    consumers: Dict[str, List[int]] = {}
+    for op in graph_data:
+        if op["id"] not in node_map or node_map[op["id"]]["scope"] != "forward":
+            continue
+        for tensor in op["out_edges"]:
+            producer.setdefault(get_storage_key(tensor), op["id"])
+        for tensor in op["in_edges"]:
+            consumers.setdefault(get_storage_key(tensor), []).append(op["id"])
+
+    saved: Dict[int, Set[str]] = {}
+    for key, op_id in producer.items():
+        tensor = tensors[key]
+        if tensor.get("category") in kept_categories:
+            continue
+        module_id = node_map[op_id]["parent"]
+        while module_id is not None:
+            module = node_map[module_id]
+            outlives = tensor["end_time"] == -1 or tensor["end_time"] > module["end_time"]
+            if outlives and all(contains(module_id, c) for c in consumers.get(key, [])):
+                saved.setdefault(module_id, set()).add(key)
+            module_id = module["parent"]
+    return saved
+
+
+def _peak_with_checkpoints(tensors: Dict[str, Dict], saved: Dict[int, Set[str]], node_map: Dict[int, Dict],
+                           chosen: List[int], device: Optional[str]) -> int:
+    # 被checkpoint的激活在module结束时释放；反向重算时一个module的激活会重新出现，峰值按最大的一份保守估计
+    truncated = dict(tensors)
+    recompute = 0
+    for module_id in chosen:
+        end_time = node_map[module_id]["end_time"]
+        size = 0
+        for key in saved[module_id]:
+            truncated[key] = dict(tensors[key], end_time=end_time)
+            if device is None or tensors[key]["device"] == device:
+                size += tensors[key]["size"]
+        recompute = max(recompute, size)
+    return MemoryTimeline(truncated, device).peak() + recompute
+
+
+def plan_checkpoints(graph_data: List[Dict], tree_data: List[Dict], budget: Optional[int] = None,
+                     device: Optional[str] = None) -> Dict:
+    """
+    选择做activation checkpoint的module，得到峰值内存与单步耗时的取舍曲线
+
+    每个候选module释放的内存来自激活的生命周期（find_saved_activations），重算代价为module子树中前向op耗时之和。
+    按释放字节数/重算耗时从高到低贪心加入，已选module的祖先被加入时替换掉它们（checkpoint不嵌套），
+    每加入一个module重新计算一次峰值，得到曲线上的一个点。给出budget时选择曲线上第一个峰值不超过budget的点，即重算最少的方案
+
+    :param budget: 峰值内存上限（字节）
+    :param device: 只统计该device上的tensor，如cuda:0
+    :return: {"base_peak", "base_step_time", "candidates", "curve", "selected"}
+    """
+    node_map: Dict[int, Dict] = {n["id"]: n for n in tree_data}
+    paths = build_node_paths(tree_data)
+    tensors = collect_tensors(graph_data)
+    saved = find_saved_activations(graph_data, tree_data)
+    op_time = subtree_op_time(tree_data)
+
+    roots = [n for n in tree_data if n["parent"] is None and n["start_time"] != -1]
+    base_step_time = max(n["end_time"] for n in roots) - min(n["start_time"] for n in roots) if roots else 0
+
+    candidates: List[Dict] = []
+    for module_id, keys in saved.items():
+        module = node_map[module_id]
+        if not module["name"].startswith(module_prefix):
+            continue
+        size = sum(tensors[k]["size"] for k in keys if device is None or tensors[k]["device"] == device)
+        if size == 0:
+            continue
+        candidates.append({
+            "id": module_id,
+            "path": paths[module_id],
+            "saved_bytes": size,
+            "recompute_time": op_time[module_id],
+        })
+    candidates.sort(key=lambda c: c["saved_bytes"] / max(c["recompute_time"], 1), reverse=True)
+
+    def ancestors(module_id: int) -> Set[int]:
+        result = set()
+        parent = node_map[module_id]["parent"]
+        while parent is not None:
+            result.add(parent)
+            parent = node_map[parent]["parent"]
+        return result
+
+    base_peak = MemoryTimeline(tensors, device).peak()
+    curve: List[Dict] = [{"modules": [], "peak": base_peak, "step_time": base_step_time, "recompute_time": 0}]
+    chosen: List[int] = []
+    for candidate in candidates:
+        module_id = candidate["id"]
+        if ancestors(module_id) & set(chosen):
+            continue
+        chosen = [c for c in chosen if module_id not in ancestors(c)] + [module_id]
+        recompute_time = sum(op_time[c] for c in chosen)
+        curve.append({
+            "modules": [paths[c] for c in chosen],
+            "peak": _peak_with_checkpoints(tensors, saved, node_map, chosen, device),
+            "step_time": base_step_time + recompute_time,
+            "recompute_time": recompute_time,
+        })
+
+    selected = None
+    if budget is not None:
+        selected = next((point for point in curve if point["peak"] <= budget), None)
+    return {
+        "budget": budget,
+        "device": device,
+        "base_peak": base_peak,
+        "base_step_time": base_step_time,
+        "candidates": candidates,
+        "curve": curve,
+        "selected": selected,
+    }
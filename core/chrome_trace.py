@@ -0,0 +1,221 @@
+import gzip
+import heapq
+import json
+from typing import Dict, IO, List, Optional, Set, Tuple
+
+from core.capture import get_storage_key, iter_json_array, scope_root_names
+
+trace_pid = 1
+trace_tid = 1
+
+
+def _us(ns: int) -> float:
+    # chrome trace的时间单位为微秒
+    return ns / 1000
+
+
+class TraceWriter:
+    """
+    流式写出chrome trace event json，每个事件写完即丢弃
+    """
+    def __init__(self, f: IO[str]) -> None:
+        self.f = f
+        self.count = 0
+        self.f.write('{"displayTimeUnit": "ns", "traceEvents": [\n')
+
+    def write(self, event: Dict) -> None:
+        if self.count:
+            self.f.write(",\n")
+        self.f.write(json.dumps(event))
+        self.count += 1
+
+    def close(self) -> None:
+        self.f.write("\n]}\n")
+
+
+def _tid(thread: Optional[int]) -> int:
+    return trace_tid if thread is None else thread
+
+
+def _write_metadata(writer: TraceWriter) -> None:
+    writer.write({"ph": "M", "name": "process_name", "pid": trace_pid, "args": {"name": "torchviz capture"}})
+
+
+def _write_thread_name(writer: TraceWriter, thread: Optional[int], scopes: Set[str]) -> None:
+    # 没有记录线程的采集只有一条ops轨道；有线程时按所含的阶段命名，如反向线程只有backward
+    name = "ops" if thread is None else f"thread {thread} ({', '.join(sorted(scopes))})"
+    writer.write({"ph": "M", "name": "thread_name", "pid": trace_pid, "tid": _tid(thread), "args": {"name": name}})
+
+
+def _write_modules(writer: TraceWriter, tree_path: str) -> None:
+    # module作为嵌套的duration slice，op由graph.json写出，这里跳过叶子节点；每个线程一条轨道
+    scope_bounds: Dict[Tuple[Optional[int], str], Tuple[int, int]] = {}
+    for node in iter_json_array(tree_path):
+        thread = node.get("thread")
+        if node["parent"] is None:
+            start, end = scope_bounds.get((thread, node["scope"]), (node["start_time"], node["end_time"]))
+            scope_bounds[(thread, node["scope"])] = (min(start, node["start_time"]), max(end, node["end_time"]))
+        if node["is_leaf"]:
+            continue
+        writer.write({
+            "ph": "X", "cat": "module", "name": node["name"],
+            "pid": trace_pid, "tid": _tid(thread),
+            "ts": _us(node["start_time"]), "dur": _us(node["end_time"] - node["start_time"]),
+            "args": {"id": node["id"], "scope": node["scope"]},
+        })
+    threads: Dict[Optional[int], Set[str]] = {}
+    for (thread, scope), (start, end) in scope_bounds.items():
+        threads.setdefault(thread, set()).add(scope)
+        writer.write({
+            "ph": "X", "cat": "scope", "name": scope_root_names.get(scope, scope),
+            "pid": trace_pid, "tid": _tid(thread), "ts": _us(start), "dur": _us(end - start),
+        })
+    for thread, scopes in threads.items():
+        _write_thread_name(writer, thread, scopes)
+
+
+def _base_memory(graph_path: str) -> Dict[str, Dict[str, int]]:
+    # 采集开始前已申请的tensor（start_time为-1）按device和category的占用，作为counter的初始值
+    base: Dict[str, Dict[str, int]] = {}
+    seen: Set[str] = set()
+    for op in iter_json_array(graph_path):
+        for tensor in op["in_edges"] + op["out_edges"]:
+            if tensor["start_time"] != -1 or get_storage_key(tensor) in seen:
+                continue
+            seen.add(get_storage_key(tensor))
+            device_base = base.setdefault(tensor["device"], {})
+            category = tensor.get("category", "unknown")
+            device_base[category] = device_base.get(category, 0) + tensor["size"]
+    return base
+
+
+class MemoryCounters:
+    """
+    每个device一条counter track，args中按category分别给出当前占用
+
+    tensor第一次出现时把申请和释放事件放入按时间排序的堆中，随op的开始时间推进依次应用，
+    每个时刻只更新变化的device并写出一个counter事件；释放后不再保留该tensor，常驻内存只有未释放的tensor
+    """
+    def __init__(self, writer: TraceWriter, base: Dict[str, Dict[str, int]]) -> None:
+        self.writer = writer
+        self.live: Dict[str, Dict[str, int]] = {device: dict(categories) for device, categories in base.items()}
+        # (时间, 序号, device, category, 变化量, 释放时为storage key)
+        self.pending: List[Tuple[int, int, str, str, int, Optional[str]]] = []
+        self.seen: Set[str] = set()
+        self.seq = 0
+        self.watermark: Optional[int] = None
+
+    def _push(self, time: int, device: str, category: str, delta: int, freed_key: Optional[str] = None) -> None:
+        self.seq += 1
+        heapq.heappush(self.pending, (time, self.seq, device, category, delta, freed_key))
+
+    def add(self, tensor: Dict) -> None:
+        key = get_storage_key(tensor)
+        # 已释放的tensor不再出现在live中，避免重复计入
+        if key in self.seen or (self.watermark is not None and tensor["end_time"] != -1 and tensor["end_time"] <= self.watermark):
+            return
+        self.seen.add(key)
+        category = tensor.get("category", "unknown")
+        if tensor["start_time"] != -1:
+            self._push(tensor["start_time"], tensor["device"], category, tensor["size"])
+        if tensor["end_time"] != -1:
+            self._push(tensor["end_time"], tensor["device"], category, -tensor["size"], key)
+
+    def _write(self, time: int, devices: Set[str]) -> None:
+        for device in sorted(devices):
+            self.writer.write({"ph": "C", "name": f"memory {device}", "pid": trace_pid, "ts": _us(time),
+                               "args": dict(self.live[device])})
+
+    def flush(self, until: Optional[int] = None) -> None:
+        """
+        应用时间不晚于until的事件，until为None时应用全部
+        """
+        if self.watermark is None:
+            if until is None and not self.pending:
+                return
+            # 第一个时刻写出初始值
+            self.watermark = until if until is not None else self.pending[0][0]
+            self._write(self.watermark, set(self.live))
+        while self.pending and (until is None or self.pending[0][0] <= until):
+            # 申请时间早于已写出的时刻时（tensor第一次出现得晚）记在已写出的时刻上
+            time = max(self.pending[0][0], self.watermark)
+            devices: Set[str] = set()
+            while self.pending and max(self.pending[0][0], self.watermark) == time:
+                _, _, device, category, delta, freed_key = heapq.heappop(self.pending)
+                device_live = self.live.setdefault(device, {})
+                device_live[category] = device_live.get(category, 0) + delta
+                devices.add(device)
+                if freed_key is not None:
+                    self.seen.discard(freed_key)
+            self.watermark = time
+            self._write(time, devices)
+
+
+def _producer_key(tensor: Dict) -> str:
+    # tensor id在释放后会被复用，加上申请时间区分不同的申请
+    return f'{tensor["id"]}_{tensor["version"]}_{tensor["device"]}_{tensor["start_time"]}'
+
+
+def export_chrome_trace(capture_dir: str, out_path: str) -> int:
+    """
+    将graph.json/tree.json导出为chrome trace event格式，可直接用Perfetto或chrome://tracing打开
+
+    module为嵌套slice，op为叶子slice，每个线程一条轨道，tensor的生产者到每个消费者为一条flow，
+    每个device的内存按category分为counter track。graph.json流式读取（先读一遍得到采集开始前已申请的内存），
+    常驻内存只有未释放的tensor及其生产者位置
+
+    :param out_path: 以.gz结尾时写出gzip压缩文件
+    :return: 写出的事件数
+    """
+    opener = gzip.open if out_path.endswith(".gz") else open
+    with opener(out_path, "wt") as f:
+        writer = TraceWriter(f)
+        _write_metadata(writer)
+        _write_modules(writer, f"{capture_dir}/tree.json")
+
+        producers: Dict[str, Tuple[float, int]] = {}
+        # (释放时间, key)，tensor释放后不会再有op读取它，op推进到释放时间之后从producers中删除
+        producer_frees: List[Tuple[int, str]] = []
+        flow_id = 0
+        memory = MemoryCounters(writer, _base_memory(f"{capture_dir}/graph.json"))
+
+        # graph.json中的op按开始时间排序，内存事件随之推进
+        for op in iter_json_array(f"{capture_dir}/graph.json"):
+            memory.flush(op["start_time"])
+            while producer_frees and producer_frees[0][0] < op["start_time"]:
+                producers.pop(heapq.heappop(producer_frees)[1], None)
+            tid = _tid(op.get("thread"))
+            writer.write({
+                "ph": "X", "cat": "op", "name": op["name"],
+                "pid": trace_pid, "tid": tid,
+                "ts": _us(op["start_time"]), "dur": _us(op["end_time"] - op["start_time"]),
+                "args": {
+                    "id": op["id"],
+                    "inputs": [t["shape"] for t in op["in_edges"]],
+                    "outputs": [t["shape"] for t in op["out_edges"]],
+                },
+            })
+
+            for tensor in op["in_edges"]:
+                key = _producer_key(tensor)
+                if key not in producers:
+                    continue
+                # flow从生产者slice结束处指向消费者slice开始处，生产者和消费者可以在不同线程
+                flow_id += 1
+                ts, producer_tid = producers[key]
+                writer.write({"ph": "s", "cat": "dataflow", "name": tensor["shape"], "id": flow_id,
+                              "pid": trace_pid, "tid": producer_tid, "ts": ts})
+                writer.write({"ph": "f", "bp": "e", "cat": "dataflow", "name": tensor["shape"], "id": flow_id,
+                              "pid": trace_pid, "tid": tid, "ts": _us(op["start_time"])})
+            for tensor in op["out_edges"]:
+                key = _producer_key(tensor)
+                producers[key] = (_us(op["end_time"]) - 0.001, tid)
+                if tensor["end_time"] != -1:
+                    heapq.heappush(producer_frees, (tensor["end_time"], key))
+
+            for tensor in op["in_edges"] + op["out_edges"]:
+                memory.add(tensor)
+
+        memory.flush()
+        writer.close()
+        return writer.count
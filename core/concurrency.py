@@ -0,0 +1,151 @@
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+from core.utilization import merge_intervals
+
+
+def _tensor_key(tensor: Dict) -> str:
+    return f'{tensor["id"]}_{tensor["version"]}_{tensor["device"]}'
+
+
+def _intersection(a: List[Tuple[int, int]], b: List[Tuple[int, int]]) -> int:
+    # 两组已合并且有序的区间的重叠总长
+    total = 0
+    i = j = 0
+    while i < len(a) and j < len(b):
+        total += max(0, min(a[i][1], b[j][1]) - max(a[i][0], b[j][0]))
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return total
+
+
+def analyze_concurrency(graph_data: List[Dict], top: int = 20) -> Dict:
+    """
+    按线程把op分成执行轨道，分析线程之间何时真正并行、何时互相等待
+
+    并行：对每个线程忙碌区间的并集做扫描，得到同时有k个线程在执行op的总时间及同时执行的时间窗口，以及每对线程的重叠时间。
+    等待：op读取了另一个线程产生的tensor，且所在线程在生产者结束前就已空闲（该op开启了一段新的忙碌区间），
+    即该线程排在另一个线程之后串行执行；等待时间为空闲开始到该op开始，交接延迟为生产者结束到该op开始。
+    op没有thread字段时所有op视为同一个线程
+
+    :param top: 列出的并行窗口和等待的个数
+    :return: {"lanes", "active_threads", "pairs", "windows", "waits"}
+    """
+    ops_by_thread: Dict[Optional[int], List[Dict]] = {}
+    for op in graph_data:
+        ops_by_thread.setdefault(op.get("thread"), []).append(op)
+    threads = sorted(ops_by_thread, key=lambda t: (t is not None, t or 0))
+    busy: Dict[Optional[int], List[Tuple[int, int]]] = {
+        t: merge_intervals([(op["start_time"], op["end_time"]) for op in ops]) for t, ops in ops_by_thread.items()
+    }
+    busy_starts = {t: [start for start, _ in intervals] for t, intervals in busy.items()}
+
+    lanes: List[Dict] = []
+    for t in threads:
+        ops = ops_by_thread[t]
+        lanes.append({
+            "thread": t,
+            "ops": len(ops),
+            "start_time": busy[t][0][0],
+            "end_time": busy[t][-1][1],
+            "busy": sum(end - start for start, end in busy[t]),
+        })
+
+    # 扫描所有线程的忙碌区间，统计同时执行的线程数
+    events: List[Tuple[int, int, Optional[int]]] = []
+    for t in threads:
+        for start, end in busy[t]:
+            events.append((start, 1, t))
+            events.append((end, -1, t))
+    events.sort(key=lambda e: (e[0], e[1]))
+    active_time: Dict[int, int] = {}
+    windows: List[Dict] = []
+    active: Dict[Optional[int], int] = {}
+    window: Optional[Dict] = None
+    last = events[0][0] if events else 0
+    for time, delta, t in events:
+        if time > last and active:
+            active_time[len(active)] = active_time.get(len(active), 0) + time - last
+        last = time
+        if delta > 0:
+            active[t] = active.get(t, 0) + 1
+        else:
+            active[t] -= 1
+            if not active[t]:
+                del active[t]
+        if len(active) >= 2 and window is None:
+            window = {"start_time": time, "threads": set(active)}
+        elif len(active) >= 2:
+            window["threads"] |= set(active)
+        elif window is not None:
+            window["end_time"] = time
+            window["duration"] = time - window["start_time"]
+            window["threads"] = sorted(window["threads"], key=lambda x: (x is not None, x or 0))
+            windows.append(window)
+            window = None
+    windows.sort(key=lambda w: w["duration"], reverse=True)
+
+    # 跨线程的数据依赖
+    producers: Dict[str, Dict] = {}
+    for op in sorted(graph_data, key=lambda op: op["start_time"]):
+        for tensor in op["out_edges"]:
+            producers.setdefault(_tensor_key(tensor), op)
+    pairs: Dict[Tuple, Dict] = {}
+
+    def pair(a: Optional[int], b: Optional[int]) -> Dict:
+        key = tuple(sorted((a, b), key=lambda x: (x is not None, x or 0)))
+        if key not in pairs:
+            pairs[key] = {"threads": list(key), "overlap": _intersection(busy[key[0]], busy[key[1]]),
+                          "dependencies": 0, "waits": 0, "wait_time": 0, "handoff_latency": 0}
+        return pairs[key]
+
+    for i, a in enumerate(threads):
+        for b in threads[i + 1:]:
+            pair(a, b)
+
+    waits: List[Dict] = []
+    for op in graph_data:
+        thread = op.get("thread")
+        # 同一个op只按最晚结束的跨线程生产者计一次等待
+        blocker: Optional[Dict] = None
+        for tensor in op["in_edges"]:
+            producer = producers.get(_tensor_key(tensor))
+            if producer is None or producer.get("thread") == thread or producer["end_time"] > op["start_time"]:
+                continue
+            pair(producer.get("thread"), thread)["dependencies"] += 1
+            if blocker is None or producer["end_time"] > blocker["end_time"]:
+                blocker = producer
+        if blocker is None:
+            continue
+        index = bisect_right(busy_starts[thread], op["start_time"]) - 1
+        if busy[thread][index][0] != op["start_time"]:
+            continue
+        idle_since = busy[thread][index - 1][1] if index > 0 else None
+        if idle_since is not None and idle_since > blocker["end_time"]:
+            continue
+        wait_time = op["start_time"] - idle_since if idle_since is not None else 0
+        record = pair(blocker.get("thread"), thread)
+        record["waits"] += 1
+        record["wait_time"] += wait_time
+        record["handoff_latency"] += op["start_time"] - blocker["end_time"]
+        waits.append({
+            "thread": thread,
+            "op": op["id"],
+            "name": op["name"],
+            "waited_for_thread": blocker.get("thread"),
+            "waited_for_op": blocker["id"],
+            "waited_for_name": blocker["name"],
+            "wait_time": wait_time,
+            "handoff_latency": op["start_time"] - blocker["end_time"],
+        })
+    waits.sort(key=lambda w: w["wait_time"], reverse=True)
+
+    return {
+        "lanes": lanes,
+        "active_threads": [{"threads": k, "time": active_time[k]} for k in sorted(active_time)],
+        "pairs": sorted(pairs.values(), key=lambda p: (p["wait_time"], p["overlap"]), reverse=True),
+        "windows": windows[:top],
+        "waits": waits[:top],
+    }
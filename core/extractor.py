@@ -0,0 +1,636 @@
+import gzip
+import json
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from core.validate import format_issues, validate_tree
+
+# 提取逻辑（graph.json/tree.json的生成规则）变化时加1，已有采集会从快照重新生成
+extractor_version = 5
+
+# 快照文件格式变化时加1，旧格式的快照无法再使用，只能重新训练采集
+snapshot_format_version = 1
+
+snapshot_file = 'snapshot.json.gz'
+manifest_file = 'manifest.json'
+
+# 快照中的事件类型
+EVENT_OTHER = 0
+EVENT_TORCH_OP = 1
+EVENT_PY_CALL = 2
+EVENT_ALLOCATION = 3
+
+# 快照中的事件标记位
+FLAG_BACKWARD_FUNCTION = 1
+FLAG_SCHEMA_MATCHED = 2
+
+# 跨设备拷贝的op，快照中记录其标量参数，non_blocking所在的参数位置
+transfer_op_args = {
+    "aten::copy_": 2,
+    "aten::_to_copy": 5,
+}
+
+
+class Event:
+    """
+    快照中的一个profiler事件，只保留提取时用到的字段
+    """
+    __slots__ = ("index", "parent", "children", "kind", "name", "start_time_ns", "end_time_ns", "flags", "thread")
+
+    def __init__(self, index: int, parent: Optional["Event"], kind: int, name: str, start_time_ns: int, end_time_ns: int, flags: int) -> None:
+        self.index = index
+        self.parent = parent
+        self.children: List["Event"] = []
+        self.kind = kind
+        self.name = name
+        self.start_time_ns = start_time_ns
+        self.end_time_ns = end_time_ns
+        self.flags = flags
+        # 事件所在的线程，子事件与根事件在同一线程；旧快照中没有记录，为None
+        self.thread: Optional[int] = parent.thread if parent is not None else None
+
+
+class Snapshot:
+    """
+    profiler原始输入的紧凑快照：事件树（及根事件所在的线程）、内存申请/释放、op输入tensor的元信息、数据流图、category和size
+
+    快照与torch无关，tensor用keys表中的下标表示，keys表每项为[id, allocation_id, ptr, device_type, device_index]，
+    与TensorKey一致，前两项和device相同即为同一个tensor
+    """
+    def __init__(self, data: Dict) -> None:
+        if data.get("format_version") != snapshot_format_version:
+            raise ValueError(f"unsupported snapshot format {data.get('format_version')}, expected {snapshot_format_version}")
+        self.data = data
+        self.keys: List[List] = data["keys"]
+        # 相等的TensorKey映射到同一个下标
+        canonical: Dict[Tuple, int] = {}
+        self.key_ids: List[int] = [canonical.setdefault((k[0], k[1], k[3], k[4]), i) for i, k in enumerate(self.keys)]
+
+        names: List[str] = data["names"]
+        # 根事件下标 -> 线程id，旧快照中没有这一项
+        threads: Dict[int, int] = {index: tid for index, tid in data.get("threads", [])}
+        self.events: List[Event] = []
+        self.roots: List[Event] = []
+        for index, (parent, kind, name, start, end, flags) in enumerate(data["events"]):
+            parent_event = self.events[parent] if parent >= 0 else None
+            event = Event(index, parent_event, kind, names[name], start, end, flags)
+            if parent_event is None:
+                event.thread = threads.get(index)
+            self.events.append(event)
+            if parent_event is None:
+                self.roots.append(event)
+            else:
+                parent_event.children.append(event)
+
+        self.op_inputs: Dict[int, List[List]] = {int(k): v for k, v in data["op_inputs"].items()}
+        # profiler开启with_flops时统计的FLOP数，旧快照中没有这一项
+        self.op_flops: Dict[int, int] = {int(k): v for k, v in data.get("op_flops", {}).items()}
+        # 拷贝op的参数，tensor参数记为None，旧快照中没有这一项
+        self.op_args: Dict[int, List] = {int(k): v for k, v in data.get("op_args", {}).items()}
+        self.allocations: List[List] = data["allocations"]
+        self.flow_nodes: List[List] = data["flow_nodes"]
+        self.categories: Dict[Tuple[int, int], Optional[str]] = {(self.key_ids[k], v): c for k, v, c in data["categories"]}
+        self.sizes: Dict[int, int] = {self.key_ids[k]: size for k, size in data["sizes"]}
+
+    def device(self, key: int) -> str:
+        # cpu没有设备序号
+        if self.keys[key][4] is None or self.keys[key][4] < 0:
+            return self.keys[key][3]
+        return f"{self.keys[key][3]}:{self.keys[key][4]}"
+
+
+def save_snapshot(data: Dict, folder_path: Path) -> Path:
+    folder_path.mkdir(parents=True, exist_ok=True)
+    path = folder_path / snapshot_file
+    with gzip.open(path, 'wt') as f:
+        json.dump(data, f, separators=(",", ":"))
+    return path
+
+
+def load_snapshot(folder_path: Path) -> Snapshot:
+    with gzip.open(folder_path / snapshot_file, 'rt') as f:
+        return Snapshot(json.load(f))
+
+
+def read_manifest(folder_path: Path) -> Dict:
+    path = folder_path / manifest_file
+    if not path.exists():
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def write_manifest(folder_path: Path, module_filter: "ModuleFilter", device_filter: Optional["DeviceFilter"] = None) -> None:
+    # 记录生成graph.json/tree.json时的提取器版本和过滤条件，用于判断是否需要从快照重新生成
+    with open(folder_path / manifest_file, 'w') as f:
+        json.dump({
+            "snapshot_format_version": snapshot_format_version,
+            "extractor_version": extractor_version,
+            "include": module_filter.include,
+            "exclude": module_filter.exclude,
+            "devices": (device_filter or DeviceFilter()).devices,
+        }, f, indent=4)
+
+
+def is_stale(folder_path: Path, module_filter: Optional["ModuleFilter"] = None, device_filter: Optional["DeviceFilter"] = None) -> bool:
+    """
+    graph.json/tree.json是否由旧版本的提取器（或不同的过滤条件）生成
+    """
+    manifest = read_manifest(folder_path)
+    if manifest.get("extractor_version") != extractor_version:
+        return True
+    if module_filter is not None and (manifest.get("include") != module_filter.include or manifest.get("exclude") != module_filter.exclude):
+        return True
+    if device_filter is not None and manifest.get("devices") != device_filter.devices:
+        return True
+    return False
+
+
+class ModuleFilter:
+    """
+    按module路径过滤采集内容，路径形如"GPT2LMHeadModel_0/GPT2Model_0/GPT2Block_3/GPT2SdpaAttention_3"
+
+    include/exclude为fnmatch模式，只要路径的某个前缀匹配即视为匹配，即选中一个module会选中其整棵子树。
+    include为空表示不限制，exclude优先于include
+    """
+    def __init__(self, include: Optional[List[str]] = None, exclude: Optional[List[str]] = None) -> None:
+        self.include = include or []
+        self.exclude = exclude or []
+
+    def is_enabled(self) -> bool:
+        return bool(self.include or self.exclude)
+
+    @staticmethod
+    def _match_any(path: str, patterns: List[str]) -> bool:
+        segments = path.split("/")
+        prefixes = ["/".join(segments[:i]) for i in range(1, len(segments) + 1)]
+        return any(fnmatch(prefix, pattern) for prefix in prefixes for pattern in patterns)
+
+    def is_excluded(self, path: str) -> bool:
+        return path != "" and self._match_any(path, self.exclude)
+
+    def match(self, path: str) -> bool:
+        if self.is_excluded(path):
+            return False
+        return not self.include or (path != "" and self._match_any(path, self.include))
+
+
+class DeviceFilter:
+    """
+    按设备过滤graph.json中的tensor，设备形如"cuda:0"、"cpu"
+
+    devices为fnmatch模式，匹配设备全名或设备类型即保留，如["*"]保留全部、["cpu", "cuda:0"]、["cuda"]；
+    为空时与之前一致，只去掉cpu上的tensor。没有保留任何tensor的op不写入graph.json
+    """
+    def __init__(self, devices: Optional[List[str]] = None) -> None:
+        self.devices = devices or []
+
+    def match(self, device: str) -> bool:
+        device_type = device.split(":")[0]
+        if not self.devices:
+            return device_type != "cpu"
+        return any(fnmatch(device, pattern) or fnmatch(device_type, pattern) for pattern in self.devices)
+
+
+def is_module(e: Event) -> bool:
+    return e.kind == EVENT_PY_CALL and "nn.Module:" in e.name
+
+
+def is_leaf(e: Event) -> bool:
+    return (e.kind == EVENT_TORCH_OP and bool(e.flags & (FLAG_BACKWARD_FUNCTION | FLAG_SCHEMA_MATCHED))) \
+        or e.kind == EVENT_ALLOCATION
+
+
+def is_tree_node(e: Event) -> bool:
+    return (e.kind == EVENT_TORCH_OP and bool(e.flags & (FLAG_BACKWARD_FUNCTION | FLAG_SCHEMA_MATCHED))) \
+        or is_module(e)
+
+
+def get_ancestors_name(e: Optional[Event]) -> Tuple[str, ...]:
+    ancestors_name: List[str] = []
+    while e:
+        if e.kind in (EVENT_TORCH_OP, EVENT_PY_CALL):
+            ancestors_name.append(e.name)
+        e = e.parent
+    return tuple(ancestors_name)
+
+
+def is_backward(e: Event) -> bool:
+    ancestors_name = get_ancestors_name(e)
+    for name in ancestors_name:
+        if "autograd::" in name:
+            return True
+    return False
+
+
+def get_scope(e: Event, backward_end_time: int) -> str:
+    if is_backward(e):
+        return "backward"
+    elif backward_end_time > 0 and e.start_time_ns > backward_end_time:
+        return "postprocess"
+    else:
+        return "forward"
+
+
+def select_events(snapshot: Snapshot, module_filter: ModuleFilter) -> Set[int]:
+    """
+    返回module路径满足过滤条件的叶子事件下标，被exclude的module子树直接跳过
+    """
+    selected: Set[int] = set()
+
+    def dfs(events: List[Event], path: str):
+        for event in events:
+            event_path = path
+            if is_module(event):
+                name = event.name.replace("nn.Module:", "").strip()
+                event_path = f"{path}/{name}" if path else name
+                if module_filter.is_excluded(event_path):
+                    continue
+            if is_leaf(event):
+                if module_filter.match(event_path):
+                    selected.add(event.index)
+            else:
+                dfs(event.children, event_path)
+
+    dfs(snapshot.roots, "")
+    return selected
+
+
+class TimeMap:
+    def __init__(self, snapshot: Snapshot) -> None:
+        # allocations按事件开始时间排序，后出现的申请/释放覆盖之前的记录
+        self._values: Dict[int, List[int]] = {}
+        for key, is_alloc, time in snapshot.allocations:
+            times = self._values.setdefault(snapshot.key_ids[key], [-1, -1])
+            times[0 if is_alloc else 1] = time
+
+    def GetStartTime(self, key: int) -> int:
+        return self._values[key][0] if key in self._values else -1
+
+    def GetEndTime(self, key: int) -> int:
+        return self._values[key][1] if key in self._values else -1
+
+
+def _subtree(event: Event) -> List[Event]:
+    # 先序遍历，与torch.profiler._utils.traverse_dfs一致
+    result: List[Event] = []
+    stack = [event]
+    while stack:
+        e = stack.pop()
+        result.append(e)
+        stack.extend(reversed(e.children))
+    return result
+
+
+class TensorInfoMap:
+    def __init__(self, snapshot: Snapshot, selected: Optional[Set[int]] = None) -> None:
+        self._shapeMap: Dict[Tuple[int, int], str] = {}
+        self._dtypeMap: Dict[Tuple[int, int], str] = {}
+        key_ids = snapshot.key_ids
+
+        for event_index, inputs, outputs in snapshot.flow_nodes:
+            # 只解析被选中的事件的tensor信息
+            if selected is not None and event_index not in selected:
+                continue
+
+            # 同一个tensor在输入中出现多个version时取最小的version，结果与遍历顺序无关
+            input_versions: Dict[int, int] = {}
+            for k, v in inputs:
+                input_versions[key_ids[k]] = min(v, input_versions.get(key_ids[k], v))
+            output_versions: Dict[int, int] = {}
+            for k, v in outputs:
+                if v != 0:
+                    output_versions[key_ids[k]] = min(v, output_versions.get(key_ids[k], v))
+
+            op_list = [e.index for e in _subtree(snapshot.events[event_index]) if e.kind == EVENT_TORCH_OP]
+            for versions, ops in ((input_versions, op_list), (output_versions, reversed(op_list))):
+                for op in ops:
+                    for k, shape, dtype in snapshot.op_inputs.get(op, ()):
+                        key = key_ids[k]
+                        if key in versions:
+                            self._shapeMap.setdefault((key, versions[key]), shape)
+                            self._dtypeMap.setdefault((key, versions[key]), dtype)
+
+    def getShape(self, key: Tuple[int, int]) -> str:
+        if key in self._shapeMap:
+            return "[" + self._shapeMap[key] + "]"
+        else:
+            return "[]"
+
+    def getDtype(self, key: Tuple[int, int]) -> str:
+        if key in self._dtypeMap:
+            return self._dtypeMap[key]
+        else:
+            return "unknown"
+
+
+def get_non_blocking(snapshot: Snapshot, event: Event) -> Optional[bool]:
+    """
+    拷贝op（及其子树中的copy_/_to_copy）的non_blocking参数，快照中没有记录时返回None
+    """
+    for e in _subtree(event):
+        args = snapshot.op_args.get(e.index)
+        position = transfer_op_args.get(e.name)
+        if args is not None and position is not None and position < len(args) and isinstance(args[position], bool):
+            return args[position]
+    return None
+
+
+def get_flops(snapshot: Snapshot, event: Event) -> Optional[int]:
+    """
+    op的FLOP数：profiler只为aten::mm、aten::addmm、aten::conv2d等算子统计，图中的op（如aten::linear、AddmmBackward0）
+    通常是它们的祖先，因此对子树求和；子树中最外层带FLOP数的算子已包含其内部，不再向下累加
+    :return: 子树中没有算子带FLOP数时返回None
+    """
+    total: Optional[int] = None
+    stack = [event]
+    while stack:
+        e = stack.pop()
+        if e.index in snapshot.op_flops:
+            total = (total or 0) + snapshot.op_flops[e.index]
+        else:
+            stack.extend(e.children)
+    return total
+
+
+def graph_to_json(
+    snapshot: Snapshot,
+    timeMap: TimeMap,
+    tensorInfoMap: TensorInfoMap,
+    node_id_map: Dict[int, int],
+    selected: Optional[Set[int]] = None,
+    device_filter: Optional[DeviceFilter] = None,
+) -> Tuple[List[Dict], List[int]]:
+    graph_id_list: List[int] = []
+    json_list: List[Dict] = []
+    key_ids = snapshot.key_ids
+    device_filter = device_filter or DeviceFilter()
+
+    # 暂时不考虑展示intermediate中间tensor，只展示输入输出tensor
+    def edge_to_dict(k: int, version: int):
+        key = key_ids[k]
+        # 默认不展示cpu上的tensor
+        if device_filter.match(snapshot.device(k)):
+            return {
+                "id": snapshot.keys[k][0],
+                "version": version,
+                "device": snapshot.device(k),
+                "shape": f"{tensorInfoMap.getShape((key, version))}",
+                "dtype": f"{tensorInfoMap.getDtype((key, version))}",
+                "size": snapshot.sizes[key],
+                "start_time": timeMap.GetStartTime(key),
+                "end_time": timeMap.GetEndTime(key),
+                "category": snapshot.categories.get((key, version)) or "unknown",
+            }
+
+    for event_index, inputs, outputs in snapshot.flow_nodes:
+        event = snapshot.events[event_index]
+        # 过滤掉Allocation节点（这些节点基本是free事件）
+        if event.kind != EVENT_TORCH_OP:
+            continue
+
+        # 过滤掉不在选中module中的节点
+        if selected is not None and event_index not in selected:
+            continue
+
+        node_dict = {}
+
+        # 没有展示绝对时间，而是使用一个递增的id，由于遍历是按时间顺序遍历，因此id顺序即为时间顺序
+        node_dict['id'] = node_id_map[event_index]
+        node_dict['name'] = event.name
+        node_dict['start_time'] = event.start_time_ns
+        node_dict['end_time'] = event.end_time_ns
+        if event.thread is not None:
+            node_dict['thread'] = event.thread
+        flops = get_flops(snapshot, event)
+        if flops is not None:
+            node_dict['flops'] = flops
+        non_blocking = get_non_blocking(snapshot, event)
+        if non_blocking is not None:
+            node_dict['non_blocking'] = non_blocking
+
+        node_dict['in_edges'] = [res for k, v in inputs if (res := edge_to_dict(k, v)) is not None]
+        node_dict['out_edges'] = [res for k, v in outputs if (res := edge_to_dict(k, v)) is not None]
+
+        # 只保留有tensor通过设备过滤的算子
+        if node_dict['in_edges'] or node_dict['out_edges']:
+            json_list.append(node_dict)
+            graph_id_list.append(node_id_map[event_index])
+
+    return json_list, graph_id_list
+
+
+class Node:
+    def __init__(self, id: int, name: str, start_time: int, end_time: int, is_leaf: bool, scope: str, parent: Optional[int] = None,
+                 thread: Optional[int] = None):
+        self.id = id
+        self.name = name
+        self.start_time = start_time
+        self.end_time = end_time
+        self.is_leaf = is_leaf
+        self.scope = scope
+        self.parent = parent
+        self.thread = thread
+        self.children = []
+
+
+def filter_tree(nodes: List[Dict], leaf_id_list: List[int], id_list: List[int]) -> List[Dict]:
+    """
+    过滤树节点：
+    1. 去除叶子节点不在id_list中的节点
+    2. 去除子树中无叶子节点的非叶节点
+
+    :param nodes: 节点列表，每个节点包含id, children, parent
+    :param leaf_id_list: 所有叶子节点的ID列表
+    :param id_list: 需要保留的叶子节点ID列表
+    :return: 过滤后的节点列表
+    """
+    # 转换为字典格式便于查找
+    node_dict = {node['id']: node for node in nodes}
+    valid_leaf_ids = set(leaf_id_list) & set(id_list)  # 需要保留的叶子节点
+    leaf_ids = set(leaf_id_list)
+
+    # 第一步：标记所有有效叶子节点的祖先路径
+    valid_nodes = set()
+
+    # 从有效叶子节点向上追溯父节点
+    for leaf_id in valid_leaf_ids:
+        current_id = leaf_id
+        while current_id in node_dict:
+            if current_id in valid_nodes:
+                break  # 已经处理过这个分支
+            valid_nodes.add(current_id)
+            current_id = node_dict[current_id].get('parent')
+
+    # 第二步：过滤节点
+    result = []
+    for node in nodes:
+        node_id = node['id']
+
+        # 如果是叶子节点且不在有效列表中，跳过
+        if node_id in leaf_ids and node_id not in valid_leaf_ids:
+            continue
+
+        # 如果是非叶子节点且不在有效路径中，跳过
+        if node_id not in leaf_ids and node_id not in valid_nodes:
+            continue
+
+        # 复制节点并过滤子节点
+        filtered_node = {
+            "id": node_id,
+            "name": node["name"],
+            "start_time": node["start_time"],
+            "end_time": node["end_time"],
+            "is_leaf": node["is_leaf"],
+            "scope": node["scope"],
+            "parent": node.get("parent"),
+            "children": [child_id for child_id in node.get("children", [])
+                    if child_id in valid_nodes],
+        }
+        if "thread" in node:
+            filtered_node["thread"] = node["thread"]
+        result.append(filtered_node)
+
+    return result
+
+
+def tree_to_json(snapshot: Snapshot, graph_id_list: List[int], node_id_map: Dict[int, int], backward_end_time: int) -> List[Dict]:
+    # 第一步：构建树，省去非module节点
+    nodes: Dict[int, Node] = {}
+    leaf_node_id_list: List[int] = []
+
+    def dfs(events: List[Event], parent_id: Optional[int]):
+        """递归处理事件树，构建节点关系"""
+        for event in events:
+            if not is_tree_node(event):
+                if not is_leaf(event):
+                    dfs(event.children, parent_id)  # 非树节点继续递归但保持父节点
+                continue
+
+            # 处理树节点
+            node_id = node_id_map[event.index]
+            nodes[node_id] = Node(
+                id=node_id,
+                name=event.name,
+                start_time=event.start_time_ns,
+                end_time=event.end_time_ns,
+                is_leaf=is_leaf(event),
+                scope=get_scope(event, backward_end_time),
+                parent=parent_id,
+                thread=event.thread,
+            )
+
+            # 更新父子关系
+            if parent_id is not None:
+                nodes[parent_id].children.append(node_id)
+
+            # 递归处理非叶节点
+            if not is_leaf(event):
+                dfs(event.children, node_id)
+            else:
+                leaf_node_id_list.append(node_id)
+
+    dfs(snapshot.roots, None)
+
+    nodes_list: List[Dict] = []
+    for _, node in nodes.items():
+        node_dict = {
+            "id": node.id,
+            "name": node.name,
+            "start_time": node.start_time,
+            "end_time": node.end_time,
+            "is_leaf": node.is_leaf,
+            "scope": node.scope,
+            "parent": node.parent,
+            "children": node.children,
+        }
+        # 每个线程的事件各自成树，子节点与父节点在同一线程
+        if node.thread is not None:
+            node_dict["thread"] = node.thread
+        nodes_list.append(node_dict)
+    filter_nodes = filter_tree(nodes_list, leaf_node_id_list, graph_id_list)
+    return filter_nodes
+
+
+def set_id(snapshot: Snapshot) -> Tuple[Dict[int, int], int]:
+    """
+    按dfs顺序为树节点分配递增id，同时求出反向节点的最晚结束时间
+
+    :return: (事件下标 -> id, backward_end_time)，均只属于本次提取
+    """
+    node_id_map: Dict[int, int] = {}
+    backward_end_time = -1
+    id = 0
+
+    def dfs(events: List[Event]):
+        nonlocal id, backward_end_time
+
+        for event in events:
+            # 存储反向节点最晚时间点，用于区分是否属于前向
+            if is_backward(event):
+                backward_end_time = max(backward_end_time, event.end_time_ns)
+
+            if is_tree_node(event):
+                node_id_map[event.index] = id
+                id += 1
+
+            # 递归处理非叶节点
+            if not is_leaf(event):
+                dfs(event.children)
+
+    dfs(snapshot.roots)
+    return node_id_map, backward_end_time
+
+
+def extract(snapshot: Snapshot, module_filter: Optional[ModuleFilter] = None, device_filter: Optional[DeviceFilter] = None) -> Tuple[List[Dict], List[Dict]]:
+    """
+    从快照中提取graph.json和tree.json的内容，所有中间状态只在本次调用内有效
+
+    :return: (graph_json, tree_json)
+    """
+    node_id_map, backward_end_time = set_id(snapshot)
+
+    # 按module过滤，在解析tensor信息和序列化之前剪枝
+    selected = None
+    if module_filter is not None and module_filter.is_enabled():
+        selected = select_events(snapshot, module_filter)
+
+    timeMap = TimeMap(snapshot)
+    tensorInfoMap = TensorInfoMap(snapshot, selected)
+    graph_json, graph_id_list = graph_to_json(snapshot, timeMap, tensorInfoMap, node_id_map, selected, device_filter)
+
+    tree_json = tree_to_json(snapshot, graph_id_list, node_id_map, backward_end_time)
+
+    # 校验树结构（反向节点的祖先都是反向、is_leaf正确），有向无环在生成complex_graph时校验
+    issues = validate_tree(tree_json)
+    if issues:
+        print(f"Invalid tree: {format_issues(issues)}")
+
+    return graph_json, tree_json
+
+
+def write_capture(folder_path: Path, graph_json: List[Dict], tree_json: List[Dict], module_filter: ModuleFilter,
+                  device_filter: Optional[DeviceFilter] = None) -> None:
+    folder_path.mkdir(parents=True, exist_ok=True)
+    with open(folder_path / 'graph.json', 'w') as f:
+        json.dump(graph_json, f, indent=4)
+    with open(folder_path / 'tree.json', 'w') as f:
+        json.dump(tree_json, f, indent=4)
+    write_manifest(folder_path, module_filter, device_filter)
+
+
+def rebuild_from_snapshot(folder_path: Path, module_filter: Optional[ModuleFilter] = None, force: bool = False,
+                          device_filter: Optional[DeviceFilter] = None) -> bool:
+    """
+    不重新训练，从快照重新生成graph.json/tree.json；提取器版本和过滤条件都未变化时跳过
+
+    :return: 是否重新生成
+    """
+    module_filter = module_filter or ModuleFilter()
+    device_filter = device_filter or DeviceFilter()
+    if not force and not is_stale(folder_path, module_filter, device_filter):
+        return False
+    graph_json, tree_json = extract(load_snapshot(folder_path), module_filter, device_filter)
+    write_capture(folder_path, graph_json, tree_json, module_filter, device_filter)
+    return True
@@ -0,0 +1,171 @@
+import json
+import math
+import random
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from core.capture import iter_json_array, scope_root_names
+
+
+def _load_tree(tree_path: str) -> Dict[int, Dict]:
+    # tree.json远小于graph.json，只保留构建调用栈需要的字段
+    tree: Dict[int, Dict] = {}
+    for node in iter_json_array(tree_path):
+        tree[node["id"]] = {
+            "name": node["name"],
+            "parent": node["parent"],
+            "scope": node["scope"],
+            "duration": node["end_time"] - node["start_time"],
+            "children": node["children"],
+        }
+    return tree
+
+
+def _stack_of(tree: Dict[int, Dict], node_id: int, cache: Dict[int, str]) -> str:
+    if node_id in cache:
+        return cache[node_id]
+    node = tree[node_id]
+    name = node["name"].replace(";", ":")
+    if node["parent"] is None:
+        stack = f'{scope_root_names.get(node["scope"], node["scope"])};{name}'
+    else:
+        stack = f'{_stack_of(tree, node["parent"], cache)};{name}'
+    cache[node_id] = stack
+    return stack
+
+
+def shape_bucket(shape: str, mode: str = "pow2") -> str:
+    """
+    将形如"[8,512,768]"的shape归入桶中
+
+    :param mode: exact保留原始shape；pow2将每一维向上取整到2的幂，使动态shape落入少数几个桶
+    """
+    if mode == "exact" or shape in ("[]", ""):
+        return shape
+    dims = []
+    for dim in shape.strip("[]").split(","):
+        value = int(dim)
+        dims.append(str(1 << math.ceil(math.log2(value))) if value > 1 else str(value))
+    return f'[{",".join(dims)}]'
+
+
+# 每个(op, shape桶)用于估计百分位的样本数上限，次数不超过该值时百分位是精确的
+reservoir_size = 1024
+
+
+def _percentile(values: List[int], q: float) -> int:
+    # nearest-rank百分位
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+class DurationStats:
+    """
+    流式统计一组耗时：次数、总和、最小值、最大值，以及固定大小的蓄水池样本（用于百分位），
+    内存不随trace长度增长
+    """
+    def __init__(self, rng: random.Random) -> None:
+        self.count = 0
+        self.total = 0
+        self.min: Optional[int] = None
+        self.max: Optional[int] = None
+        self.samples: List[int] = []
+        self._rng = rng
+
+    def add(self, duration: int) -> None:
+        self.count += 1
+        self.total += duration
+        self.min = duration if self.min is None else min(self.min, duration)
+        self.max = duration if self.max is None else max(self.max, duration)
+        # reservoir sampling：第n个值以reservoir_size/n的概率替换一个已有样本
+        if len(self.samples) < reservoir_size:
+            self.samples.append(duration)
+        else:
+            index = self._rng.randrange(self.count)
+            if index < reservoir_size:
+                self.samples[index] = duration
+
+    def percentile(self, q: float) -> int:
+        return _percentile(self.samples, q)
+
+
+def export_flamegraph(capture_dir: str, bucket_mode: str = "pow2") -> Tuple[Dict[str, int], Dict[str, int], List[Dict]]:
+    """
+    将module/op层级导出为collapsed-stack格式，并统计每个op在不同输入shape桶下的耗时
+
+    graph.json逐个op流式读取，不构建complex graph；只在内存中保留tree和聚合结果，
+    耗时按DurationStats流式聚合，op次数超过reservoir_size时p95为蓄水池样本上的估计
+
+    :return: (按self time加权的栈, 按申请字节数加权的栈, op按shape桶统计的表)
+    """
+    tree = _load_tree(f"{capture_dir}/tree.json")
+    stack_cache: Dict[int, str] = {}
+
+    # module的self time = 自身耗时 - 子节点耗时之和
+    time_stacks: Dict[str, int] = {}
+    for node_id, node in tree.items():
+        if node["children"]:
+            self_time = node["duration"] - sum(tree[c]["duration"] for c in node["children"] if c in tree)
+            if self_time > 0:
+                stack = _stack_of(tree, node_id, stack_cache)
+                time_stacks[stack] = time_stacks.get(stack, 0) + self_time
+
+    bytes_stacks: Dict[str, int] = {}
+    op_durations: Dict[Tuple[str, str], DurationStats] = {}
+    # 固定种子，同一份采集的输出可复现
+    rng = random.Random(0)
+    for op in iter_json_array(f"{capture_dir}/graph.json"):
+        duration = op["end_time"] - op["start_time"]
+        stack = _stack_of(tree, op["id"], stack_cache) if op["id"] in tree else op["name"]
+        time_stacks[stack] = time_stacks.get(stack, 0) + duration
+
+        # 申请时间落在op执行期间的输出tensor视为该op申请的内存
+        allocated = sum(
+            t["size"] for t in op["out_edges"]
+            if op["start_time"] <= t["start_time"] <= op["end_time"]
+        )
+        if allocated > 0:
+            bytes_stacks[stack] = bytes_stacks.get(stack, 0) + allocated
+
+        bucket = ";".join(shape_bucket(t["shape"], bucket_mode) for t in op["in_edges"])
+        if (op["name"], bucket) not in op_durations:
+            op_durations[(op["name"], bucket)] = DurationStats(rng)
+        op_durations[(op["name"], bucket)].add(duration)
+
+    shape_stats: List[Dict] = []
+    for (name, bucket), stats in op_durations.items():
+        shape_stats.append({
+            "name": name,
+            "input_shapes": bucket,
+            "count": stats.count,
+            "total": stats.total,
+            "mean": stats.total / stats.count,
+            "min": stats.min,
+            "max": stats.max,
+            "p95": stats.percentile(0.95),
+        })
+    shape_stats.sort(key=lambda r: r["total"], reverse=True)
+
+    return time_stacks, bytes_stacks, shape_stats
+
+
+def iter_collapsed_lines(stacks: Dict[str, int]) -> Iterator[str]:
+    for stack, weight in stacks.items():
+        if weight > 0:
+            yield f"{stack} {weight}"
+
+
+def write_collapsed(stacks: Dict[str, int], path: str) -> None:
+    with open(path, "w") as f:
+        for line in iter_collapsed_lines(stacks):
+            f.write(line + "\n")
+
+
+def write_shape_stats(shape_stats: List[Dict], path: str, limit: Optional[int] = None) -> None:
+    if path.endswith(".json"):
+        with open(path, "w") as f:
+            json.dump(shape_stats[:limit], f, indent=4)
+        return
+    with open(path, "w") as f:
+        f.write("name\tinput_shapes\tcount\ttotal\tmean\tmin\tmax\tp95\n")
+        for row in shape_stats[:limit]:
+            f.write(f'{row["name"]}\t{row["input_shapes"]}\t{row["count"]}\t{row["total"]}\t{row["mean"]:.1f}\t{row["min"]}\t{row["max"]}\t{row["p95"]}\n')
@@ -0,0 +1,330 @@
+import math
+from typing import Callable, Dict, List, Optional, Tuple
+
+from core.capture import build_node_paths
+
+dtype_sizes = {
+    "torch.float64": 8, "torch.complex64": 8, "torch.int64": 8,
+    "torch.float32": 4, "torch.int32": 4,
+    "torch.float16": 2, "torch.bfloat16": 2, "torch.int16": 2,
+    "torch.int8": 1, "torch.uint8": 1, "torch.bool": 1,
+    "torch.float8_e4m3fn": 1, "torch.float8_e5m2": 1,
+}
+
+# 只改变元信息不搬运数据的op，FLOP和访存都记为0
+view_ops = {
+    "aten::view", "aten::reshape", "aten::_unsafe_view", "aten::permute", "aten::transpose", "aten::t",
+    "aten::expand", "aten::unsqueeze", "aten::squeeze", "aten::slice", "aten::select", "aten::split",
+    "aten::as_strided", "aten::alias", "aten::detach", "aten::flatten", "aten::unflatten", "aten::is_nonzero",
+    "ViewBackward0", "UnsafeViewBackward0", "PermuteBackward0", "TransposeBackward0", "TBackward0",
+    "ExpandBackward0", "UnsqueezeBackward0", "SqueezeBackward0",
+}
+
+# 逐元素op每个输出元素的FLOP数
+elementwise_ops = {
+    "aten::add": 1, "aten::add_": 1, "aten::sub": 1, "aten::sub_": 1, "aten::rsub": 1,
+    "aten::mul": 1, "aten::mul_": 1, "aten::div": 1, "aten::div_": 1, "aten::neg": 1,
+    "aten::relu": 1, "aten::relu_": 1, "aten::threshold_backward": 1, "aten::masked_fill": 1, "aten::masked_fill_": 1,
+    "aten::where": 1, "aten::eq": 1, "aten::lt": 1, "aten::gt": 1, "aten::bitwise_not": 1, "aten::clamp": 1,
+    "aten::pow": 1, "aten::sqrt": 1, "aten::rsqrt": 1, "aten::exp": 1, "aten::log": 1,
+    "aten::tanh": 1, "aten::sigmoid": 1, "aten::silu": 4, "aten::gelu": 8,
+    "aten::dropout": 2, "aten::native_dropout": 2,
+    "aten::copy_": 0, "aten::to": 0, "aten::contiguous": 0, "aten::clone": 0, "aten::fill_": 0, "aten::zero_": 0,
+    "aten::full": 0, "aten::ones_like": 0, "aten::zeros_like": 0, "aten::arange": 0, "aten::embedding": 0,
+    "aten::_foreach_add_": 1, "aten::_foreach_mul_": 1, "aten::_foreach_div_": 1, "aten::_foreach_sqrt": 1,
+    "aten::_foreach_lerp_": 3, "aten::_foreach_addcmul_": 2, "aten::_foreach_addcdiv_": 2,
+    "torch::autograd::AccumulateGrad": 1,
+    "AddBackward0": 1, "SubBackward0": 1, "MulBackward0": 2, "DivBackward0": 3, "NegBackward0": 1,
+    "ReluBackward0": 1, "ThresholdBackward0": 1, "TanhBackward0": 2, "SigmoidBackward0": 2, "PowBackward0": 2,
+    "GeluBackward0": 8, "SiluBackward0": 6, "NativeDropoutBackward0": 2, "MaskedFillBackward0": 1,
+    "CloneBackward0": 0, "SliceBackward0": 0, "SplitBackward0": 0, "EmbeddingBackward0": 1, "ToCopyBackward0": 0,
+}
+
+# 归一化、softmax等按元素数估算的op
+normalization_ops = {
+    "aten::layer_norm": 5, "aten::native_layer_norm": 5, "aten::batch_norm": 5, "aten::group_norm": 5,
+    "aten::softmax": 5, "aten::_softmax": 5, "aten::log_softmax": 5, "aten::_log_softmax": 5,
+    "aten::cross_entropy_loss": 6,
+    "NativeLayerNormBackward0": 8, "CudnnBatchNormBackward0": 8, "NativeBatchNormBackward0": 8,
+    "SoftmaxBackward0": 4, "LogSoftmaxBackward0": 3, "NllLossBackward0": 1,
+}
+
+# 归约op每个输入元素1次FLOP
+reduction_ops = {
+    "aten::sum", "aten::mean", "aten::max", "aten::min", "aten::amax", "aten::amin", "aten::all", "aten::any",
+    "aten::norm", "aten::max_pool2d", "aten::adaptive_avg_pool2d", "aten::avg_pool2d",
+    "MeanBackward1", "SumBackward0", "MaxPool2DWithIndicesBackward0", "AdaptiveAvgPool2DBackward0",
+}
+
+matmul_ops = {"aten::mm", "aten::addmm", "aten::bmm", "aten::baddbmm", "aten::matmul", "aten::linear"}
+matmul_backward_ops = {"MmBackward0", "AddmmBackward0", "BmmBackward0", "BaddbmmBackward0"}
+conv_ops = {"aten::conv1d", "aten::conv2d", "aten::conv3d", "aten::convolution", "aten::_convolution", "aten::cudnn_convolution"}
+conv_backward_ops = {"ConvolutionBackward0", "CudnnConvolutionBackward0"}
+attention_ops = {
+    "aten::scaled_dot_product_attention", "aten::_scaled_dot_product_efficient_attention",
+    "aten::_scaled_dot_product_flash_attention", "aten::_scaled_dot_product_cudnn_attention",
+}
+attention_backward_ops = {
+    "ScaledDotProductEfficientAttentionBackward0", "ScaledDotProductFlashAttentionBackward0",
+    "ScaledDotProductCudnnAttentionBackward0",
+}
+
+
+def parse_shape(shape: str) -> Optional[List[int]]:
+    # "[]"表示shape未知
+    dims = shape.strip("[]")
+    return [int(d) for d in dims.split(",")] if dims else None
+
+
+def _numel(tensor: Dict) -> int:
+    shape = parse_shape(tensor["shape"])
+    return math.prod(shape) if shape is not None else 0
+
+
+def tensor_bytes(tensor: Dict) -> int:
+    """
+    op实际读写的字节数；shape或dtype未知时退化为整块存储的大小
+    """
+    numel = _numel(tensor)
+    if numel and tensor["dtype"] in dtype_sizes:
+        return numel * dtype_sizes[tensor["dtype"]]
+    return tensor["size"]
+
+
+def _shapes(tensors: List[Dict]) -> List[List[int]]:
+    return [s for t in tensors if (s := parse_shape(t["shape"])) is not None]
+
+
+def _matmul_k(others: List[List[int]], m: int, n: int) -> Optional[int]:
+    """
+    按shape确定矩阵乘C[M,N]=A[M,K]@B[K,N]的K，与参数的顺序无关：
+    B（或其转置、梯度）的最后两维为{K,N}，A（或其梯度）的元素数为M*K。A可能是view之前的shape（如[B,1,28,28]），只比较元素数；
+    批量矩阵乘的batch维计入M
+    """
+    for i, shape in enumerate(others):
+        if len(shape) < 2 or n not in shape[-2:]:
+            continue
+        k = shape[-2] if shape[-1] == n else shape[-1]
+        if any(j != i and math.prod(a) == m * k for j, a in enumerate(others)):
+            return k
+    return None
+
+
+def _matmul_flops(op: Dict) -> Optional[int]:
+    outputs = _shapes(op["out_edges"])
+    if not outputs or len(outputs[0]) < 2:
+        return None
+    out = outputs[0]
+    n = out[-1]
+    # 偏置等一维输入不参与匹配
+    k = _matmul_k([s for s in _shapes(op["in_edges"]) if len(s) >= 2], math.prod(out) // n, n)
+    return 2 * math.prod(out) * k if k is not None else None
+
+
+def _matmul_backward_flops(op: Dict) -> Optional[int]:
+    # 输入中有输出梯度G[M,N]和保存的A、B，每个输出的矩阵梯度（dA、dB）各一次2MNK。
+    # 不依赖输入的顺序：依次把每个输入当作G，其余输入和输出能按shape匹配出K时即确定
+    inputs = [s for s in _shapes(op["in_edges"]) if len(s) >= 2]
+    outputs = [s for s in _shapes(op["out_edges"]) if len(s) >= 2]
+    for i in reversed(range(len(inputs))):
+        grad = inputs[i]
+        n = grad[-1]
+        m = math.prod(grad) // n
+        k = _matmul_k(inputs[:i] + inputs[i + 1:] + outputs, m, n)
+        if k is None:
+            continue
+        grads = sum(1 for s in outputs if math.prod(s) == m * k or (n in s[-2:] and k in s[-2:]))
+        return 2 * m * n * k * grads
+    return None
+
+
+def _conv_weight(inputs: List[List[int]], ndim: int, out_channels: int) -> Optional[List[int]]:
+    for shape in reversed(inputs):
+        if len(shape) == ndim and shape[0] == out_channels:
+            return shape
+    return None
+
+
+def _conv_flops(op: Dict) -> Optional[int]:
+    outputs = _shapes(op["out_edges"])
+    if not outputs or len(outputs[0]) < 3:
+        return None
+    out = outputs[0]
+    weight = _conv_weight(_shapes(op["in_edges"])[1:], len(out), out[1])
+    return 2 * math.prod(out) * math.prod(weight) // out[1] if weight is not None else None
+
+
+def _conv_backward_flops(op: Dict) -> Optional[int]:
+    # 依次把每个输入当作输出梯度，其余输入中有与之维数相同、第0维为输出通道数的权重时即确定
+    inputs = _shapes(op["in_edges"])
+    grads = sum(1 for s in _shapes(op["out_edges"]) if len(s) >= 3)
+    for i in reversed(range(len(inputs))):
+        grad = inputs[i]
+        if len(grad) < 3:
+            continue
+        weight = _conv_weight(inputs[:i] + inputs[i + 1:], len(grad), grad[1])
+        if weight is not None:
+            return 2 * math.prod(grad) * math.prod(weight) // grad[1] * grads
+    return None
+
+
+def _attention_flops(op: Dict, out: List[int]) -> int:
+    # QK^T和PV各2*B*H*L*S*D，S取mask的最后一维，没有mask时视为自注意力S=L
+    seq_len = out[-2]
+    kv_len = next((s[-1] for s in _shapes(op["in_edges"]) if len(s) == 4 and s[-2] == seq_len and s[-1] != out[-1]), seq_len)
+    return 4 * math.prod(out) * kv_len
+
+
+def _attention_forward_flops(op: Dict) -> Optional[int]:
+    outputs = _shapes(op["out_edges"])
+    if not outputs or len(outputs[0]) != 4:
+        return None
+    return _attention_flops(op, outputs[0])
+
+
+def _attention_backward_flops(op: Dict) -> Optional[int]:
+    # 反向包含5次矩阵乘，约为前向的2.5倍，输出中第一个为Q的梯度
+    outputs = _shapes(op["out_edges"])
+    if not outputs or len(outputs[0]) != 4:
+        return None
+    return _attention_flops(op, outputs[0]) * 5 // 2
+
+
+def _max_numel(op: Dict, edges: List[str]) -> int:
+    return max((_numel(t) for key in edges for t in op[key]), default=0)
+
+
+def estimate_op_flops(op: Dict) -> Tuple[Optional[int], Optional[str]]:
+    """
+    估算单个op的FLOP数，graph.json中有profiler统计的flops（with_flops=True）时优先使用
+
+    :return: (flops, 来源)，没有公式时为(None, None)，有公式但无法按shape匹配出操作数时为(None, "unresolved")
+    """
+    name = op["name"]
+    if op.get("flops"):
+        return op["flops"], "profiler"
+
+    estimator: Optional[Callable[[Dict], Optional[int]]] = None
+    if name in matmul_ops:
+        estimator = _matmul_flops
+    elif name in matmul_backward_ops:
+        estimator = _matmul_backward_flops
+    elif name in conv_ops:
+        estimator = _conv_flops
+    elif name in conv_backward_ops:
+        estimator = _conv_backward_flops
+    elif name in attention_ops:
+        estimator = _attention_forward_flops
+    elif name in attention_backward_ops:
+        estimator = _attention_backward_flops
+    elif name in view_ops:
+        return 0, "formula"
+    elif name in elementwise_ops:
+        # foreach op的每个输出都参与计算
+        if name.startswith("aten::_foreach_"):
+            return elementwise_ops[name] * sum(_numel(t) for t in op["out_edges"]), "formula"
+        return elementwise_ops[name] * _max_numel(op, ["out_edges", "in_edges"]), "formula"
+    elif name in normalization_ops:
+        return normalization_ops[name] * _max_numel(op, ["in_edges"]), "formula"
+    elif name in reduction_ops:
+        return _max_numel(op, ["in_edges"]), "formula"
+
+    if estimator is None:
+        return None, None
+    flops = estimator(op)
+    return (flops, "formula") if flops is not None else (None, "unresolved")
+
+
+def estimate_op_bytes(op: Dict) -> int:
+    """
+    op读写的字节数：输入输出tensor各计一次，同一tensor的同一version只计一次
+    """
+    if op["name"] in view_ops:
+        return 0
+    seen = set()
+    total = 0
+    for tensor in op["in_edges"] + op["out_edges"]:
+        key = (tensor["id"], tensor["version"], tensor["device"])
+        if key in seen:
+            continue
+        seen.add(key)
+        total += tensor_bytes(tensor)
+    return total
+
+
+def _rates(flops: int, nbytes: int, duration: int, peak_flops: Optional[float], peak_bandwidth: Optional[float]) -> Dict:
+    record = {
+        "achieved_flops": flops / duration * 1e9 if duration > 0 else None,
+        "arithmetic_intensity": flops / nbytes if nbytes > 0 else None,
+    }
+    # roofline：算术强度高于拐点(peak_flops / peak_bandwidth)为计算受限，否则为带宽受限
+    if peak_flops and peak_bandwidth and record["arithmetic_intensity"] is not None:
+        ridge = peak_flops / peak_bandwidth
+        record["bound"] = "compute" if record["arithmetic_intensity"] >= ridge else "bandwidth"
+        roofline = min(peak_flops, record["arithmetic_intensity"] * peak_bandwidth)
+        record["roofline_efficiency"] = record["achieved_flops"] / roofline if record["achieved_flops"] is not None and roofline > 0 else None
+    return record
+
+
+def estimate_capture(graph_data: List[Dict], tree_data: List[Dict],
+                     peak_flops: Optional[float] = None, peak_bandwidth: Optional[float] = None) -> Dict:
+    """
+    估算每个op的FLOP和访存字节数，并按module汇总达到的FLOP/s和算术强度
+
+    module的耗时取其子树中op耗时之和，而不是module本身的耗时，避免把op之间的空闲算进去
+
+    :param peak_flops: 硬件峰值FLOP/s，与peak_bandwidth（字节/s）同时给出时判断计算受限还是带宽受限
+    :return: {"summary", "ops", "modules"}
+    """
+    node_map: Dict[int, Dict] = {n["id"]: n for n in tree_data}
+    paths = build_node_paths(tree_data)
+
+    ops: List[Dict] = []
+    modules: Dict[int, Dict] = {}
+    unestimated: Dict[str, int] = {}
+    unresolved: Dict[str, int] = {}
+    for op in graph_data:
+        flops, source = estimate_op_flops(op)
+        nbytes = estimate_op_bytes(op)
+        duration = op["end_time"] - op["start_time"]
+        if flops is None:
+            counts = unresolved if source == "unresolved" else unestimated
+            counts[op["name"]] = counts.get(op["name"], 0) + 1
+        record = {
+            "id": op["id"],
+            "name": op["name"],
+            "path": paths.get(op["id"], op["name"]),
+            "duration": duration,
+            "flops": flops,
+            "flops_source": source,
+            "bytes": nbytes,
+        }
+        record.update(_rates(flops or 0, nbytes, duration, peak_flops, peak_bandwidth))
+        ops.append(record)
+
+        parent = node_map[op["id"]]["parent"] if op["id"] in node_map else None
+        while parent is not None:
+            module = modules.setdefault(parent, {"op_time": 0, "flops": 0, "bytes": 0, "num_ops": 0, "unestimated_ops": 0})
+            module["op_time"] += duration
+            module["flops"] += flops or 0
+            module["bytes"] += nbytes
+            module["num_ops"] += 1
+            module["unestimated_ops"] += flops is None
+            parent = node_map[parent]["parent"]
+
+    module_records: List[Dict] = []
+    for node_id, module in modules.items():
+        record = {"id": node_id, "name": node_map[node_id]["name"], "path": paths[node_id], "scope": node_map[node_id]["scope"]}
+        record.update(module)
+        record.update(_rates(module["flops"], module["bytes"], module["op_time"], peak_flops, peak_bandwidth))
+        module_records.append(record)
+    module_records.sort(key=lambda r: r["flops"], reverse=True)
+
+    total_flops = sum(r["flops"] or 0 for r in ops)
+    total_bytes = sum(r["bytes"] for r in ops)
+    total_time = sum(r["duration"] for r in ops)
+    # 没有计入FLOP的op：unestimated为没有公式的op，unresolved为有公式但无法按shape匹配出操作数的op
+    summary = {"flops": total_flops, "bytes": total_bytes, "op_time": total_time, "unestimated": unestimated, "unresolved": unresolved}
+    summary.update(_rates(total_flops, total_bytes, total_time, peak_flops, peak_bandwidth))
+
+    return {"summary": summary, "ops": ops, "modules": module_records}
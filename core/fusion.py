@@ -0,0 +1,156 @@
+from typing import Dict, List, Set, Tuple
+
+from core.capture import build_node_paths, get_storage_key
+from core.flops import elementwise_ops, estimate_op_bytes, normalization_ops, tensor_bytes, view_ops
+
+# 可以融合进同一个kernel的op：逐元素op（不含foreach、梯度累加和只搬运/创建数据的op）和归一化op；
+# view类op不搬运数据，作为链中的连接
+fusible_ops = {
+    name for name, factor in elementwise_ops.items()
+    if factor > 0 and not name.startswith("aten::_foreach_") and name != "torch::autograd::AccumulateGrad"
+} | (set(normalization_ops) - {"aten::cross_entropy_loss", "NllLossBackward0"})
+
+
+def _tensor_key(tensor: Dict) -> str:
+    return f'{tensor["id"]}_{tensor["version"]}_{tensor["device"]}'
+
+
+def _is_fusible(op: Dict) -> bool:
+    return op["name"] in fusible_ops or op["name"] in view_ops
+
+
+def find_fusion_groups(graph_data: List[Dict], tree_data: List[Dict], min_ops: int = 2) -> Dict:
+    """
+    找出可融合的op组：同一阶段（前向/反向/参数更新）的两个可融合的op之间的tensor只有一个消费者时连成一组（并查集），
+    组内除view之外的op不少于min_ops时作为候选。前向保存给反向使用的tensor不会把前向和反向的op连在一起
+
+    融合后组内的中间tensor不再写回、读出显存，也不再申请：中间tensor指由组内op产生、
+    所有消费者（同一存储的所有version）都在组内的存储，节省的访存按一次写加一次读计算。
+    组的耗时按访存受限估算，节省的时间取组内op耗时中节省访存所占的比例
+
+    :return: {"groups", "modules"}，groups按估算节省的时间从大到小排列，modules按module汇总
+    """
+    node_map: Dict[int, Dict] = {n["id"]: n for n in tree_data}
+    paths = build_node_paths(tree_data)
+    op_map: Dict[int, Dict] = {op["id"]: op for op in graph_data}
+
+    consumers: Dict[str, List[int]] = {}
+    storage_consumers: Dict[str, Set[int]] = {}
+    for op in graph_data:
+        for tensor in op["in_edges"]:
+            consumers.setdefault(_tensor_key(tensor), []).append(op["id"])
+            storage_consumers.setdefault(get_storage_key(tensor), set()).add(op["id"])
+
+    parent = {op_id: op_id for op_id in op_map}
+
+    def scope(op_id: int) -> str:
+        return node_map[op_id]["scope"] if op_id in node_map else ""
+
+    def find(x: int) -> int:
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for op in graph_data:
+        if not _is_fusible(op):
+            continue
+        for tensor in op["out_edges"]:
+            users = consumers.get(_tensor_key(tensor), [])
+            if len(users) == 1 and users[0] != op["id"] and _is_fusible(op_map[users[0]]) and scope(users[0]) == scope(op["id"]):
+                parent[find(op["id"])] = find(users[0])
+
+    members: Dict[int, List[int]] = {}
+    for op in graph_data:
+        if _is_fusible(op):
+            members.setdefault(find(op["id"]), []).append(op["id"])
+
+    def ancestors(node_id: int) -> List[int]:
+        chain = []
+        node_id = node_map[node_id]["parent"] if node_id in node_map else None
+        while node_id is not None:
+            chain.append(node_id)
+            node_id = node_map[node_id]["parent"]
+        return chain[::-1]
+
+    groups: List[Dict] = []
+    for op_ids in members.values():
+        ops = sorted((op_map[i] for i in op_ids), key=lambda op: op["start_time"])
+        if sum(op["name"] not in view_ops for op in ops) < min_ops:
+            continue
+        inside = set(op_ids)
+        intermediates: Dict[str, Tuple[int, int]] = {}
+        for op in ops:
+            for tensor in op["out_edges"]:
+                key = get_storage_key(tensor)
+                users = storage_consumers.get(key, set())
+                if users and users <= inside and tensor["start_time"] != -1:
+                    intermediates[key] = (tensor_bytes(tensor), tensor["size"])
+        # 中间结果都要保存给反向或在组外使用时，融合省不下访存
+        if not intermediates:
+            continue
+        saved_traffic = sum(2 * nbytes for nbytes, _ in intermediates.values())
+        traffic = sum(estimate_op_bytes(op) for op in ops)
+        op_time = sum(op["end_time"] - op["start_time"] for op in ops)
+
+        # 组所在的module取所有op的最近公共祖先
+        common: List[int] = ancestors(ops[0]["id"])
+        for op in ops[1:]:
+            chain = ancestors(op["id"])
+            k = 0
+            while k < min(len(common), len(chain)) and common[k] == chain[k]:
+                k += 1
+            common = common[:k]
+        module_path = paths[common[-1]] if common else f"[{scope(ops[0]['id'])}]"
+
+        groups.append({
+            "ops": [op["id"] for op in ops],
+            "names": [op["name"] for op in ops],
+            "module": module_path,
+            "op_time": op_time,
+            "traffic": traffic,
+            "saved_traffic": saved_traffic,
+            "saved_allocations": len(intermediates),
+            "saved_allocation_bytes": sum(size for _, size in intermediates.values()),
+            "estimated_time_saved": op_time * min(saved_traffic / traffic, 1.0) if traffic else 0,
+        })
+    groups.sort(key=lambda g: (g["estimated_time_saved"], g["saved_traffic"]), reverse=True)
+    for index, group in enumerate(groups):
+        group["group"] = index
+
+    modules: Dict[str, Dict] = {}
+    for group in groups:
+        module = modules.setdefault(group["module"], {"module": group["module"], "groups": [], "saved_traffic": 0,
+                                                      "saved_allocation_bytes": 0, "estimated_time_saved": 0})
+        module["groups"].append(group["group"])
+        module["saved_traffic"] += group["saved_traffic"]
+        module["saved_allocation_bytes"] += group["saved_allocation_bytes"]
+        module["estimated_time_saved"] += group["estimated_time_saved"]
+    module_records = sorted(modules.values(), key=lambda m: (m["estimated_time_saved"], m["saved_traffic"]), reverse=True)
+
+    return {"groups": groups, "modules": module_records}
+
+
+def mark_fusion_groups(nodes: List[Dict], graph_data: List[Dict], report: Dict) -> int:
+    """
+    在complex_graph的op节点上加上"fusion"字段（组的序号），可视化时按组给op描边
+
+    complex_graph的id与graph.json不同，按(label, start_time, end_time)匹配
+
+    :return: 标出的op数
+    """
+    op_map: Dict[int, Dict] = {op["id"]: op for op in graph_data}
+    group_of: Dict[Tuple[str, int, int], int] = {}
+    for group in report["groups"]:
+        for op_id in group["ops"]:
+            op = op_map[op_id]
+            group_of[(op["name"], op["start_time"], op["end_time"])] = group["group"]
+    marked = 0
+    for node in nodes:
+        if node["isTensor"] or not node["isLeaf"]:
+            continue
+        group = group_of.get((node["label"], node["start_time"], node["end_time"]))
+        if group is not None:
+            node["fusion"] = group
+            marked += 1
+    return marked
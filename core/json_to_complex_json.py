@@ -1,5 +1,7 @@
 import json
-from typing import Dict, List
+from typing import Dict, List, Set
+
+from core.capture import MemoryTimeline, collect_tensors, get_storage_key
 
 forward_node_name = "[forward]"
 backward_node_name = "[backward]"
@@ -19,6 +21,8 @@ class TensorInfo:
         self.producer = -1
         self.comsumers = []
         self.label = f'{tensor["shape"]}'
+        self.storage_key = get_storage_key(tensor)
+        self.version = tensor["version"]
         self.start_time = tensor["start_time"]
         self.end_time = tensor["end_time"]
         self.info = {
@@ -26,6 +30,7 @@ class TensorInfo:
             "shape": tensor["shape"],
             "dtype": tensor["dtype"],
             "size": tensor["size"],
+            "category": tensor.get("category", "unknown"),
         }
 
 def is_leaf(node: Dict) -> bool:
@@ -264,5 +269,88 @@ def json_to_complex_json(graph_data: List[Dict], tree_data: List[Dict]) -> List[
             for comsumer_id in tensor_map[tensor_key].comsumers:
                 graph_nodes_map[tensor_map[tensor_key].id]["nextNodes"].append(node_map[comsumer_id]["new_id"])
 
+    # 6.自底向上汇总每个子图的统计信息
+    # 同一存储的内存只在最小version的tensor所在子图中计一次申请
+    alloc_owner: Dict[str, TensorInfo] = {}
+    for tensor_info in tensor_map.values():
+        owner = alloc_owner.get(tensor_info.storage_key)
+        if owner is None or tensor_info.version < owner.version:
+            alloc_owner[tensor_info.storage_key] = tensor_info
+    allocated_bytes = {t.id: t.info["size"] for t in alloc_owner.values() if t.start_time != -1}
+    # 内存曲线包含所有阶段的tensor，反映module执行期间真实的内存占用
+    add_rollup_stats(graph_nodes_map, allocated_bytes, MemoryTimeline(collect_tensors(graph_data)))
+
     nodes_list = [node for _, node in graph_nodes_map.items()]
     return nodes_list
+
+
+def add_rollup_stats(nodes_map: Dict[int, Dict], allocated_bytes: Dict[int, int], timeline: MemoryTimeline) -> None:
+    """
+    一次后序遍历，为每个子图节点添加stats：
+    inclusive_time: 子树中所有op的耗时之和；self_time: 直接子节点中op的耗时之和
+    op_count: 子树中的op数；bytes_allocated: 子树中申请的内存
+    peak_live_bytes: module执行期间的内存峰值
+    input_bytes/output_bytes: 从子图外流入、流出到子图外的tensor大小
+
+    :param allocated_bytes: tensor节点id -> 申请的字节数，每块存储只对应一个tensor节点
+    """
+    # 先序编号，tin[a] <= tin[b] < tout[a]表示b在a的子树中
+    tin: Dict[int, int] = {}
+    tout: Dict[int, int] = {}
+    post_order: List[int] = []
+    counter = 0
+    stack = [(node_id, False) for node_id, node in nodes_map.items() if node["parent"] is None][::-1]
+    while stack:
+        node_id, visited = stack.pop()
+        if visited:
+            tout[node_id] = counter
+            post_order.append(node_id)
+            continue
+        tin[node_id] = counter
+        counter += 1
+        stack.append((node_id, True))
+        stack.extend((child_id, False) for child_id in reversed(nodes_map[node_id]["children"]))
+
+    def contains(module_id: int, node_id: int) -> bool:
+        return tin[module_id] <= tin[node_id] < tout[module_id]
+
+    # 边界流量：tensor到消费者的边跨过的每个module，沿父节点链向上直到包含两端为止
+    input_bytes: Dict[int, int] = {}
+    output_bytes: Dict[int, int] = {}
+    for node_id, node in nodes_map.items():
+        if not node["isTensor"] or not node["nextNodes"]:
+            continue
+        size = node["info"]["size"]
+        counted: Set[int] = set()
+        for consumer_id in node["nextNodes"]:
+            module_id = nodes_map[consumer_id]["parent"]
+            while module_id is not None and module_id not in counted and not contains(module_id, node_id):
+                counted.add(module_id)
+                input_bytes[module_id] = input_bytes.get(module_id, 0) + size
+                module_id = nodes_map[module_id]["parent"]
+        module_id = node["parent"]
+        while module_id is not None and not all(contains(module_id, c) for c in node["nextNodes"]):
+            output_bytes[module_id] = output_bytes.get(module_id, 0) + size
+            module_id = nodes_map[module_id]["parent"]
+
+    for node_id in post_order:
+        node = nodes_map[node_id]
+        if node["isLeaf"]:
+            continue
+        stats = {"inclusive_time": 0, "self_time": 0, "op_count": 0, "bytes_allocated": 0}
+        for child_id in node["children"]:
+            child = nodes_map[child_id]
+            if child["isTensor"]:
+                stats["bytes_allocated"] += allocated_bytes.get(child_id, 0)
+            elif child["isLeaf"]:
+                duration = child["end_time"] - child["start_time"]
+                stats["inclusive_time"] += duration
+                stats["self_time"] += duration
+                stats["op_count"] += 1
+            else:
+                for key in ["inclusive_time", "op_count", "bytes_allocated"]:
+                    stats[key] += child["stats"][key]
+        stats["peak_live_bytes"] = timeline.peak_between(node["start_time"], node["end_time"]) if node["start_time"] != -1 else None
+        stats["input_bytes"] = input_bytes.get(node_id, 0)
+        stats["output_bytes"] = output_bytes.get(node_id, 0)
+        node["stats"] = stats
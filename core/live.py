@@ -0,0 +1,219 @@
+import gzip
+import hashlib
+import io
+import json
+import queue
+import threading
+import urllib.request
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from core.capture import MemoryTimeline, collect_tensors
+from core.json_to_complex_json import json_to_complex_json
+from core.structural_hash import compute_structural_hashes, dedup_complex_json
+from core.validate import stamp_complex_json
+
+# 服务端为每个任务保留的最近步数，浏览器连接时一次性收到这些步
+live_history = 300
+
+# 每个浏览器连接排队的事件数，浏览器跟不上时丢弃最旧的事件
+subscriber_queue_size = 64
+
+# 服务端接受的单次推送大小上限（解压后），超过时拒绝
+max_payload_bytes = 64 * 1024 * 1024
+
+
+def step_summary(graph_data: List[Dict], tree_data: List[Dict], step: int, top: int = 10) -> Dict:
+    """
+    一步的汇总：总耗时和各阶段耗时、内存峰值、耗时最多的op（按名字汇总）
+
+    :return: {"step", "step_time", "phases", "peak_memory", "num_ops", "top_ops": [[name, 耗时, 次数]]}
+    """
+    roots = [n for n in tree_data if n["parent"] is None]
+    phases: Dict[str, int] = {}
+    for scope in {n["scope"] for n in roots}:
+        nodes = [n for n in roots if n["scope"] == scope]
+        phases[scope] = max(n["end_time"] for n in nodes) - min(n["start_time"] for n in nodes)
+    op_time: Dict[str, List[int]] = {}
+    for op in graph_data:
+        record = op_time.setdefault(op["name"], [0, 0])
+        record[0] += op["end_time"] - op["start_time"]
+        record[1] += 1
+    top_ops = sorted(([name, t, count] for name, (t, count) in op_time.items()), key=lambda r: r[1], reverse=True)[:top]
+    return {
+        "step": step,
+        "step_time": max((n["end_time"] for n in roots), default=0) - min((n["start_time"] for n in roots), default=0),
+        "phases": phases,
+        "peak_memory": MemoryTimeline(collect_tensors(graph_data)).peak(),
+        "num_ops": len(graph_data),
+        "top_ops": top_ops,
+    }
+
+
+def structure_hash(nodes: List[Dict]) -> str:
+    """
+    整张complex_graph的结构哈希，与时间无关：只有模型结构或tensor的shape变化时才变化
+    """
+    hashes = compute_structural_hashes(nodes)
+    roots = [hashes[n["id"]] if n["id"] in hashes else n["label"] for n in nodes if n["parent"] is None]
+    return hashlib.sha1(json.dumps(roots).encode()).hexdigest()
+
+
+class LiveStream:
+    """
+    训练任务一侧：每步采集完成后把汇总推送到app.py的/api/live/<name>，图的结构变化时（第一步总是）附带去重后的complex_graph
+
+    转换和推送在后台线程中进行，不阻塞训练；服务端不可达或推送跟不上时丢弃最旧的步，只打印一次警告
+    """
+    def __init__(self, url: str, max_pending: int = 4, timeout: float = 10.0) -> None:
+        self.url = url
+        self.timeout = timeout
+        self._queue: "queue.Queue[Optional[Tuple[int, List[Dict], List[Dict]]]]" = queue.Queue(maxsize=max_pending)
+        self._structure_hash: Optional[str] = None
+        self._warned = False
+        self._thread = threading.Thread(target=self._run, name="live-stream", daemon=True)
+        self._thread.start()
+
+    def publish(self, step: int, graph_data: List[Dict], tree_data: List[Dict]) -> None:
+        # tree_data会被json_to_complex_json修改，调用方之后不应再使用
+        while True:
+            try:
+                self._queue.put_nowait((step, graph_data, tree_data))
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join(self.timeout)
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            step, graph_data, tree_data = item
+            try:
+                self._post(self._payload(step, graph_data, tree_data))
+            except Exception as e:
+                if not self._warned:
+                    print(f"Live stream to {self.url} failed: {e}")
+                    self._warned = True
+
+    def _payload(self, step: int, graph_data: List[Dict], tree_data: List[Dict]) -> Dict:
+        payload = {"summary": step_summary(graph_data, tree_data, step)}
+        nodes = json_to_complex_json(graph_data, tree_data)
+        payload["structure_hash"] = structure_hash(nodes)
+        if payload["structure_hash"] != self._structure_hash:
+            graph = dedup_complex_json(nodes)
+            graph.update({k: v for k, v in stamp_complex_json(nodes).items() if k != "nodes"})
+            payload["graph"] = graph
+        return payload
+
+    def _post(self, payload: Dict) -> None:
+        body = gzip.compress(json.dumps(payload, separators=(",", ":")).encode())
+        request = urllib.request.Request(self.url, data=body, method="POST", headers={
+            "Content-Type": "application/json",
+            "Content-Encoding": "gzip",
+        })
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            reply = json.loads(response.read() or b"{}")
+        # 服务端收到之后才记录，推送失败或服务端重启后没有这张图时下一步会重新附带图
+        self._structure_hash = None if reply.get("needs_graph") else payload["structure_hash"]
+
+
+def decode_payload(body: bytes, encoding: Optional[str]) -> Dict:
+    """
+    解析推送的请求体，解压后超过max_payload_bytes时抛出ValueError
+    """
+    if encoding == "gzip":
+        with gzip.GzipFile(fileobj=io.BytesIO(body)) as f:
+            body = f.read(max_payload_bytes + 1)
+    if len(body) > max_payload_bytes:
+        raise ValueError(f"payload larger than {max_payload_bytes} bytes")
+    payload = json.loads(body)
+    if not isinstance(payload, dict) or not isinstance(payload.get("summary"), dict):
+        raise ValueError("payload should be an object with a summary")
+    return payload
+
+
+class LiveRun:
+    """
+    服务端一个训练任务的状态：最近live_history步的汇总、最新的图及其结构哈希、订阅的浏览器连接
+    """
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.steps: Deque[Dict] = deque(maxlen=live_history)
+        self.graph: Optional[Dict] = None
+        self.structure_hash: Optional[str] = None
+        self.subscribers: Set["queue.Queue[Tuple[str, str]]"] = set()
+
+
+class LiveHub:
+    """
+    接收训练任务推送的汇总并转发给订阅的浏览器（server-sent events）
+
+    每步只推送一个step事件：一步的汇总加上当前图的结构哈希，大小固定。浏览器发现哈希与已加载的图不同时再取图，
+    因此无论图多大、任务跑多久，推给浏览器的数据都有上限，浏览器跟不上时丢弃的事件也不会导致漏掉图的变化
+    """
+    def __init__(self) -> None:
+        self._runs: Dict[str, LiveRun] = {}
+        self._lock = threading.Lock()
+
+    def _run(self, name: str) -> LiveRun:
+        return self._runs.setdefault(name, LiveRun(name))
+
+    def runs(self) -> List[Dict]:
+        with self._lock:
+            return [{"name": run.name, "last_step": run.steps[-1]["step"] if run.steps else None, "subscribers": len(run.subscribers)}
+                    for run in self._runs.values()]
+
+    def publish(self, name: str, payload: Dict) -> bool:
+        """
+        :return: 服务端是否缺少与推送的结构哈希对应的图，为True时训练任务下一步需要附带图
+        """
+        with self._lock:
+            run = self._run(name)
+            if payload.get("graph") is not None:
+                run.graph = payload["graph"]
+                run.structure_hash = payload.get("structure_hash")
+            summary = dict(payload["summary"], structure_hash=run.structure_hash)
+            run.steps.append(summary)
+            event = ("step", json.dumps(summary))
+            for subscriber in run.subscribers:
+                _put_dropping_oldest(subscriber, event)
+            return run.graph is None or run.structure_hash != payload.get("structure_hash")
+
+    def subscribe(self, name: str) -> Tuple["queue.Queue[Tuple[str, str]]", Dict]:
+        """
+        :return: (事件队列, 当前状态{"steps"})，在同一把锁内取得，不会漏掉或重复事件
+        """
+        subscriber: "queue.Queue[Tuple[str, str]]" = queue.Queue(maxsize=subscriber_queue_size)
+        with self._lock:
+            run = self._run(name)
+            run.subscribers.add(subscriber)
+            return subscriber, {"steps": list(run.steps)}
+
+    def unsubscribe(self, name: str, subscriber: "queue.Queue[Tuple[str, str]]") -> None:
+        with self._lock:
+            self._run(name).subscribers.discard(subscriber)
+
+    def graph(self, name: str) -> Optional[Dict]:
+        with self._lock:
+            run = self._runs.get(name)
+            return run.graph if run is not None else None
+
+
+def _put_dropping_oldest(q: "queue.Queue", item) -> None:
+    while True:
+        try:
+            q.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                pass
@@ -0,0 +1,146 @@
+from typing import Dict, List, Optional, Tuple
+
+from core.capture import build_node_paths, get_storage_key
+
+unknown_category = "unknown"
+
+
+def collect_categorized_tensors(graph_data: List[Dict], device: Optional[str] = None) -> Dict[str, Dict]:
+    """
+    按存储去重tensor，category取第一个不是unknown的记录（同一存储的不同version可能只有部分被profiler归类）
+    """
+    tensors: Dict[str, Dict] = {}
+    for node in graph_data:
+        for tensor in node["in_edges"] + node["out_edges"]:
+            if device is not None and tensor["device"] != device:
+                continue
+            key = get_storage_key(tensor)
+            category = tensor.get("category", unknown_category)
+            if key not in tensors:
+                tensors[key] = {
+                    "size": tensor["size"],
+                    "start_time": tensor["start_time"],
+                    "end_time": tensor["end_time"],
+                    "category": category,
+                }
+            elif tensors[key]["category"] == unknown_category:
+                tensors[key]["category"] = category
+    return tensors
+
+
+def analyze_memory_categories(graph_data: List[Dict], tree_data: List[Dict], device: Optional[str] = None) -> Dict:
+    """
+    一次按时间排序的扫描同时得到：
+    1、每个category的内存占用曲线（共用同一条时间轴，每列一个category）
+    2、每个module执行期间总占用的峰值，以及峰值时刻各category的占用
+    3、每个module中op产生的tensor按category的字节数
+
+    module的开始、结束和tensor的申请、释放合并为一个事件序列，扫描时只维护当前活跃的module，
+    module是嵌套的，活跃数量不超过树的深度
+
+    :return: {"categories", "times", "live", "base", "peak", "total_peak", "total_peak_time", "at_total_peak", "modules"}
+    """
+    tensors = collect_categorized_tensors(graph_data, device)
+    categories = sorted({t["category"] for t in tensors.values()})
+    column = {c: i for i, c in enumerate(categories)}
+
+    base = [0] * len(categories)
+    # (时间, 顺序, 类型, 值)：同一时刻先释放、再申请，module在该时刻的变化都处理完之后再开始/结束
+    events: List[Tuple[int, int, int, int]] = []
+    for tensor in tensors.values():
+        c = column[tensor["category"]]
+        if tensor["start_time"] == -1:
+            base[c] += tensor["size"]
+        else:
+            events.append((tensor["start_time"], 1, c, tensor["size"]))
+        if tensor["end_time"] != -1:
+            events.append((tensor["end_time"], 0, c, -tensor["size"]))
+
+    node_map: Dict[int, Dict] = {n["id"]: n for n in tree_data}
+    modules = [n for n in tree_data if not n["is_leaf"] and n["start_time"] != -1]
+    for index, module in enumerate(modules):
+        events.append((module["start_time"], 2, index, 0))
+        events.append((module["end_time"], 3, index, 0))
+    events.sort()
+
+    live = list(base)
+    total = sum(base)
+    times: List[int] = []
+    columns: List[List[int]] = [[] for _ in categories]
+    total_peak, total_peak_time, at_total_peak = total, -1, list(live)
+    active: Dict[int, None] = {}
+    module_peaks: Dict[int, Tuple[int, List[int]]] = {}
+
+    i = 0
+    while i < len(events):
+        time = events[i][0]
+        # 处理同一时刻的全部tensor变化，再记录一个采样点
+        changed = False
+        while i < len(events) and events[i][0] == time and events[i][1] <= 1:
+            _, _, c, delta = events[i]
+            live[c] += delta
+            total += delta
+            changed = True
+            i += 1
+        if changed:
+            times.append(time)
+            for c, value in enumerate(live):
+                columns[c].append(value)
+            if total > total_peak:
+                total_peak, total_peak_time, at_total_peak = total, time, list(live)
+            for index in active:
+                if total > module_peaks[index][0]:
+                    module_peaks[index] = (total, list(live))
+        while i < len(events) and events[i][0] == time and events[i][1] >= 2:
+            _, kind, index, _ = events[i]
+            if kind == 2:
+                active[index] = None
+                module_peaks[index] = (total, list(live))
+            else:
+                active.pop(index, None)
+            i += 1
+
+    # 每个module中op产生的tensor（同一存储只计一次）按category的字节数
+    produced: Dict[int, Dict[str, int]] = {}
+    produced_seen: Dict[int, set] = {}
+    for op in graph_data:
+        parent = node_map[op["id"]]["parent"] if op["id"] in node_map else None
+        outputs = [t for t in op["out_edges"] if device is None or t["device"] == device]
+        while parent is not None and outputs:
+            seen = produced_seen.setdefault(parent, set())
+            by_category = produced.setdefault(parent, {})
+            for tensor in outputs:
+                key = get_storage_key(tensor)
+                if key in seen:
+                    continue
+                seen.add(key)
+                category = tensors[key]["category"]
+                by_category[category] = by_category.get(category, 0) + tensor["size"]
+            parent = node_map[parent]["parent"]
+
+    paths = build_node_paths(tree_data)
+    module_records: List[Dict] = []
+    for index, module in enumerate(modules):
+        peak, split = module_peaks.get(index, (total, list(live)))
+        module_records.append({
+            "id": module["id"],
+            "name": module["name"],
+            "path": paths.get(module["id"], module["name"]),
+            "scope": module["scope"],
+            "peak_live": peak,
+            "peak_live_by_category": {c: split[column[c]] for c in categories if split[column[c]]},
+            "produced_by_category": produced.get(module["id"], {}),
+        })
+    module_records.sort(key=lambda r: r["peak_live"], reverse=True)
+
+    return {
+        "categories": categories,
+        "times": times,
+        "live": {c: columns[column[c]] for c in categories},
+        "base": {c: base[column[c]] for c in categories},
+        "peak": {c: max(columns[column[c]], default=base[column[c]]) for c in categories},
+        "total_peak": total_peak,
+        "total_peak_time": total_peak_time,
+        "at_total_peak": {c: at_total_peak[column[c]] for c in categories},
+        "modules": module_records,
+    }
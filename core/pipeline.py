@@ -0,0 +1,326 @@
+from typing import Dict, List, Optional, Tuple
+
+from core.capture import build_node_paths, get_storage_key
+
+module_prefix = "nn.Module:"
+
+
+def subtree_op_time(tree_data: List[Dict]) -> Dict[int, int]:
+    """
+    每个节点子树中op耗时之和，module本身的耗时包含op之间的空闲，不用于估算计算量
+    """
+    node_map: Dict[int, Dict] = {n["id"]: n for n in tree_data}
+    times: Dict[int, int] = {}
+    # 按先序逆序处理，处理父节点时子节点已经算好
+    order: List[int] = []
+    stack = [n["id"] for n in tree_data if n["parent"] is None]
+    while stack:
+        node_id = stack.pop()
+        order.append(node_id)
+        stack.extend(node_map[node_id]["children"])
+    for node_id in reversed(order):
+        node = node_map[node_id]
+        if node["is_leaf"]:
+            times[node_id] = node["end_time"] - node["start_time"]
+        else:
+            times[node_id] = sum(times[c] for c in node["children"])
+    return times
+
+
+def linearize_modules(tree_data: List[Dict], parts: int, granularity: int = 4) -> List[int]:
+    """
+    把前向的module树展开成按执行顺序排列的单元序列，作为切分的最小粒度
+
+    从前向的顶层module开始，op耗时超过总耗时/(parts*granularity)的module替换为它的子节点（子module和直接调用的op），
+    直到所有单元都足够小或不能再展开。顶层module之外的op（如搬运输入的aten::to）不参与切分
+
+    :return: 单元在tree.json中的id
+    """
+    node_map: Dict[int, Dict] = {n["id"]: n for n in tree_data}
+    times = subtree_op_time(tree_data)
+    roots = [n["id"] for n in tree_data if n["parent"] is None and n["scope"] == "forward" and n["name"].startswith(module_prefix)]
+    limit = sum(times[r] for r in roots) / max(parts * granularity, 1)
+
+    units: List[int] = []
+    stack = list(reversed(roots))
+    while stack:
+        node_id = stack.pop()
+        node = node_map[node_id]
+        if not node["is_leaf"] and node["children"] and times[node_id] > limit:
+            stack.extend(reversed(node["children"]))
+        else:
+            units.append(node_id)
+    return units
+
+
+def _unit_of_leaves(tree_data: List[Dict], units: List[int]) -> Dict[int, int]:
+    # op id -> 所在单元的序号
+    node_map: Dict[int, Dict] = {n["id"]: n for n in tree_data}
+    unit_of: Dict[int, int] = {}
+    for index, unit_id in enumerate(units):
+        stack = [unit_id]
+        while stack:
+            node_id = stack.pop()
+            node = node_map[node_id]
+            if node["is_leaf"]:
+                unit_of[node_id] = index
+            stack.extend(node["children"])
+    return unit_of
+
+
+def profile_units(graph_data: List[Dict], tree_data: List[Dict], units: List[int]) -> Dict:
+    """
+    估算每个单元的前向耗时、反向耗时、参数/梯度/优化器状态大小，以及每个切分点上传递的激活大小
+
+    反向op不在module树中，按时间顺序归属：读取参数的反向op（如AddmmBackward0）作为锚点归属到该参数所在的单元，
+    不读参数但读取前向保存的tensor的反向op归属到最后一个在前向中使用该tensor的单元，
+    其余反向op归属到之后最近的锚点（同一module的反向在其权重梯度之前执行），最后的锚点之后的op归属到最后的锚点。
+    没有参数的单元的反向耗时因此会并入相邻单元，在切分粒度下影响不大。
+
+    梯度与参数同样大小；优化器状态按采集中优化器状态总大小与参数总大小的比例分摊到每个参数（如Adam为2）
+
+    :return: {"forward_time", "backward_time", "parameter", "gradient", "optimizer_state", "cut_bytes", "unattributed_backward_time"}
+             前五项为每个单元的列表，cut_bytes[k]为单元k与k+1之间传递的前向激活字节数
+    """
+    node_map: Dict[int, Dict] = {n["id"]: n for n in tree_data}
+    unit_of = _unit_of_leaves(tree_data, units)
+    n = len(units)
+    forward_time = [0] * n
+    backward_time = [0] * n
+    parameter = [0] * n
+
+    # 参数归属到第一次读取它的前向op所在的单元
+    owner: Dict[str, int] = {}
+    parameter_bytes: Dict[str, int] = {}
+    optimizer_state_bytes: Dict[str, int] = {}
+    # 前向tensor: storage_key -> [生产者单元, 最后一个消费者单元, 大小]
+    activations: Dict[str, List[int]] = {}
+    for op in graph_data:
+        for tensor in op["in_edges"] + op["out_edges"]:
+            category = tensor.get("category")
+            if category == "parameter":
+                parameter_bytes[get_storage_key(tensor)] = tensor["size"]
+            elif category == "optimizer_state":
+                optimizer_state_bytes[get_storage_key(tensor)] = tensor["size"]
+        unit = unit_of.get(op["id"])
+        if unit is None:
+            continue
+        forward_time[unit] += op["end_time"] - op["start_time"]
+        for tensor in op["in_edges"]:
+            key = get_storage_key(tensor)
+            if tensor.get("category") == "parameter":
+                owner.setdefault(key, unit)
+            elif key in activations:
+                activations[key][1] = max(activations[key][1], unit)
+        for tensor in op["out_edges"]:
+            activations.setdefault(get_storage_key(tensor), [unit, unit, tensor["size"]])
+
+    for key, unit in owner.items():
+        parameter[unit] += parameter_bytes[key]
+    total_parameter = sum(parameter_bytes.values())
+    state_ratio = sum(optimizer_state_bytes.values()) / total_parameter if total_parameter else 0.0
+
+    # 差分数组：生产者单元p到最后一个消费者单元c之间的每个切分点都要传递这个tensor
+    diff = [0] * (n + 1)
+    for producer, consumer, size in activations.values():
+        if consumer > producer:
+            diff[producer] += size
+            diff[consumer] -= size
+    cut_bytes: List[int] = []
+    running = 0
+    for k in range(n - 1):
+        running += diff[k]
+        cut_bytes.append(running)
+
+    backward_ops = sorted(
+        (op for op in graph_data if op["id"] in node_map and node_map[op["id"]]["scope"] == "backward"),
+        key=lambda op: op["start_time"],
+    )
+    anchors: List[Optional[int]] = []
+    for op in backward_ops:
+        keys = [get_storage_key(t) for t in op["in_edges"]]
+        units_read = [owner[k] for k in keys if k in owner] or [activations[k][1] for k in keys if k in activations]
+        anchors.append(max(units_read) if units_read else None)
+    unattributed = 0
+    pending = 0
+    last_anchor: Optional[int] = None
+    for op, anchor in zip(backward_ops, anchors):
+        pending += op["end_time"] - op["start_time"]
+        if anchor is not None:
+            backward_time[anchor] += pending
+            pending = 0
+            last_anchor = anchor
+    if last_anchor is not None:
+        backward_time[last_anchor] += pending
+    else:
+        unattributed = pending
+
+    return {
+        "forward_time": forward_time,
+        "backward_time": backward_time,
+        "parameter": parameter,
+        "gradient": list(parameter),
+        "optimizer_state": [int(p * state_ratio) for p in parameter],
+        "cut_bytes": cut_bytes,
+        "unattributed_backward_time": unattributed,
+    }
+
+
+def partition_stages(times: List[int], memory: List[int], cut_bytes: List[int], parts: int,
+                     memory_limit: Optional[int] = None, bandwidth: Optional[float] = None) -> List[int]:
+    """
+    动态规划把单元序列切成parts个连续的stage：先最小化最慢stage的耗时，再最小化各切分点传递的激活总量
+
+    给出bandwidth（字节/ns）时，stage耗时加上向下一个stage发送激活、接收梯度的传输时间；
+    给出memory_limit时，每个stage的参数、梯度和优化器状态之和不能超过它
+
+    :return: 每个stage的起始单元序号
+    :raises ValueError: 单元数少于stage数，或在内存限制下找不到可行的切分
+    """
+    n = len(times)
+    if parts > n:
+        raise ValueError(f"cannot split {n} units into {parts} stages, increase granularity or use fewer stages")
+    prefix_time = [0] * (n + 1)
+    prefix_memory = [0] * (n + 1)
+    for i in range(n):
+        prefix_time[i + 1] = prefix_time[i] + times[i]
+        prefix_memory[i + 1] = prefix_memory[i] + memory[i]
+
+    def stage_cost(i: int, j: int) -> float:
+        # 单元[i, j)组成一个stage
+        cost = prefix_time[j] - prefix_time[i]
+        if bandwidth and j < n:
+            cost += 2 * cut_bytes[j - 1] / bandwidth
+        return cost
+
+    def feasible(i: int, j: int) -> bool:
+        return memory_limit is None or prefix_memory[j] - prefix_memory[i] <= memory_limit
+
+    # 两遍动态规划：前缀上(最慢耗时, 激活总量)的字典序最优并不能组合出全局最优（前缀慢一些但激活少的切分可能更好），
+    # 所以先求最慢stage耗时的最小值，再在每个stage都不超过它的切分中最小化激活总量
+    infinity = float("inf")
+    # slowest[k][j]: 前j个单元切成k个stage时最慢stage耗时的最小值
+    slowest: List[List[float]] = [[infinity] * (n + 1) for _ in range(parts + 1)]
+    slowest[0][0] = 0.0
+    for k in range(1, parts + 1):
+        for j in range(k, n - (parts - k) + 1):
+            for i in range(k - 1, j):
+                if slowest[k - 1][i] != infinity and feasible(i, j):
+                    slowest[k][j] = min(slowest[k][j], max(slowest[k - 1][i], stage_cost(i, j)))
+    bottleneck = slowest[parts][n]
+    if bottleneck == infinity:
+        raise ValueError(f"no partition into {parts} stages fits the memory limit of {memory_limit} bytes per stage")
+
+    # cut[k][j]: 前j个单元切成k个耗时都不超过bottleneck的stage时，切分点激活总量的最小值
+    cut: List[List[float]] = [[infinity] * (n + 1) for _ in range(parts + 1)]
+    choice: List[List[int]] = [[-1] * (n + 1) for _ in range(parts + 1)]
+    cut[0][0] = 0.0
+    for k in range(1, parts + 1):
+        for j in range(k, n - (parts - k) + 1):
+            for i in range(k - 1, j):
+                if cut[k - 1][i] == infinity or not feasible(i, j) or stage_cost(i, j) > bottleneck:
+                    continue
+                candidate = cut[k - 1][i] + (cut_bytes[i - 1] if i > 0 else 0)
+                if candidate < cut[k][j]:
+                    cut[k][j] = candidate
+                    choice[k][j] = i
+
+    starts: List[int] = []
+    j = n
+    for k in range(parts, 0, -1):
+        j = choice[k][j]
+        starts.append(j)
+    return starts[::-1]
+
+
+def plan_pipeline(graph_data: List[Dict], tree_data: List[Dict], parts: int, microbatches: int = 8,
+                  memory_limit: Optional[int] = None, bandwidth: Optional[float] = None, granularity: int = 4) -> Dict:
+    """
+    流水线并行的stage切分：展开module树得到单元序列，估算每个单元的前向+反向耗时和内存，动态规划切分，
+    并按1F1B/GPipe调度预测空泡：一次迭代耗时约为(microbatches + parts - 1) * 最慢stage的单个micro batch耗时
+
+    :param memory_limit: 每个stage参数、梯度和优化器状态的上限（字节）
+    :param bandwidth: stage之间的带宽（字节/s）
+    :return: {"parts", "microbatches", "units", "stages", "bottleneck_time", "predicted_iteration_time", "bubble_fraction", ...}
+    """
+    node_map: Dict[int, Dict] = {n["id"]: n for n in tree_data}
+    paths = build_node_paths(tree_data)
+    units = linearize_modules(tree_data, parts, granularity)
+    profile = profile_units(graph_data, tree_data, units)
+    memory = [profile["parameter"][i] + profile["gradient"][i] + profile["optimizer_state"][i] for i in range(len(units))]
+    times = [profile["forward_time"][i] + profile["backward_time"][i] for i in range(len(units))]
+    starts = partition_stages(times, memory, profile["cut_bytes"], parts, memory_limit,
+                              bandwidth / 1e9 if bandwidth else None)
+
+    unit_records = [{
+        "index": i,
+        "id": unit_id,
+        "name": node_map[unit_id]["name"],
+        "path": paths[unit_id],
+        "forward_time": profile["forward_time"][i],
+        "backward_time": profile["backward_time"][i],
+        "memory": memory[i],
+        "cut_bytes": profile["cut_bytes"][i] if i < len(units) - 1 else 0,
+    } for i, unit_id in enumerate(units)]
+
+    stages: List[Dict] = []
+    for s, start in enumerate(starts):
+        end = starts[s + 1] if s + 1 < len(starts) else len(units)
+        span = range(start, end)
+        send_bytes = profile["cut_bytes"][end - 1] if end < len(units) else 0
+        stage_memory = {key: sum(profile[key][i] for i in span) for key in ["parameter", "gradient", "optimizer_state"]}
+        stage_memory["total"] = sum(stage_memory.values())
+        compute = sum(times[i] for i in span)
+        stages.append({
+            "stage": s,
+            "units": [start, end - 1],
+            "modules": [paths[units[i]] for i in span],
+            "forward_time": sum(profile["forward_time"][i] for i in span),
+            "backward_time": sum(profile["backward_time"][i] for i in span),
+            "transfer_time": 2 * send_bytes / bandwidth * 1e9 if bandwidth else 0,
+            "time": compute + (2 * send_bytes / bandwidth * 1e9 if bandwidth else 0),
+            "send_bytes": send_bytes,
+            "memory": stage_memory,
+        })
+
+    bottleneck = max(s["time"] for s in stages)
+    total = sum(s["time"] for s in stages)
+    iteration = (microbatches + parts - 1) * bottleneck / microbatches
+    return {
+        "parts": parts,
+        "microbatches": microbatches,
+        "memory_limit": memory_limit,
+        "bandwidth": bandwidth,
+        "units": unit_records,
+        "stages": stages,
+        "bottleneck_time": bottleneck,
+        "ideal_time": total / parts,
+        "predicted_iteration_time": iteration,
+        "bubble_fraction": 1 - total / (parts * iteration) if iteration > 0 else 0.0,
+        "unattributed_backward_time": profile["unattributed_backward_time"],
+    }
+
+
+def mark_stages(nodes: List[Dict], tree_data: List[Dict], plan: Dict) -> int:
+    """
+    在complex_graph的节点上标出stage：每个单元对应的节点加上"stage"字段，可视化时按stage给单元描边
+
+    complex_graph的id与tree.json不同，按(label, start_time, end_time)匹配
+
+    :return: 标出的单元数
+    """
+    node_map: Dict[int, Dict] = {n["id"]: n for n in tree_data}
+    stage_of: Dict[Tuple[str, int, int], int] = {}
+    for stage in plan["stages"]:
+        for i in range(stage["units"][0], stage["units"][1] + 1):
+            unit = node_map[plan["units"][i]["id"]]
+            stage_of[(unit["name"], unit["start_time"], unit["end_time"])] = stage["stage"]
+    marked = 0
+    for node in nodes:
+        if node["isTensor"]:
+            continue
+        stage = stage_of.get((node["label"], node["start_time"], node["end_time"]))
+        if stage is not None:
+            node["stage"] = stage
+            marked += 1
+    return marked
@@ -0,0 +1,206 @@
+import copy
+import hashlib
+import json
+import re
+from typing import Dict, List, Optional
+
+dedup_format_version = 1
+
+
+def normalize_label(label: str) -> str:
+    # module名带有实例序号，如"nn.Module: GPT2Block_3"，计算结构哈希时去掉序号
+    return re.sub(r'_\d+$', '', label)
+
+
+def _subtree_nodes(node_map: Dict[int, Dict], root_id: int) -> List[int]:
+    # 先序遍历得到子树的节点列表，顺序即为模板中的局部编号
+    result: List[int] = []
+    stack = [root_id]
+    while stack:
+        node_id = stack.pop()
+        result.append(node_id)
+        stack.extend(reversed(node_map[node_id]["children"]))
+    return result
+
+
+def compute_structural_hashes(nodes: List[Dict]) -> Dict[int, str]:
+    """
+    自底向上计算complex_graph中每个子图节点的结构哈希
+
+    哈希由子树内的op名、tensor的shape/dtype/device/size/category、子节点的哈希以及子树内部的边构成，
+    结构相同的module实例（如GPT2的12个GPT2Block）得到相同的哈希
+
+    :return: 子图节点id -> 哈希
+    """
+    node_map: Dict[int, Dict] = {n["id"]: n for n in nodes}
+    hashes: Dict[int, str] = {}
+
+    def leaf_signature(node: Dict) -> List:
+        if node["isTensor"]:
+            info = node.get("info", {})
+            return ["T", info.get("shape"), info.get("dtype"), info.get("device"), info.get("size"), info.get("category")]
+        return ["O", node["label"]]
+
+    def visit(node_id: int) -> str:
+        node = node_map[node_id]
+        children_signature = []
+        for child_id in node["children"]:
+            child = node_map[child_id]
+            if child["isLeaf"]:
+                children_signature.append(leaf_signature(child))
+            else:
+                children_signature.append(["S", visit(child_id)])
+
+        # 子树内部的边用局部编号表示
+        local_ids = _subtree_nodes(node_map, node_id)
+        local_index = {nid: i for i, nid in enumerate(local_ids)}
+        internal_edges = sorted(
+            (local_index[nid], local_index[next_id])
+            for nid in local_ids
+            for next_id in node_map[nid]["nextNodes"]
+            if next_id in local_index
+        )
+
+        signature = [normalize_label(node["label"]), children_signature, internal_edges]
+        hashes[node_id] = hashlib.sha1(json.dumps(signature).encode()).hexdigest()
+        return hashes[node_id]
+
+    for node in nodes:
+        if node["parent"] is None and not node["isLeaf"]:
+            visit(node["id"])
+    return hashes
+
+
+def dedup_complex_json(nodes: List[Dict], min_nodes: int = 4) -> Dict:
+    """
+    对结构相同的module实例去重：相同结构只保存一份模板，每个实例只保存id、时间、标签等差异表
+
+    自顶向下遍历，出现两次及以上且节点数不少于min_nodes的子树作为实例，不再向下展开
+
+    :return: {"version", "nodes", "templates"}，nodes中实例以带template字段的子图节点表示
+    """
+    node_map: Dict[int, Dict] = {n["id"]: n for n in nodes}
+    hashes = compute_structural_hashes(nodes)
+    hash_count: Dict[str, int] = {}
+    for h in hashes.values():
+        hash_count[h] = hash_count.get(h, 0) + 1
+
+    templates: Dict[str, Dict] = {}
+    result_nodes: List[Dict] = []
+
+    def make_instance(node_id: int) -> Dict:
+        h = hashes[node_id]
+        local_ids = _subtree_nodes(node_map, node_id)
+        local_index = {nid: i for i, nid in enumerate(local_ids)}
+
+        if h not in templates:
+            template_nodes = []
+            for nid in local_ids:
+                n = node_map[nid]
+                template_node = {
+                    "isTensor": n["isTensor"],
+                    "isLeaf": n["isLeaf"],
+                    "label": normalize_label(n["label"]) if not n["isLeaf"] else n["label"],
+                    "parent": local_index[n["parent"]] if nid != node_id else None,
+                    "children": [local_index[c] for c in n["children"]],
+                    "nextNodes": [local_index[x] for x in n["nextNodes"] if x in local_index],
+                }
+                if "info" in n:
+                    template_node["info"] = n["info"]
+                template_nodes.append(template_node)
+            templates[h] = {"nodes": template_nodes}
+
+        # 实例差异表：全局id、时间、带序号的module名、指向实例外部的边、子图的统计信息
+        # 时间保存为相对实例起点的偏移，-1（未知）保存为None；id连续时只保存起点和个数
+        base_time = node_map[node_id]["start_time"]
+        instance = {
+            "times": [
+                [t - base_time if t != -1 else None for t in (node_map[nid]["start_time"], node_map[nid]["end_time"])]
+                for nid in local_ids
+            ],
+            "labels": {
+                str(i): node_map[nid]["label"] for i, nid in enumerate(local_ids)
+                if not node_map[nid]["isLeaf"]
+            },
+            "external_next": {
+                str(i): external for i, nid in enumerate(local_ids)
+                if (external := [x for x in node_map[nid]["nextNodes"] if x not in local_index])
+            },
+            "stats": {
+                str(i): node_map[nid]["stats"] for i, nid in enumerate(local_ids)
+                if "stats" in node_map[nid]
+            },
+        }
+        if local_ids == list(range(local_ids[0], local_ids[0] + len(local_ids))):
+            instance["id_range"] = [local_ids[0], len(local_ids)]
+        else:
+            instance["ids"] = local_ids
+        stub = {k: v for k, v in node_map[node_id].items() if k not in ("children", "nextNodes")}
+        stub.update({"children": [], "nextNodes": [], "template": h, "instance": instance})
+        return stub
+
+    def visit(node_id: int) -> None:
+        node = node_map[node_id]
+        if (not node["isLeaf"] and hash_count.get(hashes.get(node_id, ""), 0) > 1
+                and len(_subtree_nodes(node_map, node_id)) >= min_nodes):
+            result_nodes.append(make_instance(node_id))
+            return
+        result_nodes.append(node)
+        for child_id in node["children"]:
+            visit(child_id)
+
+    for node in nodes:
+        if node["parent"] is None:
+            visit(node["id"])
+
+    return {"version": dedup_format_version, "nodes": result_nodes, "templates": templates}
+
+
+def expand_dedup_json(data: Dict) -> List[Dict]:
+    """
+    将去重后的数据还原为complex_graph节点列表
+    """
+    result: List[Dict] = []
+    for node in data["nodes"]:
+        if "template" not in node:
+            result.append(node)
+            continue
+        result.extend(expand_instance(data["templates"][node["template"]], node))
+    return result
+
+
+def expand_instance(template: Dict, stub: Dict) -> List[Dict]:
+    """
+    根据模板和实例差异表还原一个实例的所有节点
+    """
+    instance = stub["instance"]
+    if "id_range" in instance:
+        ids = list(range(instance["id_range"][0], instance["id_range"][0] + instance["id_range"][1]))
+    else:
+        ids = instance["ids"]
+    base_time = stub["start_time"]
+    expanded: List[Dict] = []
+    for i, template_node in enumerate(template["nodes"]):
+        node = copy.deepcopy(template_node)
+        node["id"] = ids[i]
+        node["start_time"], node["end_time"] = [base_time + t if t is not None else -1 for t in instance["times"][i]]
+        node["label"] = instance["labels"].get(str(i), node["label"])
+        node["parent"] = ids[node["parent"]] if node["parent"] is not None else stub["parent"]
+        node["children"] = [ids[c] for c in node["children"]]
+        node["nextNodes"] = [ids[x] for x in node["nextNodes"]] + instance["external_next"].get(str(i), [])
+        if str(i) in instance.get("stats", {}):
+            node["stats"] = instance["stats"][str(i)]
+        expanded.append(node)
+    return expanded
+
+
+def dedup_stats(nodes: List[Dict], data: Dict) -> Dict[str, Optional[float]]:
+    original_size = len(json.dumps(nodes))
+    dedup_size = len(json.dumps(data))
+    return {
+        "original_bytes": original_size,
+        "dedup_bytes": dedup_size,
+        "ratio": dedup_size / original_size if original_size else None,
+        "templates": len(data["templates"]),
+        "instances": sum(1 for n in data["nodes"] if "template" in n),
+    }
@@ -0,0 +1,135 @@
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Tuple
+
+from core.capture import build_node_paths, get_storage_key
+from core.flops import tensor_bytes
+
+# 产生锁页内存的op，拷贝在主机一端的tensor由这些op产生时视为pinned
+pin_memory_ops = {"aten::pin_memory", "aten::_pin_memory"}
+
+
+def _device_type(device: str) -> str:
+    return device.split(":")[0]
+
+
+def transfer_direction(src_device: str, dst_device: str) -> str:
+    """
+    H2D/D2H/D2D，两端都不是cpu时为D2D（包括不同设备类型之间）
+    """
+    if _device_type(src_device) == "cpu":
+        return "H2D"
+    if _device_type(dst_device) == "cpu":
+        return "D2H"
+    return "D2D"
+
+
+def find_transfers(graph_data: List[Dict], tree_data: List[Dict]) -> Dict:
+    """
+    找出所有跨设备拷贝：输出tensor所在设备与某个输入tensor不同的op（aten::to、aten::copy_等）。
+    主机上的tensor需要采集时用--devices保留cpu，否则H2D/D2H的一端已被过滤，找不到拷贝
+
+    耗时为op在CPU侧的耗时，non_blocking的拷贝在CPU侧返回时不一定已完成，带宽只是按CPU侧耗时计算的有效带宽。
+    与计算重叠按CPU时间线判断：拷贝结束到目标tensor第一次被使用之间有其他op在执行，且拷贝不是阻塞的（non_blocking为False时
+    拷贝在返回前已完成，谈不上重叠）。主机一端的tensor由pin_memory产生时为pinned，由其他op产生时为pageable，
+    由框架外部创建（如DataLoader的pin_memory线程）时无法判断，为unknown
+
+    :return: {"transfers", "directions", "modules"}，transfers按时间顺序，directions/modules为汇总
+    """
+    node_map: Dict[int, Dict] = {n["id"]: n for n in tree_data}
+    paths = build_node_paths(tree_data)
+
+    producers: Dict[str, Dict] = {}
+    first_use: Dict[str, int] = {}
+    for op in graph_data:
+        for tensor in op["out_edges"]:
+            producers.setdefault(get_storage_key(tensor), op)
+        for tensor in op["in_edges"]:
+            key = get_storage_key(tensor)
+            first_use[key] = min(first_use.get(key, op["start_time"]), op["start_time"])
+
+    def is_transfer(op: Dict) -> bool:
+        in_devices = {t["device"] for t in op["in_edges"]}
+        return bool(in_devices) and any(t["device"] not in in_devices for t in op["out_edges"])
+
+    transfer_ops = [op for op in graph_data if is_transfer(op)]
+    transfer_ids = {op["id"] for op in transfer_ops}
+    # 其他op按开始时间排序，用于统计拷贝与目标tensor第一次使用之间执行的op
+    compute = sorted((op["start_time"], op["end_time"]) for op in graph_data if op["id"] not in transfer_ids)
+    compute_starts = [start for start, _ in compute]
+
+    def module_of(op_id: int) -> str:
+        if op_id not in node_map:
+            return ""
+        parent = node_map[op_id]["parent"]
+        return paths[parent] if parent is not None else f'[{node_map[op_id]["scope"]}]'
+
+    transfers: List[Dict] = []
+    for op in transfer_ops:
+        dst_devices = {t["device"] for t in op["out_edges"]}
+        sources = [t for t in op["in_edges"] if t["device"] not in dst_devices]
+        destinations = [t for t in op["out_edges"] if t["device"] not in {s["device"] for s in sources}]
+        if not sources or not destinations:
+            continue
+        src, dst = sources[0], destinations[0]
+        nbytes = sum(tensor_bytes(t) for t in destinations)
+        duration = op["end_time"] - op["start_time"]
+
+        # 按主机一端的tensor判断锁页内存：H2D看源tensor，D2H看拷贝到的已有tensor（如copy_到预先分配的缓冲区）
+        direction = transfer_direction(src["device"], dst["device"])
+        if direction == "D2D":
+            memory = "device"
+        else:
+            producer = producers.get(get_storage_key(src if direction == "H2D" else dst))
+            if producer is None or producer["id"] == op["id"]:
+                memory = "unknown"
+            else:
+                memory = "pinned" if producer["name"] in pin_memory_ops else "pageable"
+
+        # 拷贝结束到目标tensor第一次使用之间执行的op
+        use = min((first_use[k] for t in destinations if (k := get_storage_key(t)) in first_use and first_use[k] >= op["end_time"]), default=None)
+        window: Optional[Tuple[int, int]] = (op["end_time"], use) if use is not None else None
+        overlapped_ops = 0
+        overlapped_time = 0
+        if window is not None:
+            for start, end in compute[bisect_left(compute_starts, window[0]):bisect_right(compute_starts, window[1])]:
+                if start < window[1]:
+                    overlapped_ops += 1
+                    overlapped_time += min(end, window[1]) - start
+        non_blocking = op.get("non_blocking")
+
+        transfers.append({
+            "op": op["id"],
+            "name": op["name"],
+            "module": module_of(op["id"]),
+            "direction": direction,
+            "src_device": src["device"],
+            "dst_device": dst["device"],
+            "bytes": nbytes,
+            "start_time": op["start_time"],
+            "duration": duration,
+            "bandwidth": nbytes / duration if duration > 0 else None,
+            "non_blocking": non_blocking,
+            "memory": memory,
+            "first_use": use,
+            "overlapped_ops": overlapped_ops,
+            "overlapped_time": overlapped_time,
+            "overlaps_compute": non_blocking is not False and overlapped_ops > 0,
+        })
+    transfers.sort(key=lambda t: t["start_time"])
+
+    def summarize(field: str) -> List[Dict]:
+        records: Dict[str, Dict] = {}
+        for t in transfers:
+            record = records.setdefault(t[field], {field: t[field], "count": 0, "bytes": 0, "duration": 0,
+                                                   "overlapped": 0, "pinned": 0, "pageable": 0})
+            record["count"] += 1
+            record["bytes"] += t["bytes"]
+            record["duration"] += t["duration"]
+            record["overlapped"] += t["overlaps_compute"]
+            if t["memory"] in ("pinned", "pageable"):
+                record[t["memory"]] += 1
+        for record in records.values():
+            record["bandwidth"] = record["bytes"] / record["duration"] if record["duration"] > 0 else None
+        return sorted(records.values(), key=lambda r: (r["duration"], r["bytes"]), reverse=True)
+
+    return {"transfers": transfers, "directions": summarize("direction"), "modules": summarize("module")}
@@ -0,0 +1,197 @@
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+from core.capture import build_node_paths
+
+# 前一段以这些阶段结束、后一段从前向开始时，中间的空闲是下一步的数据加载
+data_loading_phase = "data_loading"
+
+
+def op_device(op: Dict) -> str:
+    """
+    op所在的设备，取第一个输出tensor的设备，没有输出时取第一个输入tensor的设备
+    """
+    tensors = op["out_edges"] or op["in_edges"]
+    return tensors[0]["device"] if tensors else "unknown"
+
+
+def merge_intervals(intervals: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """
+    求区间的并，返回按时间排序、互不重叠的区间
+    """
+    merged: List[List[int]] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def _overlap(busy: List[Tuple[int, int]], starts: List[int], low: int, high: int) -> int:
+    # busy已合并且有序，只需检查开始时间早于high的区间，最多一个区间跨过low
+    total = 0
+    i = max(bisect_right(starts, low) - 1, 0)
+    while i < len(busy) and busy[i][0] < high:
+        total += max(0, min(busy[i][1], high) - max(busy[i][0], low))
+        i += 1
+    return total
+
+
+def phase_segments(graph_data: List[Dict], tree_data: List[Dict]) -> List[Dict]:
+    """
+    按所有op的开始时间把采集切成连续的阶段（forward/backward/postprocess），相邻两段之间的空隙单独成段：
+    从backward/postprocess到forward之间为data_loading（下一步的输入还没准备好），其余为"前一阶段->后一阶段"
+
+    :return: [{"phase", "start_time", "end_time"}]，按时间排序、首尾相接
+    """
+    scope: Dict[int, str] = {n["id"]: n["scope"] for n in tree_data}
+    segments: List[Dict] = []
+    for op in sorted(graph_data, key=lambda op: op["start_time"]):
+        phase = scope.get(op["id"], "unknown")
+        if segments and segments[-1]["phase"] == phase:
+            segments[-1]["end_time"] = max(segments[-1]["end_time"], op["end_time"])
+            continue
+        if segments:
+            previous = segments[-1]
+            if op["start_time"] > previous["end_time"]:
+                boundary = data_loading_phase if phase == "forward" else f'{previous["phase"]}->{phase}'
+                segments.append({"phase": boundary, "start_time": previous["end_time"], "end_time": op["start_time"]})
+            else:
+                # 两个阶段的op在时间上重叠（如不同线程），后一段从前一段结束处开始
+                op = dict(op, start_time=previous["end_time"])
+        segments.append({"phase": phase, "start_time": op["start_time"], "end_time": max(op["start_time"], op["end_time"])})
+    return segments
+
+
+def analyze_utilization(graph_data: List[Dict], tree_data: List[Dict], min_gap: int = 0) -> Dict:
+    """
+    扫描每个设备（以及每个设备上每个线程）上op的忙碌区间，求并集后得到空闲间隙，按长度排序
+
+    间隙按前后两个op归属：同一阶段时取两者在module树上的最近公共祖先，阶段不同时为阶段的交界，
+    进入前向之前的空闲为data_loading。利用率按阶段统计，即每个阶段的时间内各设备有op执行的比例。
+    op的时间是CPU侧的下发时间，所以这里的空闲指没有op下发到该设备，设备上kernel排队执行的部分看不到。
+    op没有thread字段时所有op视为同一个线程
+
+    :param min_gap: 短于该纳秒数的间隙不列出（仍计入利用率）
+    :return: {"window", "devices", "lanes", "phases", "gaps"}
+    """
+    node_map: Dict[int, Dict] = {n["id"]: n for n in tree_data}
+    paths = build_node_paths(tree_data)
+    if not graph_data:
+        return {"window": None, "devices": [], "lanes": [], "phases": [], "gaps": []}
+    window_start = min(op["start_time"] for op in graph_data)
+    window_end = max(op["end_time"] for op in graph_data)
+    window = window_end - window_start
+
+    def ancestors(op_id: int) -> List[int]:
+        chain = []
+        node_id = node_map[op_id]["parent"] if op_id in node_map else None
+        while node_id is not None:
+            chain.append(node_id)
+            node_id = node_map[node_id]["parent"]
+        return chain[::-1]
+
+    def scope(op: Optional[Dict]) -> Optional[str]:
+        if op is None:
+            return None
+        return node_map[op["id"]]["scope"] if op["id"] in node_map else "unknown"
+
+    def attribute(before: Optional[Dict], after: Optional[Dict]) -> Tuple[str, str]:
+        # 返回(阶段, module路径)
+        before_scope, after_scope = scope(before), scope(after)
+        if after_scope == "forward" and before_scope != "forward":
+            return data_loading_phase, ""
+        if before is None or after is None or before_scope != after_scope:
+            phase = f"{before_scope or 'start'}->{after_scope or 'end'}"
+            return phase, ""
+        common = ancestors(before["id"])
+        chain = ancestors(after["id"])
+        k = 0
+        while k < min(len(common), len(chain)) and common[k] == chain[k]:
+            k += 1
+        return before_scope, paths[common[k - 1]] if k else f"[{before_scope}]"
+
+    ops_by_lane: Dict[Tuple[str, Optional[int]], List[Dict]] = {}
+    for op in graph_data:
+        ops_by_lane.setdefault((op_device(op), op.get("thread")), []).append(op)
+
+    def sweep(ops: List[Dict]) -> Tuple[List[Tuple[int, int]], List[Dict]]:
+        ops = sorted(ops, key=lambda op: (op["start_time"], op["end_time"]))
+        busy = merge_intervals([(op["start_time"], op["end_time"]) for op in ops])
+        # 每个忙碌区间的最后一个op和第一个op即为间隙两侧的op
+        firsts: List[Dict] = []
+        lasts: List[Dict] = []
+        i = 0
+        for start, end in busy:
+            firsts.append(ops[i])
+            last = ops[i]
+            while i < len(ops) and ops[i]["start_time"] <= end:
+                if ops[i]["end_time"] >= last["end_time"]:
+                    last = ops[i]
+                i += 1
+            lasts.append(last)
+        bounds = [window_start] + [t for interval in busy for t in interval] + [window_end]
+        gaps: List[Dict] = []
+        for k in range(len(busy) + 1):
+            start, end = bounds[2 * k], bounds[2 * k + 1]
+            if end - start <= 0 or end - start < min_gap:
+                continue
+            before = lasts[k - 1] if k > 0 else None
+            after = firsts[k] if k < len(busy) else None
+            phase, module = attribute(before, after)
+            gaps.append({
+                "start_time": start,
+                "end_time": end,
+                "duration": end - start,
+                "phase": phase,
+                "module": module,
+                "before": before["name"] if before else None,
+                "after": after["name"] if after else None,
+            })
+        return busy, gaps
+
+    segments = phase_segments(graph_data, tree_data)
+
+    def utilization(busy: List[Tuple[int, int]]) -> Dict[str, float]:
+        starts = [start for start, _ in busy]
+        busy_time: Dict[str, int] = {}
+        total_time: Dict[str, int] = {}
+        for segment in segments:
+            phase = segment["phase"]
+            busy_time[phase] = busy_time.get(phase, 0) + _overlap(busy, starts, segment["start_time"], segment["end_time"])
+            total_time[phase] = total_time.get(phase, 0) + segment["end_time"] - segment["start_time"]
+        return {phase: busy_time[phase] / total_time[phase] if total_time[phase] else 0.0 for phase in total_time}
+
+    def summary(busy: List[Tuple[int, int]], gaps: List[Dict], **fields) -> Dict:
+        busy_total = sum(end - start for start, end in busy)
+        return dict(fields, busy=busy_total, idle=window - busy_total, utilization=busy_total / window if window else 0.0,
+                    num_gaps=len(gaps), longest_gap=max((g["duration"] for g in gaps), default=0), phases=utilization(busy))
+
+    devices: List[Dict] = []
+    all_gaps: List[Dict] = []
+    for device in sorted({device for device, _ in ops_by_lane}):
+        busy, gaps = sweep([op for (d, _), ops in ops_by_lane.items() if d == device for op in ops])
+        devices.append(summary(busy, gaps, device=device))
+        all_gaps.extend(dict(g, device=device) for g in gaps)
+    lanes: List[Dict] = []
+    for (device, thread), ops in sorted(ops_by_lane.items(), key=lambda item: (item[0][0], item[0][1] or 0)):
+        busy, gaps = sweep(ops)
+        lanes.append(summary(busy, gaps, device=device, thread=thread))
+    all_gaps.sort(key=lambda g: g["duration"], reverse=True)
+
+    phases: Dict[str, Dict] = {}
+    for segment in segments:
+        record = phases.setdefault(segment["phase"], {"phase": segment["phase"], "duration": 0, "segments": 0})
+        record["duration"] += segment["end_time"] - segment["start_time"]
+        record["segments"] += 1
+    for record in phases.values():
+        record["utilization"] = {d["device"]: d["phases"].get(record["phase"], 0.0) for d in devices}
+
+    return {
+        "window": [window_start, window_end],
+        "devices": devices,
+        "lanes": lanes,
+        "phases": sorted(phases.values(), key=lambda p: p["duration"], reverse=True),
+        "gaps": all_gaps,
+    }
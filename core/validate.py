@@ -0,0 +1,201 @@
+import hashlib
+import json
+from typing import Dict, List, Set, Tuple, Union
+
+from core.structural_hash import expand_dedup_json
+
+# 2：content_hash只覆盖校验读取的字段，可视化时可以重新计算并比对
+validation_version = 2
+
+
+def validate_tree(tree_data: List[Dict]) -> List[Dict]:
+    """
+    校验tree.json，一次遍历完成，O(V+E)
+    1、反向节点的祖先都是反向
+    2、is_leaf正确：叶子节点没有children，非叶子节点有children
+    3、parent与children互相一致
+    4、记录了线程时，子节点与父节点在同一线程（每个线程一棵树）
+
+    :return: 问题列表，每项为{"node": id, "rule": 规则描述}，为空表示合法
+    """
+    node_map: Dict[int, Dict] = {n["id"]: n for n in tree_data}
+    issues: List[Dict] = []
+
+    for node_id, node in node_map.items():
+        if node["is_leaf"] and node["children"]:
+            issues.append({"node": node_id, "rule": "leaf node should not have children"})
+        if not node["is_leaf"] and not node["children"]:
+            issues.append({"node": node_id, "rule": "non leaf node should have children"})
+        for child_id in node["children"]:
+            child = node_map.get(child_id)
+            if child is None:
+                issues.append({"node": node_id, "rule": f"child {child_id} not found"})
+            elif child["parent"] != node_id:
+                issues.append({"node": child_id, "rule": f"parent should be {node_id}"})
+            elif child.get("thread") != node.get("thread"):
+                issues.append({"node": child_id, "rule": f"thread should be {node.get('thread')} as its parent"})
+        parent = node_map.get(node["parent"]) if node["parent"] is not None else None
+        # 只需检查直接父节点：若每个反向节点的父节点都是反向，则所有祖先都是反向
+        if node["scope"] == "backward" and parent is not None and parent["scope"] != "backward":
+            issues.append({"node": node_id, "rule": "ancestors of backward node should be backward"})
+
+    return issues
+
+
+def validate_complex_graph(nodes: List[Dict]) -> List[Dict]:
+    """
+    校验complex_graph，规则与可视化中的isLegalGraph一致，一次遍历加一次拓扑排序，O(V+E)
+    1、非叶子节点不应该有nextNodes
+    2、叶子节点不应该有children
+    3、非叶子节点应该有children
+    4、nextNodes必须存在，且op的输出是tensor、tensor的输出是op
+    5、tensor最多只有一个生产者
+    6、必为有向无环图
+
+    :return: 问题列表，每项为{"node": id, "rule": 规则描述}，为空表示合法
+    """
+    node_map: Dict[int, Dict] = {n["id"]: n for n in nodes}
+    in_degree: Dict[int, int] = {node_id: 0 for node_id in node_map}
+    issues: List[Dict] = []
+
+    for node_id, node in node_map.items():
+        if not node["isLeaf"] and node["nextNodes"]:
+            issues.append({"node": node_id, "rule": "subgraph should not have next nodes"})
+        if node["isLeaf"] and node["children"]:
+            issues.append({"node": node_id, "rule": "leaf node should not have children"})
+        if not node["isLeaf"] and not node["children"]:
+            issues.append({"node": node_id, "rule": "non leaf node should have children"})
+        for next_id in node["nextNodes"]:
+            next_node = node_map.get(next_id)
+            if next_node is None:
+                issues.append({"node": node_id, "rule": f"next node {next_id} not found"})
+                continue
+            if node["isTensor"] == next_node["isTensor"]:
+                issues.append({"node": node_id, "rule": "op node's output should be tensor, tensor should be input of op node"})
+            in_degree[next_id] += 1
+
+    for node_id, degree in in_degree.items():
+        if node_map[node_id]["isTensor"] and degree > 1:
+            issues.append({"node": node_id, "rule": "tensor only has one producer"})
+
+    # 拓扑排序，剩余的节点在环上或在环的下游
+    queue = [node_id for node_id, degree in in_degree.items() if degree == 0]
+    head = 0
+    while head < len(queue):
+        node_id = queue[head]
+        head += 1
+        for next_id in node_map[node_id]["nextNodes"]:
+            if next_id not in in_degree:
+                continue
+            in_degree[next_id] -= 1
+            if in_degree[next_id] == 0:
+                queue.append(next_id)
+    if head != len(node_map):
+        remaining = {node_id for node_id, degree in in_degree.items() if degree > 0}
+        for node_id in _nodes_on_cycles(node_map, remaining):
+            issues.append({"node": node_id, "rule": "graph should be acyclic, node is on a cycle"})
+
+    return issues
+
+
+def _nodes_on_cycles(node_map: Dict[int, Dict], candidates: Set[int]) -> List[int]:
+    # 非递归Tarjan求强连通分量，大小大于1或有自环的分量中的节点在环上，O(V+E)
+    index: Dict[int, int] = {}
+    low: Dict[int, int] = {}
+    on_stack: Set[int] = set()
+    stack: List[int] = []
+    result: List[int] = []
+    counter = 0
+
+    def successors(node_id: int) -> List[int]:
+        return [n for n in node_map[node_id]["nextNodes"] if n in candidates]
+
+    for start in candidates:
+        if start in index:
+            continue
+        work = [(start, iter(successors(start)))]
+        index[start] = low[start] = counter
+        counter += 1
+        stack.append(start)
+        on_stack.add(start)
+        while work:
+            node_id, it = work[-1]
+            advanced = False
+            for next_id in it:
+                if next_id not in index:
+                    index[next_id] = low[next_id] = counter
+                    counter += 1
+                    stack.append(next_id)
+                    on_stack.add(next_id)
+                    work.append((next_id, iter(successors(next_id))))
+                    advanced = True
+                    break
+                if next_id in on_stack:
+                    low[node_id] = min(low[node_id], index[next_id])
+            if advanced:
+                continue
+            work.pop()
+            if work:
+                low[work[-1][0]] = min(low[work[-1][0]], low[node_id])
+            if low[node_id] == index[node_id]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == node_id:
+                        break
+                if len(component) > 1 or node_id in node_map[node_id]["nextNodes"]:
+                    result.extend(sorted(component))
+    return sorted(result)
+
+
+def content_hash(nodes: List[Dict]) -> str:
+    """
+    校验读取的字段（id、isTensor、isLeaf、children、nextNodes）按id排序后的sha256，这些字段不变则校验结果不变
+
+    只包含整数、布尔值和整数列表，与render_worker.js中JSON.stringify的结果逐字节一致
+    """
+    fields = [[n["id"], n["isTensor"], n["isLeaf"], n["children"], n["nextNodes"]] for n in sorted(nodes, key=lambda n: n["id"])]
+    return hashlib.sha256(json.dumps(fields, separators=(",", ":")).encode()).hexdigest()
+
+
+def stamp_complex_json(nodes: List[Dict]) -> Dict:
+    """
+    校验complex_graph并加上内容哈希和validated标记，可视化时遇到validated的数据可跳过校验
+
+    :raises ValueError: 校验不通过时抛出，信息中包含出错的节点
+    """
+    issues = validate_complex_graph(nodes)
+    if issues:
+        raise ValueError(f"illegal complex graph: {format_issues(issues)}")
+    return {
+        "validated": True,
+        "validation_version": validation_version,
+        "content_hash": content_hash(nodes),
+        "nodes": nodes,
+    }
+
+
+def read_complex_json(data: Union[List[Dict], Dict]) -> Tuple[List[Dict], bool]:
+    """
+    读取complex_graph.json/complex_graph_dedup.json的内容，兼容各个版本的格式：
+    1、未加标记的节点列表（最早的格式）
+    2、{"validated", "validation_version", "content_hash", "nodes"}（stamp_complex_json）
+    3、去重格式{"version", "nodes", "templates"}，可带有2中的标记（core.structural_hash.dedup_complex_json）
+
+    :return: (节点列表, 标记是否可信)，只有校验版本一致且重新计算的content_hash与标记一致时可信，否则调用方应重新校验
+    """
+    if isinstance(data, list):
+        return data, False
+    nodes = expand_dedup_json(data) if "templates" in data else data["nodes"]
+    trusted = bool(data.get("validated")) and data.get("validation_version") == validation_version \
+        and data.get("content_hash") == content_hash(nodes)
+    return nodes, trusted
+
+
+def format_issues(issues: List[Dict], limit: int = 20) -> str:
+    lines = [f'node {issue["node"]}: {issue["rule"]}' for issue in issues[:limit]]
+    if len(issues) > limit:
+        lines.append(f"... {len(issues) - limit} more")
+    return "; ".join(lines)
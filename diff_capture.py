@@ -0,0 +1,80 @@
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from core.capture import load_capture
+from core.capture_diff import (
+    annotate_complex_json,
+    check_regressions,
+    complex_json_to_diff_dot,
+    diff_captures,
+    top_changes,
+)
+from core.json_to_complex_json import json_to_complex_json
+
+
+def main(base_dir: str, new_dir: str, out_dir: str, thresholds: dict, per_module: bool,
+         min_module_duration: int, render: bool) -> int:
+    base_graph, base_tree = load_capture(base_dir)
+    new_graph, new_tree = load_capture(new_dir)
+    report = diff_captures(base_graph, base_tree, new_graph, new_tree)
+
+    folder_path = Path(out_dir)
+    folder_path.mkdir(parents=True, exist_ok=True)
+    with open(folder_path / 'diff.json', 'w') as f:
+        json.dump(report, f, indent=4)
+        print(f"Generated {folder_path / 'diff.json'}")
+
+    complex_nodes = annotate_complex_json(json_to_complex_json(new_graph, new_tree), report)
+    with open(folder_path / 'diff_complex_graph.json', 'w') as f:
+        json.dump(complex_nodes, f, indent=4)
+        print(f"Generated {folder_path / 'diff_complex_graph.json'}")
+
+    with open(folder_path / 'diff_graph.dot', 'w') as f:
+        f.write(complex_json_to_diff_dot(complex_nodes, report))
+    if render:
+        subprocess.run(['dot', '-Tsvg', str(folder_path / 'diff_graph.dot'), '-o', str(folder_path / 'diff_graph.svg')], check=True)
+        print(f"Generated {folder_path / 'diff_graph.svg'}")
+
+    summary = report["summary"]
+    for key in ["duration", "op_time", "peak_memory", "tensor_bytes"]:
+        ratio = summary["delta"][f"{key}_ratio"]
+        ratio_str = f"{ratio:+.2%}" if ratio is not None else "n/a"
+        print(f"{key:>14}: {summary['base'][key]} -> {summary['new'][key]} ({ratio_str})")
+    print("top op duration changes:")
+    for path, delta in top_changes(report, "duration", "ops", limit=5):
+        print(f"    {delta:+d}ns  {path}")
+
+    violations = check_regressions(report, thresholds, per_module, min_module_duration)
+    for violation in violations:
+        print(f"REGRESSION: {violation}")
+    return 1 if violations else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="diff two captures and gate on regressions")
+
+    parser.add_argument("--base", type=str, help="baseline capture dir, e.g. ./data/ResNet", required=True)
+    parser.add_argument("--new", type=str, help="new capture dir", required=True)
+    parser.add_argument("--out", type=str, default='./diff', help="output dir, keep it outside ./data so app.py does not list it as a capture", required=False)
+    parser.add_argument("--max-duration-increase", type=float, default=None, help="max relative increase of the step's wall-clock span (includes gaps between ops)", required=False)
+    parser.add_argument("--max-op-time-increase", type=float, default=None, help="max relative increase of the summed op time, e.g. 0.1", required=False)
+    parser.add_argument("--max-peak-memory-increase", type=float, default=None, help="max relative peak memory increase", required=False)
+    parser.add_argument("--max-tensor-bytes-increase", type=float, default=None, help="max relative tensor bytes increase", required=False)
+    parser.add_argument("--per-module", action="store_true", help="also apply thresholds to every matched module and report added modules/ops")
+    parser.add_argument("--min-module-duration", type=int, default=0, help="ignore modules shorter than this (ns) in per-module checks", required=False)
+    parser.add_argument("--render", action="store_true", help="render diff_graph.svg with graphviz")
+
+    args = parser.parse_args()
+
+    thresholds = {
+        key: value for key, value in [
+            ("duration", args.max_duration_increase),
+            ("op_time", args.max_op_time_increase),
+            ("peak_memory", args.max_peak_memory_increase),
+            ("tensor_bytes", args.max_tensor_bytes_increase),
+        ] if value is not None
+    }
+    sys.exit(main(args.base, args.new, args.out, thresholds, args.per_module, args.min_module_duration, args.render))
@@ -1,6 +1,7 @@
 # import包
 import torch
 import torch.profiler as profiler
+from hijack_function.hijack_profiler import capture_trace_handler, profiler_options
 from transformers import GPT2LMHeadModel, GPT2Tokenizer
 from torch.utils.data import DataLoader
 
@@ -38,7 +39,7 @@ def create_dataset(model_path, data_path):
     return dataset
 
 
-def train():
+def train(preset="default"):
     model_path = "./gpt2_source/gpt2"
     data_path = "./gpt2_source/data/sample.txt"
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
@@ -53,31 +54,11 @@ def train():
 
     model.train()
 
-    def trace_handler(prof: torch.profiler.profile):
-        file_name = "prof_result"
-        # prof.export_chrome_trace(f"{file_name}.json")
-        prof.export_memory_timeline(f"{file_name}.html", device="cuda:0")
-        import os
-        file_path = f"{file_name}.html"
-        try:
-            os.remove(file_path)
-            print(f"{file_path} has been delete.")
-        except FileNotFoundError:
-            print(f"{file_path} not exist.")
-        except PermissionError:
-            print(f"No permission to delete {file_path}.")
-
     # Profiler 配置
     prof = profiler.profile(
-        activities=[
-            profiler.ProfilerActivity.CPU,
-            profiler.ProfilerActivity.CUDA
-        ],
+        **profiler_options(preset),
         schedule=profiler.schedule(wait=0, warmup=2, active=1, repeat=1),
-        on_trace_ready=trace_handler,
-        record_shapes=True,
-        with_stack=True,
-        profile_memory=True,
+        on_trace_ready=capture_trace_handler,
     )
 
     with prof:
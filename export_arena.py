@@ -0,0 +1,43 @@
+import argparse
+import json
+import time
+from pathlib import Path
+
+from core.arena import lifetime_modes, plan_arena
+from core.capture import load_capture
+
+
+def main(capture_dir: str, out_dir: str, device: str, lifetime: str, alignment: int):
+    graph_data, _ = load_capture(capture_dir)
+    t0 = time.perf_counter()
+    plan = plan_arena(graph_data, device, lifetime, alignment)
+    elapsed = time.perf_counter() - t0
+
+    folder_path = Path(out_dir)
+    folder_path.mkdir(parents=True, exist_ok=True)
+    with open(folder_path / 'arena.json', 'w') as f:
+        json.dump(plan, f)
+        print(f"Generated {folder_path / 'arena.json'}")
+
+    print(f"{plan['num_tensors']} transient tensors planned in {elapsed:.2f} s ({plan['lifetime']} lifetimes, {plan['alignment']} B alignment)")
+    print(f"lower bound (max live)  {plan['lower_bound'] / 1e6:>12.2f} MB")
+    for name, size in plan["strategies"].items():
+        print(f"{name:<24}{size / 1e6:>12.2f} MB")
+    print(f"arena ({plan['strategy']}) is {plan['fragmentation'] * 100:.1f}% above the lower bound")
+    print(f"persistent              {plan['persistent_bytes'] / 1e6:>12.2f} MB")
+    print(f"planned peak            {plan['planned_peak'] / 1e6:>12.2f} MB")
+    print(f"observed peak           {plan['observed_peak'] / 1e6:>12.2f} MB")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="pack transient tensors into one static arena and compare its size with the observed peak and the max-live lower bound")
+
+    parser.add_argument("--capture", type=str, help="capture dir, e.g. ./data/GPT2", required=True)
+    parser.add_argument("--out", type=str, default=None, help="output dir, defaults to the capture dir", required=False)
+    parser.add_argument("--device", type=str, default=None, help="only plan tensors on this device, e.g. cuda:0", required=False)
+    parser.add_argument("--lifetime", type=str, default="allocation", choices=lifetime_modes, help="allocation: profiler alloc/free times, usage: first producer to last consumer", required=False)
+    parser.add_argument("--alignment", type=int, default=512, help="round tensor sizes up to this many bytes", required=False)
+
+    args = parser.parse_args()
+
+    main(args.capture, args.out or args.capture, args.device, args.lifetime, args.alignment)
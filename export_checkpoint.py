@@ -0,0 +1,55 @@
+import argparse
+import json
+from pathlib import Path
+
+from core.capture import load_capture
+from core.checkpoint import plan_checkpoints
+
+
+def main(capture_dir: str, out_dir: str, budget_gb: float, device: str, top: int):
+    graph_data, tree_data = load_capture(capture_dir)
+    plan = plan_checkpoints(graph_data, tree_data, int(budget_gb * 1e9) if budget_gb else None, device)
+
+    folder_path = Path(out_dir)
+    folder_path.mkdir(parents=True, exist_ok=True)
+    with open(folder_path / 'checkpoint.json', 'w') as f:
+        json.dump(plan, f, indent=4)
+        print(f"Generated {folder_path / 'checkpoint.json'}")
+
+    print(f"base peak {plan['base_peak'] / 1e6:.2f} MB, step {plan['base_step_time'] / 1e6:.2f} ms")
+    print(f"{'candidate':<80}{'saved MB':>10}{'recompute ms':>14}")
+    for c in plan["candidates"][:top]:
+        print(f'{c["path"][-78:]:<80}{c["saved_bytes"] / 1e6:>10.2f}{c["recompute_time"] / 1e6:>14.3f}')
+
+    # 只打印峰值比之前所有点都低的点（取舍曲线的前沿），完整曲线见checkpoint.json
+    print(f"{'modules':>8}{'peak MB':>12}{'step ms':>12}")
+    lowest = None
+    for point in plan["curve"]:
+        if lowest is None or point["peak"] < lowest:
+            lowest = point["peak"]
+            print(f'{len(point["modules"]):>8}{point["peak"] / 1e6:>12.2f}{point["step_time"] / 1e6:>12.2f}')
+
+    if plan["budget"] is not None:
+        selected = plan["selected"]
+        if selected is None:
+            print(f"no checkpoint plan fits {plan['budget'] / 1e6:.2f} MB")
+            return
+        # 每行一个module路径，交给训练脚本映射到torch.utils.checkpoint
+        with open(folder_path / 'checkpoint_modules.txt', 'w') as f:
+            f.write("".join(f"{path}\n" for path in selected["modules"]))
+            print(f"Generated {folder_path / 'checkpoint_modules.txt'}")
+        print(f"selected {len(selected['modules'])} modules: peak {selected['peak'] / 1e6:.2f} MB, step {selected['step_time'] / 1e6:.2f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="choose modules to activation-checkpoint under a memory budget and report the peak memory / step time trade-off")
+
+    parser.add_argument("--capture", type=str, help="capture dir, e.g. ./data/GPT2", required=True)
+    parser.add_argument("--out", type=str, default=None, help="output dir, defaults to the capture dir", required=False)
+    parser.add_argument("--budget", type=float, default=None, help="peak memory budget in GB", required=False)
+    parser.add_argument("--device", type=str, default=None, help="only count tensors on this device, e.g. cuda:0", required=False)
+    parser.add_argument("--top", type=int, default=10, help="number of candidates to print", required=False)
+
+    args = parser.parse_args()
+
+    main(args.capture, args.out or args.capture, args.budget, args.device, args.top)
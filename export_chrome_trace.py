@@ -0,0 +1,16 @@
+import argparse
+
+from core.chrome_trace import export_chrome_trace
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="export a capture to chrome trace / perfetto json")
+
+    parser.add_argument("--capture", type=str, help="capture dir, e.g. ./data/GPT2", required=True)
+    parser.add_argument("--out", type=str, default=None, help="output file, .json or .json.gz; defaults to <capture>/trace.json.gz", required=False)
+
+    args = parser.parse_args()
+
+    out_path = args.out or f"{args.capture}/trace.json.gz"
+    count = export_chrome_trace(args.capture, out_path)
+    print(f"Generated {out_path} with {count} events, open it in https://ui.perfetto.dev")
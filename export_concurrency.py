@@ -0,0 +1,45 @@
+import argparse
+import json
+from pathlib import Path
+
+from core.capture import load_capture
+from core.concurrency import analyze_concurrency
+
+
+def main(capture_dir: str, out_dir: str, top: int):
+    graph_data, _ = load_capture(capture_dir)
+    report = analyze_concurrency(graph_data, top)
+
+    folder_path = Path(out_dir)
+    folder_path.mkdir(parents=True, exist_ok=True)
+    with open(folder_path / 'concurrency.json', 'w') as f:
+        json.dump(report, f, indent=4)
+        print(f"Generated {folder_path / 'concurrency.json'}")
+
+    if len(report["lanes"]) < 2:
+        print("ops of a single thread only; captures made before thread ids were recorded have no thread field")
+    print(f"{'thread':>16}{'ops':>8}{'busy ms':>10}{'span ms':>10}")
+    for lane in report["lanes"]:
+        print(f'{str(lane["thread"]):>16}{lane["ops"]:>8}{lane["busy"] / 1e6:>10.3f}{(lane["end_time"] - lane["start_time"]) / 1e6:>10.3f}')
+    print(f"{'active threads':>16}{'ms':>10}")
+    for record in report["active_threads"]:
+        print(f'{record["threads"]:>16}{record["time"] / 1e6:>10.3f}')
+    print(f"{'threads':<34}{'overlap ms':>12}{'deps':>8}{'waits':>8}{'wait ms':>10}{'handoff us':>12}")
+    for p in report["pairs"]:
+        threads = " <-> ".join(map(str, p["threads"]))
+        print(f'{threads:<34}{p["overlap"] / 1e6:>12.3f}{p["dependencies"]:>8}{p["waits"]:>8}{p["wait_time"] / 1e6:>10.3f}{p["handoff_latency"] / 1e3:>12.1f}')
+    for w in report["waits"]:
+        print(f'thread {w["thread"]} waited {w["wait_time"] / 1e3:.1f} us for thread {w["waited_for_thread"]}: '
+              f'{w["waited_for_name"]} -> {w["name"]} (handoff {w["handoff_latency"] / 1e3:.1f} us)')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="show when the threads of a capture run ops concurrently and when one waits for another")
+
+    parser.add_argument("--capture", type=str, help="capture dir, e.g. ./data/GPT2", required=True)
+    parser.add_argument("--out", type=str, default=None, help="output dir, defaults to the capture dir", required=False)
+    parser.add_argument("--top", type=int, default=10, help="number of concurrent windows and waits to keep", required=False)
+
+    args = parser.parse_args()
+
+    main(args.capture, args.out or args.capture, args.top)
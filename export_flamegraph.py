@@ -0,0 +1,32 @@
+import argparse
+from pathlib import Path
+
+from core.flamegraph import export_flamegraph, write_collapsed, write_shape_stats
+
+
+def main(capture_dir: str, out_dir: str, bucket_mode: str, top: int):
+    time_stacks, bytes_stacks, shape_stats = export_flamegraph(capture_dir, bucket_mode)
+
+    folder_path = Path(out_dir)
+    folder_path.mkdir(parents=True, exist_ok=True)
+    write_collapsed(time_stacks, str(folder_path / 'flame_self_time.folded'))
+    write_collapsed(bytes_stacks, str(folder_path / 'flame_alloc_bytes.folded'))
+    write_shape_stats(shape_stats, str(folder_path / 'op_shape_stats.tsv'))
+    print(f"Generated {folder_path}/flame_self_time.folded, flame_alloc_bytes.folded, op_shape_stats.tsv")
+
+    print(f"{'name':<40}{'input_shapes':<50}{'count':>8}{'total':>14}{'mean':>14}{'p95':>14}")
+    for row in shape_stats[:top]:
+        print(f'{row["name"]:<40}{row["input_shapes"][:48]:<50}{row["count"]:>8}{row["total"]:>14}{row["mean"]:>14.1f}{row["p95"]:>14}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="export collapsed-stack flamegraphs and op shape statistics")
+
+    parser.add_argument("--capture", type=str, help="capture dir, e.g. ./data/GPT2", required=True)
+    parser.add_argument("--out", type=str, default=None, help="output dir, defaults to the capture dir", required=False)
+    parser.add_argument("--bucket", type=str, default="pow2", choices=["pow2", "exact"], help="input shape bucketing", required=False)
+    parser.add_argument("--top", type=int, default=20, help="number of rows to print", required=False)
+
+    args = parser.parse_args()
+
+    main(args.capture, args.out or args.capture, args.bucket, args.top)
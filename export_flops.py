@@ -0,0 +1,51 @@
+import argparse
+import json
+from pathlib import Path
+
+from core.capture import load_capture
+from core.flops import estimate_capture
+
+
+def _fmt(value, scale=1.0, digits=2):
+    return f"{value / scale:.{digits}f}" if value is not None else "n/a"
+
+
+def main(capture_dir: str, out_dir: str, peak_tflops: float, peak_bandwidth_gbs: float, top: int):
+    graph_data, tree_data = load_capture(capture_dir)
+    peak_flops = peak_tflops * 1e12 if peak_tflops else None
+    peak_bandwidth = peak_bandwidth_gbs * 1e9 if peak_bandwidth_gbs else None
+    report = estimate_capture(graph_data, tree_data, peak_flops, peak_bandwidth)
+
+    folder_path = Path(out_dir)
+    folder_path.mkdir(parents=True, exist_ok=True)
+    with open(folder_path / 'flops.json', 'w') as f:
+        json.dump(report, f, indent=4)
+        print(f"Generated {folder_path / 'flops.json'}")
+
+    summary = report["summary"]
+    print(f"total {_fmt(summary['flops'], 1e9)} GFLOP, {_fmt(summary['bytes'], 1e6)} MB, "
+          f"{_fmt(summary['achieved_flops'], 1e12, 3)} TFLOP/s, intensity {_fmt(summary['arithmetic_intensity'])} FLOP/B")
+    if summary["unestimated"]:
+        print(f"ops without a formula: {', '.join(f'{name}({count})' for name, count in summary['unestimated'].items())}")
+    if summary["unresolved"]:
+        print(f"ops whose operands could not be matched by shape (counted as 0 FLOP): "
+              f"{', '.join(f'{name}({count})' for name, count in summary['unresolved'].items())}")
+
+    print(f"{'module':<70}{'GFLOP':>10}{'MB':>10}{'TFLOP/s':>10}{'FLOP/B':>10}{'bound':>12}")
+    for row in report["modules"][:top]:
+        print(f'{row["path"][-68:]:<70}{_fmt(row["flops"], 1e9):>10}{_fmt(row["bytes"], 1e6):>10}'
+              f'{_fmt(row["achieved_flops"], 1e12, 3):>10}{_fmt(row["arithmetic_intensity"]):>10}{row.get("bound", "-"):>12}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="estimate FLOPs, memory traffic, achieved FLOP/s and arithmetic intensity per op and module")
+
+    parser.add_argument("--capture", type=str, help="capture dir, e.g. ./data/GPT2", required=True)
+    parser.add_argument("--out", type=str, default=None, help="output dir, defaults to the capture dir", required=False)
+    parser.add_argument("--peak-tflops", type=float, default=None, help="hardware peak TFLOP/s, used with --peak-bandwidth to classify compute/bandwidth bound", required=False)
+    parser.add_argument("--peak-bandwidth", type=float, default=None, help="hardware peak memory bandwidth in GB/s", required=False)
+    parser.add_argument("--top", type=int, default=20, help="number of modules to print", required=False)
+
+    args = parser.parse_args()
+
+    main(args.capture, args.out or args.capture, args.peak_tflops, args.peak_bandwidth, args.top)
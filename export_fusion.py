@@ -0,0 +1,51 @@
+import argparse
+import copy
+import json
+from pathlib import Path
+
+from core.capture import load_capture
+from core.fusion import find_fusion_groups, mark_fusion_groups
+from core.json_to_complex_json import json_to_complex_json
+from core.validate import stamp_complex_json
+
+
+def main(capture_dir: str, out_dir: str, min_ops: int, top: int):
+    graph_data, tree_data = load_capture(capture_dir)
+    report = find_fusion_groups(graph_data, tree_data, min_ops)
+
+    folder_path = Path(out_dir)
+    folder_path.mkdir(parents=True, exist_ok=True)
+    with open(folder_path / 'fusion.json', 'w') as f:
+        json.dump(report, f, indent=4)
+        print(f"Generated {folder_path / 'fusion.json'}")
+
+    nodes = json_to_complex_json(graph_data, copy.deepcopy(tree_data))
+    mark_fusion_groups(nodes, graph_data, report)
+    with open(folder_path / 'complex_graph_fusion.json', 'w') as f:
+        json.dump(stamp_complex_json(nodes), f, indent=4)
+        print(f"Generated {folder_path / 'complex_graph_fusion.json'}")
+
+    groups = report["groups"]
+    print(f"{len(groups)} fusion groups, {sum(g['saved_traffic'] for g in groups) / 1e6:.2f} MB traffic, "
+          f"{sum(g['saved_allocations'] for g in groups)} allocations, "
+          f"~{sum(g['estimated_time_saved'] for g in groups) / 1e6:.3f} ms saved")
+    print(f"{'module':<70}{'groups':>8}{'saved MB':>10}{'alloc MB':>10}{'saved ms':>10}")
+    for m in report["modules"][:top]:
+        print(f'{m["module"][-68:]:<70}{len(m["groups"]):>8}{m["saved_traffic"] / 1e6:>10.2f}'
+              f'{m["saved_allocation_bytes"] / 1e6:>10.2f}{m["estimated_time_saved"] / 1e6:>10.3f}')
+    print(f"{'group':>6}{'saved MB':>10}{'saved ms':>10}  ops")
+    for g in groups[:top]:
+        print(f'{g["group"]:>6}{g["saved_traffic"] / 1e6:>10.2f}{g["estimated_time_saved"] / 1e6:>10.3f}  {" -> ".join(g["names"])[:120]}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="find chains of elementwise/normalization ops linked by single-consumer tensors and estimate what fusing them saves")
+
+    parser.add_argument("--capture", type=str, help="capture dir, e.g. ./data/GPT2", required=True)
+    parser.add_argument("--out", type=str, default=None, help="output dir, defaults to the capture dir", required=False)
+    parser.add_argument("--min-ops", type=int, default=2, help="minimum number of non-view ops in a group", required=False)
+    parser.add_argument("--top", type=int, default=10, help="number of modules and groups to print", required=False)
+
+    args = parser.parse_args()
+
+    main(args.capture, args.out or args.capture, args.min_ops, args.top)
@@ -0,0 +1,40 @@
+import argparse
+import json
+from pathlib import Path
+
+from core.capture import load_capture
+from core.memory_category import analyze_memory_categories
+
+
+def main(capture_dir: str, out_dir: str, device: str, top: int):
+    graph_data, tree_data = load_capture(capture_dir)
+    report = analyze_memory_categories(graph_data, tree_data, device)
+
+    folder_path = Path(out_dir)
+    folder_path.mkdir(parents=True, exist_ok=True)
+    with open(folder_path / 'memory_categories.json', 'w') as f:
+        json.dump(report, f)
+        print(f"Generated {folder_path / 'memory_categories.json'}")
+
+    print(f"total peak {report['total_peak'] / 1e6:.2f} MB at {report['total_peak_time']}")
+    print(f"{'category':<20}{'peak MB':>12}{'at total peak MB':>20}{'base MB':>12}")
+    for c in report["categories"]:
+        print(f"{c:<20}{report['peak'][c] / 1e6:>12.2f}{report['at_total_peak'][c] / 1e6:>20.2f}{report['base'][c] / 1e6:>12.2f}")
+
+    print(f"{'module':<70}{'peak MB':>10}  by category at module peak (MB)")
+    for row in report["modules"][:top]:
+        split = ", ".join(f"{c}={v / 1e6:.1f}" for c, v in sorted(row["peak_live_by_category"].items(), key=lambda kv: -kv[1]))
+        print(f'{row["path"][-68:]:<70}{row["peak_live"] / 1e6:>10.2f}  {split}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="per-category live memory timelines and per-module category breakdowns")
+
+    parser.add_argument("--capture", type=str, help="capture dir, e.g. ./data/GPT2", required=True)
+    parser.add_argument("--out", type=str, default=None, help="output dir, defaults to the capture dir", required=False)
+    parser.add_argument("--device", type=str, default=None, help="only count tensors on this device, e.g. cuda:0", required=False)
+    parser.add_argument("--top", type=int, default=10, help="number of modules to print", required=False)
+
+    args = parser.parse_args()
+
+    main(args.capture, args.out or args.capture, args.device, args.top)
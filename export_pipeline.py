@@ -0,0 +1,56 @@
+import argparse
+import copy
+import json
+from pathlib import Path
+
+from core.capture import load_capture
+from core.json_to_complex_json import json_to_complex_json
+from core.pipeline import mark_stages, plan_pipeline
+from core.validate import stamp_complex_json
+
+
+def main(capture_dir: str, out_dir: str, parts: int, microbatches: int, memory_limit_gb: float, bandwidth_gbs: float, granularity: int):
+    graph_data, tree_data = load_capture(capture_dir)
+    plan = plan_pipeline(graph_data, tree_data, parts, microbatches,
+                         int(memory_limit_gb * 1e9) if memory_limit_gb else None,
+                         bandwidth_gbs * 1e9 if bandwidth_gbs else None, granularity)
+
+    folder_path = Path(out_dir)
+    folder_path.mkdir(parents=True, exist_ok=True)
+    with open(folder_path / 'pipeline.json', 'w') as f:
+        json.dump(plan, f, indent=4)
+        print(f"Generated {folder_path / 'pipeline.json'}")
+
+    # json_to_complex_json会修改tree_data，匹配stage时还要用原始的tree
+    nodes = json_to_complex_json(graph_data, copy.deepcopy(tree_data))
+    mark_stages(nodes, tree_data, plan)
+    with open(folder_path / 'complex_graph_pipeline.json', 'w') as f:
+        json.dump(stamp_complex_json(nodes), f, indent=4)
+        print(f"Generated {folder_path / 'complex_graph_pipeline.json'}")
+
+    print(f"{len(plan['units'])} units, bottleneck {plan['bottleneck_time'] / 1e6:.2f} ms, ideal {plan['ideal_time'] / 1e6:.2f} ms, "
+          f"predicted iteration {plan['predicted_iteration_time'] / 1e6:.2f} ms, bubble {plan['bubble_fraction'] * 100:.1f}%")
+    if plan["unattributed_backward_time"]:
+        print(f"backward time not attributed to any module: {plan['unattributed_backward_time'] / 1e6:.2f} ms")
+    print(f"{'stage':>6}{'units':>12}{'fwd ms':>10}{'bwd ms':>10}{'send MB':>10}{'param MB':>10}{'state MB':>10}{'total MB':>10}  first module")
+    for s in plan["stages"]:
+        m = s["memory"]
+        span = f'{s["units"][0]}-{s["units"][1]}'
+        print(f'{s["stage"]:>6}{span:>12}{s["forward_time"] / 1e6:>10.2f}{s["backward_time"] / 1e6:>10.2f}'
+              f'{s["send_bytes"] / 1e6:>10.2f}{m["parameter"] / 1e6:>10.2f}{m["optimizer_state"] / 1e6:>10.2f}{m["total"] / 1e6:>10.2f}  {s["modules"][0][-60:]}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="split the model into pipeline-parallel stages, predict the bubble and per-stage memory")
+
+    parser.add_argument("--capture", type=str, help="capture dir, e.g. ./data/GPT2", required=True)
+    parser.add_argument("--out", type=str, default=None, help="output dir, defaults to the capture dir", required=False)
+    parser.add_argument("--stages", type=int, default=2, help="number of pipeline stages", required=False)
+    parser.add_argument("--microbatches", type=int, default=8, help="micro batches per iteration", required=False)
+    parser.add_argument("--memory-limit", type=float, default=None, help="per-stage limit of parameter+gradient+optimizer state in GB", required=False)
+    parser.add_argument("--bandwidth", type=float, default=None, help="inter-stage bandwidth in GB/s, adds activation/gradient transfer to stage time", required=False)
+    parser.add_argument("--granularity", type=int, default=4, help="expand modules until each unit is below total/(stages*granularity) op time", required=False)
+
+    args = parser.parse_args()
+
+    main(args.capture, args.out or args.capture, args.stages, args.microbatches, args.memory_limit, args.bandwidth, args.granularity)
@@ -0,0 +1,50 @@
+import argparse
+import json
+from pathlib import Path
+
+from core.capture import load_capture
+from core.transfer import find_transfers
+
+
+def _bandwidth(value) -> str:
+    # 字节/纳秒即GB/s
+    return f"{value:.2f}" if value is not None else "-"
+
+
+def main(capture_dir: str, out_dir: str, top: int):
+    graph_data, tree_data = load_capture(capture_dir)
+    report = find_transfers(graph_data, tree_data)
+
+    folder_path = Path(out_dir)
+    folder_path.mkdir(parents=True, exist_ok=True)
+    with open(folder_path / 'transfers.json', 'w') as f:
+        json.dump(report, f, indent=4)
+        print(f"Generated {folder_path / 'transfers.json'}")
+
+    transfers = report["transfers"]
+    if not transfers:
+        print("no cross-device copies found; capture with --devices='*' to keep host tensors")
+        return
+    print(f"{'direction':<10}{'count':>7}{'MB':>10}{'ms':>10}{'GB/s':>8}{'overlap':>9}{'pinned':>8}{'pageable':>10}")
+    for d in report["directions"]:
+        print(f'{d["direction"]:<10}{d["count"]:>7}{d["bytes"] / 1e6:>10.2f}{d["duration"] / 1e6:>10.3f}{_bandwidth(d["bandwidth"]):>8}'
+              f'{d["overlapped"]:>9}{d["pinned"]:>8}{d["pageable"]:>10}')
+    print(f"{'module':<70}{'count':>7}{'MB':>10}{'ms':>10}{'GB/s':>8}")
+    for m in report["modules"][:top]:
+        print(f'{m["module"][-68:]:<70}{m["count"]:>7}{m["bytes"] / 1e6:>10.2f}{m["duration"] / 1e6:>10.3f}{_bandwidth(m["bandwidth"]):>8}')
+    print(f"{'op':>8}  {'direction':<10}{'MB':>10}{'us':>10}{'GB/s':>8}  {'memory':<9}{'non_blocking':<14}overlap")
+    for t in sorted(transfers, key=lambda t: t["duration"], reverse=True)[:top]:
+        print(f'{t["op"]:>8}  {t["direction"]:<10}{t["bytes"] / 1e6:>10.2f}{t["duration"] / 1e3:>10.1f}{_bandwidth(t["bandwidth"]):>8}  '
+              f'{t["memory"]:<9}{str(t["non_blocking"]):<14}{t["overlapped_ops"]} ops, {t["overlapped_time"] / 1e3:.1f} us')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="list host<->device copies with bytes, duration, effective bandwidth, overlap with compute and pinned/pageable host memory")
+
+    parser.add_argument("--capture", type=str, help="capture dir, e.g. ./data/GPT2", required=True)
+    parser.add_argument("--out", type=str, default=None, help="output dir, defaults to the capture dir", required=False)
+    parser.add_argument("--top", type=int, default=10, help="number of modules and transfers to print", required=False)
+
+    args = parser.parse_args()
+
+    main(args.capture, args.out or args.capture, args.top)
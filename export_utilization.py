@@ -0,0 +1,53 @@
+import argparse
+import json
+from pathlib import Path
+
+from core.capture import load_capture
+from core.utilization import analyze_utilization
+
+
+def main(capture_dir: str, out_dir: str, min_gap_us: float, top: int):
+    graph_data, tree_data = load_capture(capture_dir)
+    report = analyze_utilization(graph_data, tree_data, int(min_gap_us * 1e3))
+
+    folder_path = Path(out_dir)
+    folder_path.mkdir(parents=True, exist_ok=True)
+    with open(folder_path / 'utilization.json', 'w') as f:
+        json.dump(report, f, indent=4)
+        print(f"Generated {folder_path / 'utilization.json'}")
+
+    if report["window"] is None:
+        print("no ops in capture")
+        return
+    start, end = report["window"]
+    print(f"window {(end - start) / 1e6:.3f} ms")
+    print(f"{'device':<12}{'thread':>8}{'busy ms':>10}{'idle ms':>10}{'util':>8}{'gaps':>7}{'longest us':>12}")
+    # 没有线程信息时每个设备只有一个线程，不重复打印
+    lanes = report["lanes"] if any(lane["thread"] is not None for lane in report["lanes"]) else []
+    for lane in report["devices"] + lanes:
+        thread = lane.get("thread", "all")
+        print(f'{lane["device"]:<12}{str(thread):>8}{lane["busy"] / 1e6:>10.3f}{lane["idle"] / 1e6:>10.3f}'
+              f'{lane["utilization"] * 100:>7.1f}%{lane["num_gaps"]:>7}{lane["longest_gap"] / 1e3:>12.1f}')
+
+    devices = [d["device"] for d in report["devices"]]
+    print(f"{'phase':<24}{'ms':>10}" + "".join(f"{d:>12}" for d in devices))
+    for phase in report["phases"]:
+        print(f'{phase["phase"]:<24}{phase["duration"] / 1e6:>10.3f}' + "".join(f'{phase["utilization"][d] * 100:>11.1f}%' for d in devices))
+
+    print(f"{'device':<12}{'idle us':>10}  {'phase':<24}{'between':<50}module")
+    for gap in report["gaps"][:top]:
+        between = f'{gap["before"]} -> {gap["after"]}'
+        print(f'{gap["device"]:<12}{gap["duration"] / 1e3:>10.1f}  {gap["phase"]:<24}{between[:48]:<50}{gap["module"][-60:]}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="find idle gaps between ops on each device and thread, attribute them to modules/phases and report utilization per phase")
+
+    parser.add_argument("--capture", type=str, help="capture dir, e.g. ./data/GPT2", required=True)
+    parser.add_argument("--out", type=str, default=None, help="output dir, defaults to the capture dir", required=False)
+    parser.add_argument("--min-gap", type=float, default=0, help="do not list gaps shorter than this many microseconds", required=False)
+    parser.add_argument("--top", type=int, default=10, help="number of gaps to print", required=False)
+
+    args = parser.parse_args()
+
+    main(args.capture, args.out or args.capture, args.min_gap, args.top)
@@ -1,38 +1,74 @@
 import json
+from pathlib import Path
+from core.extractor import DeviceFilter, ModuleFilter, rebuild_from_snapshot, snapshot_file
 from core.json_to_complex_json import json_to_complex_json
+from core.structural_hash import dedup_complex_json, dedup_stats
+from core.validate import stamp_complex_json
 import argparse
 
-def main(model = 'DNN'):
-    # 劫持profiler函数
-    from hijack_function.hijack_profiler import hijack_profiler
-    hijack_profiler(model)
-
-    # 跑训练过程，获取原始的json格式数据
-    if model == 'DNN':
-        from examples.DNN.model import train
-        train()
-    elif model == 'ResNet':
-        from examples.ResNet.model import train
-        train()
-    elif model == 'GPT2':
-        from examples.GPT2.model import train
-        train()
-        
+def train_and_capture(model, include = None, exclude = None, devices = None, live_url = None, preset = "default"):
+    # 劫持profiler函数，采集结束后自动恢复
+    from hijack_function.hijack_profiler import capture
+    with capture(model, './data', include, exclude, devices, live_url):
+        # 跑训练过程，获取原始的json格式数据
+        if model == 'DNN':
+            from examples.DNN.model import train
+            train(preset)
+        elif model == 'ResNet':
+            from examples.ResNet.model import train
+            train(preset)
+        elif model == 'GPT2':
+            from examples.GPT2.model import train
+            train(preset)
+
+
+def main(model = 'DNN', dedup = False, include = None, exclude = None, from_snapshot = False, devices = None, live_url = None,
+         preset = "default"):
+    folder_path = Path(f'./data/{model}')
+    if from_snapshot and (folder_path / snapshot_file).exists():
+        # 不重新训练，提取器版本或过滤条件变化时从快照重新生成graph.json/tree.json
+        if rebuild_from_snapshot(folder_path, ModuleFilter(include, exclude), device_filter=DeviceFilter(devices)):
+            print(f"Rebuilt {folder_path}/graph.json and tree.json from {snapshot_file}")
+        else:
+            print(f"{folder_path}/graph.json and tree.json are up to date with {snapshot_file}")
+    else:
+        if from_snapshot:
+            print(f"No {snapshot_file} in {folder_path}, training to capture")
+        train_and_capture(model, include, exclude, devices, live_url, preset)
+
     with open(f'./data/{model}/graph.json', 'r') as graph_json_file, open(f'./data/{model}/tree.json', 'r') as tree_json_file:
         graph_data = json.load(graph_json_file)
         tree_data = json.load(tree_json_file)
         json_content = json_to_complex_json(graph_data, tree_data)
 
+        # 校验通过后写入内容哈希和validated标记，可视化时不再重复校验
+        stamped_content = stamp_complex_json(json_content)
         with open(f'./data/{model}/complex_graph.json', "w") as json_file:
-            json.dump(json_content, json_file, indent=4)
+            json.dump(stamped_content, json_file, indent=4)
             print(f"Generated ./data/{model}/complex_graph.json")
 
+        # 结构相同的module实例只保存一份模板
+        if dedup:
+            dedup_content = dedup_complex_json(json_content)
+            dedup_content.update({k: v for k, v in stamped_content.items() if k != "nodes"})
+            with open(f'./data/{model}/complex_graph_dedup.json', "w") as json_file:
+                json.dump(dedup_content, json_file)
+                print(f"Generated ./data/{model}/complex_graph_dedup.json, {dedup_stats(json_content, dedup_content)}")
+
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="model_name")
 
     parser.add_argument("--model", type=str, help="model name", required=True)
+    parser.add_argument("--dedup", action="store_true", help="also write complex_graph_dedup.json with repeated blocks stored once")
+
+    parser.add_argument("--include", type=str, nargs="*", default=None, help="only capture modules whose path matches these patterns, e.g. '*GPT2SdpaAttention_0'", required=False)
+    parser.add_argument("--exclude", type=str, nargs="*", default=None, help="skip modules whose path matches these patterns", required=False)
+    parser.add_argument("--devices", type=str, nargs="*", default=None, help="keep tensors on devices matching these patterns, e.g. '*' to also keep cpu tensors (default: all but cpu)", required=False)
+    parser.add_argument("--live", type=str, default=None, help="push each captured step to a running app.py, e.g. http://127.0.0.1:5000", required=False)
+    parser.add_argument("--preset", type=str, default="default", choices=["dataflow", "default", "full"], help="profiler options to enable, see hijack_function.hijack_profiler.capture_presets", required=False)
+    parser.add_argument("--from-snapshot", action="store_true", help="rebuild outputs from the saved profiler snapshot instead of training again")
 
     args = parser.parse_args()
 
-    main(args.model)
\ No newline at end of file
+    main(args.model, args.dedup, args.include, args.exclude, args.from_snapshot, args.devices, args.live, args.preset)
\ No newline at end of file
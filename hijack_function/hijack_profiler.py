@@ -1,43 +1,46 @@
 from torch.profiler._memory_profiler import (
     MemoryProfile,
-    DataFlowGraph,
-    CategoryDict,
-    SizeMap,
     TensorKey,
     Category,
     OpTree,
-    TensorAndID,
     SchemaMatcher,
 )
 from torch._C._profiler import (
     _EventType,
-    _ExtraFields_Allocation,
-    _ExtraFields_TorchOp,
     _ProfilerEvent,
     _TensorMetadata,
     RecordScope,
 )
 from typing import (
     Any,
-    cast,
-    DefaultDict,
     Dict,
-    Iterator,
     List,
     Optional,
-    Set,
     Tuple,
-    Union,
 )
-from collections import defaultdict, deque
 import torch
-from torch.profiler import _utils
-import json
 from pathlib import Path
-import weakref
-
-
-node_id_map = weakref.WeakKeyDictionary()
+import threading
+import time
+
+from core.live import LiveStream
+
+from core.extractor import (
+    EVENT_ALLOCATION,
+    EVENT_OTHER,
+    EVENT_PY_CALL,
+    EVENT_TORCH_OP,
+    FLAG_BACKWARD_FUNCTION,
+    FLAG_SCHEMA_MATCHED,
+    DeviceFilter,
+    ModuleFilter,
+    Snapshot,
+    extract,
+    save_snapshot,
+    snapshot_format_version,
+    transfer_op_args,
+    write_capture,
+)
 
 
 def _element_size(dtype):
@@ -58,352 +61,274 @@ def _element_size(dtype):
         return torch.iinfo(dtype).bits >> 3
 
 
-class TimeMap:
-    def __init__(self, op_tree: OpTree) -> None:
-        self._values: Dict[TensorKey, List[int]] = {}
-        for node in op_tree.sorted_nodes:
-            if node.typed[0] == _EventType.Allocation:
-                alloc_fields = node.typed[1]
-                key = TensorKey.from_allocation(alloc_fields)
-                if key:
-                    if key not in self._values:
-                        self._values[key] = [-1, -1]
-                    if alloc_fields.alloc_size > 0:
-                        self._values[key][0] = node.start_time_ns
-                    else:
-                        self._values[key][1] = node.start_time_ns
-    
-    def GetStartTime(self, key: TensorKey) -> int:
-        if key in self._values:
-            return self._values[key][0]
-        else:
-            return -1
-    
-    def GetEndTime(self, key: TensorKey) -> int:
-        if key in self._values:
-            return self._values[key][1]
-        else:
-            return -1
-
-
-class TensorInfoMap:
-    def __init__(self, data_flow_graph: DataFlowGraph) -> None:
-        self._shapeMap: Dict[TensorAndID, str] = {}
-        self._dtypeMap: Dict[TensorAndID, str] = {}
-        
-        def FindTensorAndID(key: Optional[TensorKey], set: Set[TensorAndID]) -> Optional[TensorAndID]:
-            if key is None:
-                return None
-            for tensorAndId in set:
-                if key == tensorAndId[0]:
-                    return tensorAndId
-            return None
-            
-        for node in data_flow_graph._flow_nodes:
-            input_tensor_versions: Set[TensorAndID] = set()
-            input_tensor_versions.update(((k, v) for k, (_, v) in node.inputs.items()))
-            
-            output_tensor_versions: Set[TensorAndID] = set()
-            output_tensor_versions.update(((k, v) for (k, v) in node.outputs.items() if v != 0))
-            
-            subtree = tuple(_utils.traverse_dfs([node._event]))
-            op_list = [i.typed[1] for i in subtree if i.typed[0] == _EventType.TorchOp]
-            for op in op_list:
-                for op_input in op.inputs:
-                    # Tensor
-                    if isinstance(op_input, _TensorMetadata):
-                        key = TensorKey.from_tensor(op_input)
-                        key_and_version = FindTensorAndID(key, input_tensor_versions)
-                        if key_and_version is not None:
-                            self._shapeMap.setdefault(key_and_version, ",".join(map(str, op_input.sizes)))
-                            self._dtypeMap.setdefault(key_and_version, str(op_input.dtype))
-
-                    # TensorList
-                    elif isinstance(op_input, list):
-                        for op_input_i in op_input:
-                            key = TensorKey.from_tensor(op_input_i)
-                            key_and_version = FindTensorAndID(key, input_tensor_versions)
-                            if key_and_version is not None:
-                                self._shapeMap.setdefault(key_and_version, ",".join(map(str, op_input_i.sizes)))
-                                self._dtypeMap.setdefault(key_and_version, str(op_input_i.dtype))
-
-            for op in reversed(op_list):
-                for op_input in op.inputs:
-                    # Tensor
-                    if isinstance(op_input, _TensorMetadata):
-                        key = TensorKey.from_tensor(op_input)
-                        key_and_version = FindTensorAndID(key, output_tensor_versions)
-                        if key_and_version is not None:
-                            self._shapeMap.setdefault(key_and_version, ",".join(map(str, op_input.sizes)))
-                            self._dtypeMap.setdefault(key_and_version, str(op_input.dtype))
-
-                    # TensorList
-                    elif isinstance(op_input, list):
-                        for op_input_i in op_input:
-                            key = TensorKey.from_tensor(op_input_i)
-                            key_and_version = FindTensorAndID(key, output_tensor_versions)
-                            if key_and_version is not None:
-                                self._shapeMap.setdefault(key_and_version, ",".join(map(str, op_input_i.sizes)))
-                                self._dtypeMap.setdefault(key_and_version, str(op_input_i.dtype))
-
-    def getShape(self, key: TensorAndID) -> str:
-        if key in self._shapeMap:
-            return "[" + self._shapeMap[key] + "]"
-        else:
-            return "[]"
-    
-    def getDtype(self, key: TensorAndID) -> str:
-        if key in self._dtypeMap:
-            return self._dtypeMap[key]
-        else:
-            return "unknown"
-
-def graph_to_json(
-    graph: DataFlowGraph,
-    category: CategoryDict,
-    sizeMap: SizeMap,
-    timeMap: TimeMap,
-    tensorInfoMap: TensorInfoMap,
-) -> Tuple[List[Dict], List[int]]:
-    graph_id_list: List[int] = []
-    json_list: List[Dict] = []
-    _CATEGORY_TO_STRING = {
-        Category.PARAMETER: "parameter",
-        Category.OPTIMIZER_STATE: "optimizer_state",
-        Category.INPUT: "input",
-        Category.TEMPORARY: "temporary",
-        Category.ACTIVATION: "activation",
-        Category.GRADIENT: "gradient",
-        Category.AUTOGRAD_DETAIL: "autograd_detail",
-    }
-    for node in graph.flow_nodes:
-        # 过滤掉Allocation节点（这些节点基本是free事件）
-        if node._event.typed[0] != _EventType.TorchOp:
-            continue
+_CATEGORY_TO_STRING = {
+    Category.PARAMETER: "parameter",
+    Category.OPTIMIZER_STATE: "optimizer_state",
+    Category.INPUT: "input",
+    Category.TEMPORARY: "temporary",
+    Category.ACTIVATION: "activation",
+    Category.GRADIENT: "gradient",
+    Category.AUTOGRAD_DETAIL: "autograd_detail",
+}
+
+# 采集预设，开销见benchmarks.capture_overhead
+# 所有预设都需要record_shapes和profile_memory：torch只在两者都打开时为tensor分配id，否则TensorKey.from_tensor返回None，
+# graph.json中没有数据流（没有tensor的op也不会导出）
+# dataflow: op、tensor的shape/size/申请释放时间和数据流，没有module树（tree.json中op都是根节点）；
+#           可用于FLOP估算、融合、拷贝、空闲/并发分析、内存category、arena，按module汇总的分析没有module可汇总
+# default: 再加with_stack，由python tracer得到module树（流水线切分、activation checkpoint、去重、按module对比），即示例默认的选项
+# full: 再加with_flops，profiler统计的FLOP数（export_flops优先使用）
+# CPU上ResNet示例采集10步（单核，torch 2.5.1）：trace处理耗时dataflow 15.6 s、default 19.5 s、full 21.0 s，每步耗时的膨胀在噪声范围内
+capture_presets = {
+    "dataflow": {"record_shapes": True, "with_stack": False, "profile_memory": True, "with_flops": False},
+    "default": {"record_shapes": True, "with_stack": True, "profile_memory": True, "with_flops": False},
+    "full": {"record_shapes": True, "with_stack": True, "profile_memory": True, "with_flops": True},
+}
+
+
+def profiler_options(preset: str = "default") -> Dict[str, Any]:
+    """
+    返回torch.profiler.profile的参数，与schedule、on_trace_ready一起使用：
+        torch.profiler.profile(**profiler_options("dataflow"), schedule=..., on_trace_ready=capture_trace_handler)
+
+    提取只用到CPU侧的事件；有CUDA时同时开启CUDA activity，与示例一致
+    """
+    if preset not in capture_presets:
+        raise ValueError(f"unknown capture preset {preset}, expected one of {list(capture_presets)}")
+    options: Dict[str, Any] = dict(capture_presets[preset])
+    activities = [torch.profiler.ProfilerActivity.CPU]
+    if torch.cuda.is_available():
+        activities.append(torch.profiler.ProfilerActivity.CUDA)
+    options["activities"] = activities
+    return options
 
-        node_dict = {}
-        
-        # 没有展示绝对时间，而是使用一个递增的id，由于遍历是按时间顺序遍历，因此id顺序即为时间顺序
-        node_dict['id'] = node_id_map[node._event]
-        node_dict['name'] = node._event.name
-        node_dict['start_time'] = node._event.start_time_ns
-        node_dict['end_time'] = node._event.end_time_ns
-        
-        # 暂时不考虑展示intermediate中间tensor，只展示输入输出tensor
-        def edge_to_dict(key: TensorKey, version: int):
-            # 不展示cpu上的tensor
-            if key.device.type != "cpu":
-                return {
-                    "id": key.id,
-                    "version": version,
-                    "device": f"{key.device.type}:{key.device.index}",
-                    "shape": f"{tensorInfoMap.getShape((key, version))}",
-                    "dtype": f"{tensorInfoMap.getDtype((key, version))}",
-                    "size": sizeMap[key],
-                    "start_time": timeMap.GetStartTime(key),
-                    "end_time": timeMap.GetEndTime(key),
-                    "category": _CATEGORY_TO_STRING[c] if (c := category.get(key, version)) is not None else "unknown"
-                    # 还需要补充哪些信息，如生命周期
-                }
-
-        node_dict['in_edges'] = [res for k, (_, v) in node.inputs.items()
-                                 if (res := edge_to_dict(k, v)) is not None]
-        node_dict['out_edges'] = [res for k, v in node.outputs.items()
-                                  if (res := edge_to_dict(k, v)) is not None]
-
-        # 只保留有在device上计算的算子
-        if node_dict['in_edges'] or node_dict['out_edges']:
-            json_list.append(node_dict)
-            graph_id_list.append(node_id_map[node._event])
-
-    
-    return json_list, graph_id_list
-
-
-class Node:
-    def __init__(self, id: int, name: str, start_time: int, end_time: int, is_leaf: bool, scope: str, parent: Optional[int] = None):
-        self.id = id
-        self.name = name
-        self.start_time = start_time
-        self.end_time = end_time
-        self.is_leaf = is_leaf
-        self.scope = scope
-        self.parent = parent
-        self.children = []
 
+_EVENT_KIND = {
+    _EventType.TorchOp: EVENT_TORCH_OP,
+    _EventType.PyCall: EVENT_PY_CALL,
+    _EventType.Allocation: EVENT_ALLOCATION,
+}
 
-def filter_tree(nodes: List[Dict], leaf_id_list: List[int], id_list: List[int]) -> List[Dict]:
+
+def take_snapshot(memory_profile: MemoryProfile, profiler_result: Optional[Any] = None) -> Dict:
     """
-    过滤树节点：
-    1. 去除叶子节点不在id_list中的节点
-    2. 去除子树中无叶子节点的非叶节点
-
-    :param nodes: 节点列表，每个节点包含id, children, parent
-    :param leaf_id_list: 所有叶子节点的ID列表
-    :param id_list: 需要保留的叶子节点ID列表
-    :return: 过滤后的节点列表
+    将MemoryProfile中提取用到的输入转换为与torch无关的快照，格式见core.extractor.Snapshot
+
+    SchemaMatcher.match_schemas只在这里对每个op调用一次，结果记录在事件标记位中
+
+    :param profiler_result: 构建MemoryProfile的kineto结果，profiler开启with_flops时从中取出每个op的FLOP数
     """
-    # 转换为字典格式便于查找
-    node_dict = {node['id']: node for node in nodes}
-    valid_leaf_ids = set(leaf_id_list) & set(id_list)  # 需要保留的叶子节点
-
-    # 第一步：标记所有有效叶子节点的祖先路径
-    valid_nodes = set()
-
-    # 从有效叶子节点向上追溯父节点
-    for leaf_id in valid_leaf_ids:
-        current_id = leaf_id
-        while current_id in node_dict:
-            if current_id in valid_nodes:
-                break  # 已经处理过这个分支
-            valid_nodes.add(current_id)
-            current_id = node_dict[current_id].get('parent')
-
-    # 第二步：过滤节点
-    result = []
-    for node in nodes:
-        node_id = node['id']
-        
-        # 如果是叶子节点且不在有效列表中，跳过
-        if node_id in leaf_id_list and node_id not in valid_leaf_ids:
-            continue
-        
-        # 如果是非叶子节点且不在有效路径中，跳过
-        if node_id not in leaf_id_list and node_id not in valid_nodes:
+    op_tree: OpTree = memory_profile._op_tree
+    names: Dict[str, int] = {}
+    keys: Dict[TensorKey, int] = {}
+    key_list: List[List] = []
+
+    def name_index(name: str) -> int:
+        return names.setdefault(name, len(names))
+
+    def key_index(key: TensorKey) -> int:
+        if key not in keys:
+            keys[key] = len(key_list)
+            key_list.append([key.id, key.storage.allocation_id, key.storage.ptr, key.device.type, key.device.index])
+        return keys[key]
+
+    # kineto事件与_ProfilerEvent按(name, 开始时间)对应
+    flops_by_event: Dict[Tuple[str, int], int] = {}
+    if profiler_result is not None:
+        for kineto_event in profiler_result.events():
+            if kineto_event.flops():
+                flops_by_event[(kineto_event.name(), kineto_event.start_ns())] = kineto_event.flops()
+
+    events: List[List] = []
+    event_index: Dict[_ProfilerEvent, int] = {}
+    op_inputs: Dict[str, List[List]] = {}
+    op_flops: Dict[str, int] = {}
+    op_args: Dict[str, List] = {}
+    threads: List[List[int]] = []
+
+    # 非递归先序遍历，children按原顺序
+    stack: List[Tuple[_ProfilerEvent, int]] = [(e, -1) for e in reversed(op_tree._root_nodes)]
+    while stack:
+        event, parent = stack.pop()
+        index = len(events)
+        event_index[event] = index
+        # 子事件与根事件在同一线程，只记录根事件的线程
+        if parent < 0:
+            threads.append([index, event.start_tid])
+        flags = 0
+        if event.typed[0] == _EventType.TorchOp:
+            if event.typed[1].scope == RecordScope.BACKWARD_FUNCTION:
+                flags |= FLAG_BACKWARD_FUNCTION
+            if SchemaMatcher.match_schemas(event.typed[1]):
+                flags |= FLAG_SCHEMA_MATCHED
+
+            # Tensor和TensorList按出现顺序展开，只保留能对应到TensorKey的输入
+            inputs: List[List] = []
+            for op_input in event.typed[1].inputs:
+                tensors = [op_input] if isinstance(op_input, _TensorMetadata) else op_input if isinstance(op_input, list) else []
+                for tensor in tensors:
+                    key = TensorKey.from_tensor(tensor)
+                    if key is not None:
+                        inputs.append([key_index(key), ",".join(map(str, tensor.sizes)), str(tensor.dtype)])
+            if inputs:
+                op_inputs[str(index)] = inputs
+            # 拷贝op只保留标量参数（non_blocking等），tensor等其他参数记为None
+            if event.name in transfer_op_args:
+                op_args[str(index)] = [a if isinstance(a, (bool, int, float, str)) else None for a in event.typed[1].inputs]
+            if (event.name, event.start_time_ns) in flops_by_event:
+                op_flops[str(index)] = flops_by_event[(event.name, event.start_time_ns)]
+        events.append([parent, _EVENT_KIND.get(event.typed[0], EVENT_OTHER), name_index(event.name),
+                       event.start_time_ns, event.end_time_ns, flags])
+        stack.extend((child, index) for child in reversed(event.children))
+
+    allocations: List[List] = []
+    for node in op_tree.sorted_nodes:
+        if node.typed[0] == _EventType.Allocation:
+            alloc_fields = node.typed[1]
+            key = TensorKey.from_allocation(alloc_fields)
+            if key:
+                allocations.append([key_index(key), 1 if alloc_fields.alloc_size > 0 else 0, node.start_time_ns])
+
+    flow_nodes: List[List] = []
+    categories: Dict[Tuple[int, int], Optional[str]] = {}
+    sizes: Dict[int, int] = {}
+    for node in memory_profile._data_flow_graph.flow_nodes:
+        if node._event not in event_index:
             continue
+        inputs = [(k, v) for k, (_, v) in node.inputs.items()]
+        outputs = list(node.outputs.items())
+        for k, v in inputs + outputs:
+            c = memory_profile._categories.get(k, v)
+            categories[(key_index(k), v)] = _CATEGORY_TO_STRING[c] if c is not None else None
+            if key_index(k) not in sizes:
+                sizes[key_index(k)] = memory_profile._size_map[k]
+        flow_nodes.append([event_index[node._event], [[key_index(k), v] for k, v in inputs], [[key_index(k), v] for k, v in outputs]])
+
+    return {
+        "format_version": snapshot_format_version,
+        "names": list(names),
+        "keys": key_list,
+        "events": events,
+        "op_inputs": op_inputs,
+        "op_flops": op_flops,
+        "op_args": op_args,
+        "threads": threads,
+        "allocations": allocations,
+        "flow_nodes": flow_nodes,
+        "categories": [[k, v, c] for (k, v), c in categories.items()],
+        "sizes": [[k, size] for k, size in sizes.items()],
+    }
+
+
+class Capture:
+    """
+    一次采集的全部状态：输出位置、module/设备过滤条件、实时推送及统计信息
+
+    作为上下文管理器使用时，进入时替换MemoryProfile.__init__，退出时恢复，
+    期间当前线程中构建的MemoryProfile（如capture_trace_handler）都会导出到out_dir/name下
+    """
+    def __init__(self, name: str, out_dir: str = './data', include: Optional[List[str]] = None, exclude: Optional[List[str]] = None,
+                 devices: Optional[List[str]] = None, live_url: Optional[str] = None) -> None:
+        self.name = name
+        self.out_dir = out_dir
+        self.module_filter = ModuleFilter(include, exclude)
+        self.device_filter = DeviceFilter(devices)
+        self.live_url = live_url
+        self.live_stream: Optional[LiveStream] = None
+        self.num_traces = 0
+        self.extract_time = 0.0
+        self.output_size = 0
+
+    @property
+    def folder_path(self) -> Path:
+        return Path(self.out_dir) / self.name
+
+    def on_memory_profile(self, memory_profile: MemoryProfile, profiler_result: Optional[Any] = None) -> None:
+        extract_start = time.perf_counter()
+        snapshot = take_snapshot(memory_profile, profiler_result)
+        graph_json, tree_json = extract(Snapshot(snapshot), self.module_filter, self.device_filter)
+        self.extract_time = time.perf_counter() - extract_start
+
+        # 最后导出为json文件，同一次采集中的多次trace会覆盖之前的结果
+        # 同时保存快照，之后提取逻辑变化时用rebuild_from_snapshot重新生成，不需要重新训练
+        write_capture(self.folder_path, graph_json, tree_json, self.module_filter, self.device_filter)
+        save_snapshot(snapshot, self.folder_path)
+        self.num_traces += 1
+        # 推送在后台线程中转换，之后不再使用graph_json/tree_json
+        if self.live_stream is not None:
+            self.live_stream.publish(self.num_traces, graph_json, tree_json)
+
+        # 记录提取耗时和输出大小，便于对比过滤前后的收益
+        self.output_size = sum((self.folder_path / name).stat().st_size for name in ['graph.json', 'tree.json'])
+        print(f"Extraction took {self.extract_time * 1000:.1f} ms, {len(graph_json)} ops, output {self.output_size} bytes to {self.folder_path}"
+              + (f", module filter include={self.module_filter.include} exclude={self.module_filter.exclude}" if self.module_filter.is_enabled() else "")
+              + (f", devices={self.device_filter.devices}" if self.device_filter.devices else ""))
+
+    def __enter__(self) -> "Capture":
+        if self.live_url is not None:
+            self.live_stream = LiveStream(f"{self.live_url.rstrip('/')}/api/live/{self.name}")
+        _install()
+        _active_captures().append(self)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        _active_captures().remove(self)
+        _uninstall()
+        # 等待最后一步推送完成
+        if self.live_stream is not None:
+            self.live_stream.close()
+            self.live_stream = None
+
+
+def capture(name: str, out_dir: str = './data', include: Optional[List[str]] = None, exclude: Optional[List[str]] = None,
+            devices: Optional[List[str]] = None, live_url: Optional[str] = None) -> Capture:
+    """
+    用法：
+        with capture("ResNet", "./data"):
+            with torch.profiler.profile(..., on_trace_ready=capture_trace_handler) as prof:
+                ...
+
+    :param include: 只采集路径匹配这些fnmatch模式的module，如["*/GPT2Block_0/GPT2SdpaAttention_*"]
+    :param exclude: 不采集路径匹配这些模式的module
+    :param devices: 保留这些设备上的tensor，如["*"]同时保留cpu上的tensor（分析主机与设备间的拷贝时需要），默认只去掉cpu
+    :param live_url: app.py的地址，如"http://127.0.0.1:5000"，每次trace完成后把这一步的汇总推送到可视化页面
+    """
+    return Capture(name, out_dir, include, exclude, devices, live_url)
 
-        # 复制节点并过滤子节点
-        filtered_node = {
-            "id": node_id,
-            "name": node["name"],
-            "start_time": node["start_time"],
-            "end_time": node["end_time"],
-            "is_leaf": node["is_leaf"],
-            "scope": node["scope"],
-            "parent": node.get("parent"),
-            "children": [child_id for child_id in node.get("children", []) 
-                    if child_id in valid_nodes],
-        }
-        result.append(filtered_node)
-
-    return result
-
-def is_leaf(e: _ProfilerEvent) -> bool:
-    return (e.typed[0] == _EventType.TorchOp and (
-        e.typed[1].scope == RecordScope.BACKWARD_FUNCTION
-        or bool(SchemaMatcher.match_schemas(e.typed[1]))
-    )) or e.typed[0] == _EventType.Allocation
-
-def is_tree_node(e: _ProfilerEvent) -> bool:
-    return (e.typed[0] == _EventType.TorchOp and (
-        e.typed[1].scope == RecordScope.BACKWARD_FUNCTION
-        or bool(SchemaMatcher.match_schemas(e.typed[1]))
-        # bool(SchemaMatcher.match_schemas(e.typed[1]))
-    )) or (e.typed[0] == _EventType.PyCall and "nn.Module:" in e.name)
-
-def get_ancestors_name(e: Optional[_ProfilerEvent]) -> Tuple[str, ...]:
-    ancestors_name: List[str] = []
-    while e:
-        if e.typed[0] in [_EventType.TorchOp, _EventType.PyCall]:
-            ancestors_name.append(e.name)
-        e = e.parent
-    return tuple(ancestors_name)
-
-def is_backward(e: _ProfilerEvent) -> bool:
-    ancestors_name = get_ancestors_name(e)
-    for name in ancestors_name:
-        if "autograd::" in name:
-            return True
-    return False
-
-backward_end_time = -1
-
-def get_scope(e: _ProfilerEvent) -> str:
-    if is_backward(e):
-        return "backward"
-    elif backward_end_time > 0 and e.start_time_ns > backward_end_time:
-        return "postprocess"
-    else:
-        return "forward"
-
-def tree_to_json(op_tree: OpTree, graph_id_list: List[int]) -> List[Dict]:
-    # 第一步：构建树，省去非module节点
-    nodes: Dict[int, Node] = {}
-    leaf_node_id_list: List[int] = []
-
-    def dfs(events: List[_ProfilerEvent], parent_id: Optional[int]):
-        """递归处理事件树，构建节点关系"""
-        for event in events:
-            if not is_tree_node(event):
-                if not is_leaf(event):
-                    dfs(event.children, parent_id)  # 非树节点继续递归但保持父节点
-                continue
-
-            # 处理树节点
-            node_id = node_id_map[event]
-            nodes[node_id] = Node(
-                id=node_id,
-                name=event.name,
-                start_time=event.start_time_ns,
-                end_time=event.end_time_ns,
-                is_leaf=is_leaf(event),
-                scope=get_scope(event),
-                parent=parent_id
-            )
-            
-            # 更新父子关系
-            if parent_id is not None:
-                nodes[parent_id].children.append(node_id)
-            
-            # 递归处理非叶节点
-            if not is_leaf(event):
-                dfs(event.children, node_id)
-            else:
-                leaf_node_id_list.append(node_id)
-    
-    dfs(op_tree._root_nodes, None)
-
-    nodes_list: List[Dict] = []
-    for _, node in nodes.items():
-        nodes_list.append({
-            "id": node.id,
-            "name": node.name,
-            "start_time": node.start_time,
-            "end_time": node.end_time,
-            "is_leaf": node.is_leaf,
-            "scope": node.scope,
-            "parent": node.parent,
-            "children": node.children,
-        })
-    filter_nodes = filter_tree(nodes_list, leaf_node_id_list, graph_id_list)
-    return filter_nodes
-
-def set_id(op_tree: OpTree):
-    id = 0
-
-    def dfs(events: List[_ProfilerEvent]):
-        global backward_end_time
-        nonlocal id
-
-        for event in events:
-            # 存储反向节点最晚时间点，用于区分是否属于前向
-            if is_backward(event):
-                backward_end_time = max(backward_end_time, event.end_time_ns)
-
-            if is_tree_node(event):
-                node_id_map[event] = id
-                id += 1
-            
-            # 递归处理非叶节点
-            if not is_leaf(event):
-                dfs(event.children)
-    
-    dfs(op_tree._root_nodes)
 
 # 先保存原始 __init__ 方法
 _original_init = MemoryProfile.__init__
 
-model = None
+# 每个线程各自的采集栈，嵌套时最内层生效，不同线程中的profiler互不影响
+_thread_local = threading.local()
+_install_lock = threading.Lock()
+_install_count = 0
+
+# hijack_profiler设置的默认采集，当前线程没有活跃采集时使用
+_default_capture: Optional[Capture] = None
+
+
+def _active_captures() -> List[Capture]:
+    if not hasattr(_thread_local, "captures"):
+        _thread_local.captures = []
+    return _thread_local.captures
+
+
+def _install() -> None:
+    global _install_count
+    with _install_lock:
+        if _install_count == 0:
+            MemoryProfile.__init__ = my_init
+        _install_count += 1
+
+
+def _uninstall() -> None:
+    global _install_count
+    with _install_lock:
+        _install_count -= 1
+        if _install_count == 0:
+            MemoryProfile.__init__ = _original_init
+
 
 # 定义新的 __init__
 def my_init(self, *args, **kwargs):
@@ -411,36 +336,34 @@ def my_init(self, *args, **kwargs):
 
     # 最后调用原始 __init__
     _original_init(self, *args, **kwargs)
-    
-    set_id(self._op_tree)
-    
-    timeMap = TimeMap(self._op_tree)
-    tensorInfoMap = TensorInfoMap(self._data_flow_graph)
-    graph_json, graph_id_list = graph_to_json(self._data_flow_graph, self._categories, self._size_map, timeMap, tensorInfoMap)
-
-    tree_json = tree_to_json(self._op_tree, graph_id_list)
-
-    # validate
-    # 1、校验反向节点的祖先都是反向
-    # 2、校验is_leaf是否正确
-    # 3、校验必为有向无环图
-
-    # 最后导出为json文件
-    global model
-    folder_path = Path(f'./data/{model}')
-    folder_path.mkdir(parents=True, exist_ok=True)
-    if model != '':
-        with open(f'./data/{model}/graph.json', 'w') as f:
-            json.dump(graph_json, f, indent=4)
-        with open(f'./data/{model}/tree.json', 'w') as f:
-            json.dump(tree_json, f, indent=4)
-
-
-def hijack_profiler(model_name: str):
-    global model
-    model = model_name if model_name != '' else None
 
-    # 替换 __init__
+    captures = _active_captures()
+    current = captures[-1] if captures else _default_capture
+    if current is not None:
+        current.on_memory_profile(self, args[0] if args else kwargs.get("result"))
 
-    MemoryProfile.__init__ = my_init
 
+def capture_trace_handler(prof: torch.profiler.profile) -> None:
+    """
+    用作profiler的on_trace_ready，只构建提取所需的MemoryProfile（OpTree、DataFlowGraph、categories、size map）
+
+    export_memory_timeline除此之外还会计算整个内存时间线并渲染html，且需要指定device，这里都不需要
+    """
+    assert prof.profiler is not None and prof.profiler.kineto_results is not None
+    MemoryProfile(prof.profiler.kineto_results)
+
+
+def hijack_profiler(model_name: str, include: Optional[List[str]] = None, exclude: Optional[List[str]] = None,
+                    devices: Optional[List[str]] = None):
+    """
+    永久替换MemoryProfile.__init__，之后没有处于capture上下文中的采集都导出到./data/model_name下
+
+    需要多次采集或多个profiler并发时使用capture上下文管理器
+    """
+    global _default_capture
+    first_call = _default_capture is None
+    _default_capture = Capture(model_name, './data', include, exclude, devices)
+
+    # 替换 __init__
+    if first_call:
+        _install()
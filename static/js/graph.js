@@ -0,0 +1,506 @@
+// 全局变量
+let maxTime = -1;
+let minTime = -1;
+let relativeMaxTime = -1;
+let relativeMinTime = -1;
+let nsToS = 10000000;
+
+// tensor按category着色，与profiler的Category一一对应
+const categoryColors = {
+  parameter: '#a6cee3',
+  optimizer_state: '#b2df8a',
+  input: '#fdbf6f',
+  temporary: '#cab2d6',
+  activation: '#fb9a99',
+  gradient: '#ffff99',
+  autograd_detail: '#e0c9a6',
+  unknown: '#eeeeee',
+};
+function categoryColor(category) {
+  return categoryColors[category] ?? categoryColors.unknown;
+}
+
+// 流水线切分（export_pipeline.py）的stage、融合候选（export_fusion.py）的组按序号描边
+const outlineColors = ['#1f78b4', '#33a02c', '#e31a1c', '#ff7f00', '#6a3d9a', '#b15928', '#a6761d', '#666666'];
+function outlineColor(index) {
+  return outlineColors[index % outlineColors.length];
+}
+
+function formatBytes(bytes) {
+  if (bytes === null || bytes === undefined) return 'n/a';
+  const units = ['B', 'KB', 'MB', 'GB'];
+  let i = 0;
+  while (Math.abs(bytes) >= 1024 && i < units.length - 1) { bytes /= 1024; i++; }
+  return `${i === 0 ? bytes : bytes.toFixed(1)}${units[i]}`;
+}
+function formatNs(ns) {
+  if (ns >= 1e9) return `${(ns / 1e9).toFixed(2)}s`;
+  if (ns >= 1e6) return `${(ns / 1e6).toFixed(2)}ms`;
+  return `${(ns / 1e3).toFixed(1)}us`;
+}
+function formatStats(stats) {
+  return `op time ${formatNs(stats.inclusive_time)} (self ${formatNs(stats.self_time)}), ${stats.op_count} ops\n`
+    + `allocated ${formatBytes(stats.bytes_allocated)}, peak ${formatBytes(stats.peak_live_bytes)}\n`
+    + `in ${formatBytes(stats.input_bytes)}, out ${formatBytes(stats.output_bytes)}`;
+}
+// 折叠子图按op耗时占比着色：白色到红色
+function heatColor(ratio) {
+  const v = Math.round(255 * (1 - Math.min(Math.max(ratio, 0), 1)));
+  const hex = v.toString(16).padStart(2, '0');
+  return `#ff${hex}${hex}`;
+}
+
+// *******************************************************************************************
+// node
+// 仅用于存储字段，不可以添加方法，因为拷贝node时只拷贝字符串
+// *******************************************************************************************
+class Node {
+  constructor(node_json) {
+    this.id = node_json.id;
+    this.start_time = node_json.start_time;
+    this.end_time = node_json.end_time
+    this.isTensor = !!node_json.isTensor;
+    this.isLeaf = !!node_json.isLeaf;
+    this.label = node_json.label ?? String(node_json.id);
+    this.parent = node_json.parent ?? null;
+    this.children = Array.isArray(node_json.children) ? [...node_json.children] : [];
+    this.nextNodes = Array.isArray(node_json.nextNodes) ? [...node_json.nextNodes] : [];
+    this.isCollapse = true;
+    this.category = this.isTensor ? (node_json?.info?.category ?? 'unknown') : null;
+    // 子图的汇总统计（json_to_complex_json中自底向上计算）
+    this.stats = !this.isTensor && node_json.stats ? {...node_json.stats} : null;
+    this.size = this.isTensor ? (node_json?.info?.size ?? 0) : 0;
+    this.stage = node_json.stage ?? null;
+    this.fusion = node_json.fusion ?? null;
+    // 边上的数据量 {目标节点id: [字节数, tensor数]}，在generate_new_graph中计算
+    this.edgeWeights = {};
+    if (this.isTensor && node_json?.info) {
+      const device = node_json.info.device ?? 'unknown';
+      const dtype = node_json.info.dtype ?? 'unknown';
+      const size = node_json.info.size ?? 'unknown';
+      const shape = node_json.info.shape ?? 'unknown';
+      this.info = `${device}\n${dtype}\n${size}\n${shape}\n${this.category}`;
+    } else if (!this.isTensor && node_json.stats) {
+      this.info = formatStats(node_json.stats);
+    } else {
+      this.info = "";
+    }
+
+    // 相对时间（会在 Graph 初始化时计算）
+    this.relative_start_time = 0;
+    this.relative_end_time = 0;
+  }
+}
+
+// *******************************************************************************************
+// graph
+// *******************************************************************************************
+class Graph {
+  constructor() {
+    this.nodes = new Map();
+  }
+
+  isLegalGraph() {
+    const inDegree = new Map();
+
+    // 初始化入度表
+    for (const node of this.nodes.values()) {
+      inDegree.set(node.id, 0);
+    }
+
+    // 第一遍遍历：检查各种规则并计算入度
+    for (const [u, node] of this.nodes) {
+      // 规则1: 非叶子节点不应该有 nextNodes
+      if (!node.isLeaf && node.nextNodes.length > 0) {
+        console.log("subgraph should not have next nodes.");
+        return false;
+      }
+
+      // 规则2: 叶子节点不应该有 children
+      if (node.isLeaf && node.children.length > 0) {
+        console.log("leaf node should not have children.");
+        return false;
+      }
+
+      // 规则3: 非叶子节点应该有 children
+      if (!node.isLeaf && node.children.length === 0) {
+        console.log("non leaf node should have children.");
+        return false;
+      }
+
+      // 计算入度并检查规则4
+      for (const v of node.nextNodes) {
+        const nextNode = this.nodes.get(v);
+        if (!nextNode) {
+          console.log(`Next node ${v} not found in graph.`);
+          return false;
+        }
+
+        // 规则4: op节点的输出应该是tensor，tensor应该是op节点的输入
+        if (node.isTensor === nextNode.isTensor) {
+          console.log("op node's output should be tensor, tensor should be input of op node.");
+          return false;
+        }
+
+        // 更新入度
+        inDegree.set(v, (inDegree.get(v) || 0) + 1);
+      }
+    }
+
+    // 检查规则5: tensor节点入度不能超过1
+    for (const [nodeId, degree] of inDegree) {
+      const node = this.nodes.get(nodeId);
+      if (node.isTensor && degree > 1) {
+        console.log("tensor only has one producer.");
+        return false;
+      }
+    }
+
+    // 拓扑排序检查环
+    const queue = [];
+    for (const [nodeId, degree] of inDegree) {
+      if (degree === 0) {
+        queue.push(nodeId);
+      }
+    }
+
+    // 用下标代替queue.shift()，保证拓扑排序为O(V+E)
+    let count = 0;
+    let head = 0;
+    while (head < queue.length) {
+      const u = queue[head++];
+      count++;
+      const currentNode = this.nodes.get(u);
+      for (const v of currentNode.nextNodes) {
+        const currentDegree = inDegree.get(v) - 1;
+        inDegree.set(v, currentDegree);
+        if (currentDegree === 0) {
+          queue.push(v);
+        }
+      }
+    }
+    return count === this.nodes.size;
+  }
+
+  setRelativeTime() {
+    for (const node of this.nodes.values()) {
+      if (node.start_time !== -1) {
+        if (minTime == -1) {
+          minTime = node.start_time;
+        } else {
+          minTime = Math.min(minTime, node.start_time);
+        }
+        maxTime = Math.max(maxTime, node.start_time);
+      }
+      if (node.end_time !== -1) {
+        if (minTime == -1) {
+          minTime = node.end_time;
+        } else {
+          minTime = Math.min(minTime, node.end_time);
+        }
+        maxTime = Math.max(maxTime, node.end_time);
+      }
+    }
+    if (minTime !== -1 && maxTime !== -1) {
+      minTime = minTime - 10000000;
+      maxTime = maxTime + 10000000;
+    } else {
+      minTime = 0;
+      maxTime = 10000000;
+    }
+    relativeMinTime = 0;
+    // relativeMaxTime = ((maxTime - minTime) / nsToS).toFixed(3);
+    relativeMaxTime = maxTime - minTime;
+    for (const node of this.nodes.values()) {
+      if (node.start_time !== -1) {
+        // node.relative_start_time = ((node.start_time - minTime) / nsToS).toFixed(3);
+        node.relative_start_time = node.start_time - minTime;
+      } else {
+        node.relative_start_time = relativeMinTime;
+      }
+      if (node.end_time !== -1) {
+        // node.relative_end_time = ((node.end_time - minTime) / nsToS).toFixed(3);
+        node.relative_end_time = node.end_time - minTime;
+      } else {
+        // node.relative_end_time = (relativeMaxTime / nsToS).toFixed(3);
+        node.relative_end_time = relativeMaxTime;
+      }
+      node.info += `\n${node.relative_start_time},${node.relative_end_time}`;
+    }
+  }
+
+  // 获取在指定时间活跃的节点ID
+  getActiveNodesAtTime(currentTime) {
+    const activeNodes = new Set();
+    for (const [nodeId, node] of this.nodes) {
+      if (node.isLeaf && currentTime >= node.relative_start_time && currentTime <= node.relative_end_time) {
+        activeNodes.add(nodeId);
+      }
+    }
+    return activeNodes;
+  }
+
+  // 图中出现的tensor category，按名字排序
+  getCategories() {
+    const categories = new Set();
+    for (const node of this.nodes.values()) {
+      if (node.isTensor) categories.add(node.category ?? 'unknown');
+    }
+    return [...categories].sort();
+  }
+
+  // hiddenCategories中category的tensor及与其相连的边不画出
+  // 折叠的子图显示op耗时和内存峰值，按op耗时占当前画出的折叠子图中最大值的比例着色、放大
+  generate_dot(rootNodes = null, highlightNodes = [], hiddenCategories = new Set()) {
+    const node_dot_lines = [], edges_dot_lines = [];
+    const isCollapsedModule = (node) => node.isLeaf && !node.isTensor && !!node.stats;
+    let maxInclusive = 0, maxEdgeBytes = 0;
+    for (const node of this.nodes.values()) {
+      if (isCollapsedModule(node)) maxInclusive = Math.max(maxInclusive, node.stats.inclusive_time);
+      for (const [bytes] of Object.values(node.edgeWeights ?? {})) maxEdgeBytes = Math.max(maxEdgeBytes, bytes);
+    }
+    // 边的粗细按字节数的对数缩放，避免少数大tensor让其余的边都细到看不见
+    const edgeAttr = (node, id) => {
+      const weight = node.edgeWeights?.[id];
+      if (!weight || maxEdgeBytes <= 0) return '';
+      const penwidth = 1 + 5 * Math.log1p(weight[0]) / Math.log1p(maxEdgeBytes);
+      return ` [penwidth=${penwidth.toFixed(2)}, tooltip="${formatBytes(weight[0])}, ${weight[1]} tensors"]`;
+    };
+    const isHidden = (id) => {
+      const node = this.nodes.get(id);
+      return !!node && node.isTensor && hiddenCategories.has(node.category ?? 'unknown');
+    };
+
+    const dfs_generate_dot = (children, depth) => {
+      const sub = [];
+      children.forEach(node_id => {
+        const node = this.nodes.get(node_id);
+        if (!node) return;
+
+        // 构建包含时间信息的标签
+        let timeInfo = '';
+        if (node.relativeStart !== undefined && node.relativeEnd !== undefined) {
+          timeInfo = `\\n[${node.relativeStart.toFixed(1)}-${node.relativeEnd.toFixed(1)}ms]`;
+        }
+
+        const isHighlighted = highlightNodes.includes(node_id);
+        let colorAttr = isHighlighted ? 'color=green, style=filled, fillcolor=lightgreen' : '';
+        if (!isHighlighted && node.isTensor) colorAttr = `style=filled, fillcolor="${categoryColor(node.category)}"`;
+        let statsInfo = '';
+        if (isCollapsedModule(node)) {
+          const ratio = maxInclusive > 0 ? node.stats.inclusive_time / maxInclusive : 0;
+          statsInfo = `\n${formatNs(node.stats.inclusive_time)}, peak ${formatBytes(node.stats.peak_live_bytes)}`;
+          if (!isHighlighted) colorAttr = `style=filled, fillcolor="${heatColor(ratio)}", fontsize=${Math.round(14 + 8 * ratio)}`;
+        }
+
+        const stageLabel = node.stage !== null && node.stage !== undefined ? `[stage ${node.stage}] ` : '';
+
+        if (node.isLeaf) {
+          if (isHidden(node_id)) return;
+          const shape = node.isTensor ? "ellipse" : "box";
+          const fusionInfo = node.fusion !== null && node.fusion !== undefined ? `\nfusion group ${node.fusion}` : '';
+          const tooltip = `tooltip="${escapeDotLabel((node.info || node.label) + fusionInfo)}"`;
+          if (node.fusion !== null && node.fusion !== undefined && !isHighlighted) {
+            colorAttr = `color="${outlineColor(node.fusion)}", penwidth=3, style=dashed`;
+          }
+          if (stageLabel && !isHighlighted) colorAttr = [colorAttr, `color="${outlineColor(node.stage)}", penwidth=3`].filter(a => a).join(', ');
+          sub.push(`${"    ".repeat(depth)}"${node_id}" [label="${escapeDotLabel(stageLabel + node.label + statsInfo) + timeInfo}", shape=${shape}, ${tooltip}, ${colorAttr}];`);
+          node.nextNodes.forEach(id => { 
+              if (!isHidden(id)) edges_dot_lines.push(`${"    "}"${node_id}" -> "${id}"${edgeAttr(node, id)};`) 
+          });
+        } else {
+          const clusterLabel = stageLabel + node.label + timeInfo;
+          sub.push(`${"    ".repeat(depth)}subgraph cluster_${node_id} {`);
+          sub.push(`${"    ".repeat(depth+1)}label="${escapeDotLabel(clusterLabel)}";`);
+          sub.push(`${"    ".repeat(depth+1)}style=rounded;`);
+          if (isHighlighted) {
+            sub.push(`${"    ".repeat(depth+1)}color=green;`);
+            sub.push(`${"    ".repeat(depth+1)}style="rounded,filled";`);
+            sub.push(`${"    ".repeat(depth+1)}fillcolor=lightgreen;`);
+          } else if (stageLabel) {
+            sub.push(`${"    ".repeat(depth+1)}color="${outlineColor(node.stage)}";`);
+            sub.push(`${"    ".repeat(depth+1)}penwidth=3;`);
+          } else {
+            sub.push(`${"    ".repeat(depth+1)}color=blue;`);
+          }
+          const clusterTooltip = `tooltip="${escapeDotLabel(node.info || `Cluster: ${node.label}`)}"`;
+          sub.push(`${"    ".repeat(depth+1)}${clusterTooltip};`);
+          sub.push(...dfs_generate_dot(node.children, depth+1));
+          sub.push(`${"    ".repeat(depth)}}`);
+        }
+      });
+      return sub;
+    };
+
+    if (!rootNodes) rootNodes = [...this.nodes.values()].filter(n => n.parent===null).map(n=>n.id);
+    node_dot_lines.push(...dfs_generate_dot(rootNodes, 1));
+    const root_dot_lines=[
+        "digraph G {",
+        '    rankdir=LR;',
+        '    node [fontname="Arial"];',
+        '    tooltip = "";',
+        " }"
+    ];
+    return [...root_dot_lines.slice(0,-1),...node_dot_lines,...edges_dot_lines,...root_dot_lines.slice(-1)].join("\n");
+  }
+  // 当前图（generate_new_graph的结果）中module/op之间经过tensor的数据流，按字节数从大到小取前limit个
+  getHeaviestFlows(limit = 20) {
+    const flows = new Map();
+    for (const [id, node] of this.nodes) {
+      if (node.isTensor) continue;
+      for (const tensorId of node.nextNodes) {
+        const tensor = this.nodes.get(tensorId);
+        if (!tensor || !tensor.isTensor) continue;
+        for (const consumerId of tensor.nextNodes) {
+          if (consumerId === id) continue;
+          const key = `${id}|${consumerId}`;
+          const flow = flows.get(key) ?? {from: id, to: consumerId, bytes: 0, tensors: 0};
+          flow.bytes += tensor.size;
+          flow.tensors += 1;
+          flows.set(key, flow);
+        }
+      }
+    }
+    return [...flows.values()]
+      .sort((a, b) => b.bytes - a.bytes)
+      .slice(0, limit)
+      .map(f => ({...f, fromLabel: this.nodes.get(f.from).label, toLabel: this.nodes.get(f.to)?.label ?? String(f.to)}));
+  }
+
+  _get_out_tensors_of_collapse_node(root_id) {
+    const result=[];
+    const in_root=(node_id)=>{while(node_id!=null){if(node_id===root_id)return true;node_id=this.nodes.get(node_id)?.parent??null;}return false;}
+    const dfs=(nid)=>{const node=this.nodes.get(nid);if(!node)return;if(node.isLeaf){if(node.isTensor && node.nextNodes.some(n=>!in_root(n)))result.push(nid);}else{node.children.forEach(c=>dfs(c));}};
+    dfs(root_id);return result;
+  }
+  generate_new_graph() {
+    const new_graph = new Graph();
+    const roots = [...this.nodes.values()].filter(n => n.parent===null).map(n=>n.id);
+    const dfs_build = (node_id) => {
+      const node=this.nodes.get(node_id);if(!node)return[];
+      if(node.isLeaf){new_graph.nodes.set(node_id, deepCopyNode(node)); return [];}
+      if(node.isCollapse){const c=deepCopyNode(node);c.isLeaf=true;c.children=[];c.nextNodes=this._get_out_tensors_of_collapse_node(node_id);new_graph.nodes.set(node_id,c);return c.nextNodes||[];}
+      new_graph.nodes.set(node_id, deepCopyNode(node)); let extra=[]; node.children.forEach(child=>{extra=extra.concat(dfs_build(child))});
+      extra.forEach(cid=>{const o=this.nodes.get(cid);if(o){const copy=deepCopyNode(o);copy.parent=node_id;new_graph.nodes.set(cid,copy)}})
+      const ngNode=new_graph.nodes.get(node_id); if(ngNode){ngNode.children=Array.from(new Set([...(ngNode.children||[]),...extra]))}
+      return [];
+    };
+    let extra=[]; roots.forEach(r=>{extra=extra.concat(dfs_build(r))});
+    extra.forEach(cid=>{const o=this.nodes.get(cid);if(o){const copy=deepCopyNode(o);copy.parent=null;new_graph.nodes.set(cid,copy)}})
+    const find_ancestor=(nid)=>{while(nid!=null&&!new_graph.nodes.has(nid)){nid=this.nodes.get(nid)?.parent??null;}return nid;}
+    // 重连的边按原图中经过的tensor累计字节数和tensor数，同一tensor到同一目标只计一次
+    const dfs_edges=(nid)=>{
+      const node=new_graph.nodes.get(nid);if(!node)return;
+      const weights={}, seen=new Set();
+      node.nextNodes.forEach(n=>{
+        const target=find_ancestor(n);if(target==null)return;
+        const tensor=node.isTensor?nid:n, size=this.nodes.get(tensor)?.size??0;
+        if(seen.has(`${target}|${tensor}`))return;seen.add(`${target}|${tensor}`);
+        const w=weights[target]??(weights[target]=[0,0]);w[0]+=size;w[1]+=1;
+      });
+      node.nextNodes=Object.keys(weights).map(Number);node.edgeWeights=weights;
+      (node.children||[]).forEach(c=>dfs_edges(c));
+    }
+    roots.forEach(r=>{if(new_graph.nodes.has(r))dfs_edges(r);});
+    return new_graph;
+  }
+}
+
+function escapeDotLabel(s){
+  return String(s)
+    .replace(/\\/g,"\\\\")
+    .replace(/"/g,'\\"')
+    .replace(/\n/g,'\\n')
+    .replace(/\r/g,'\\r')
+    .replace(/\t/g,'\\t');
+}
+function deepCopyNode(node){return JSON.parse(JSON.stringify(node));}
+
+// 结构去重格式（complex_graph_dedup.json）：按模板和实例差异表还原为节点列表，普通列表格式原样返回
+function expandDedupJson(data) {
+  if (Array.isArray(data)) return data;
+  const result = [];
+  for (const node of data.nodes) {
+    if (node.template === undefined) {
+      result.push(node);
+      continue;
+    }
+    const template = data.templates[node.template];
+    const instance = node.instance;
+    const ids = instance.id_range
+      ? Array.from({length: instance.id_range[1]}, (_, i) => instance.id_range[0] + i)
+      : instance.ids;
+    template.nodes.forEach((tn, i) => {
+      const [start, end] = instance.times[i];
+      result.push({
+        ...tn,
+        id: ids[i],
+        start_time: start === null ? -1 : node.start_time + start,
+        end_time: end === null ? -1 : node.start_time + end,
+        label: instance.labels[String(i)] ?? tn.label,
+        parent: tn.parent === null ? node.parent : ids[tn.parent],
+        children: tn.children.map(c => ids[c]),
+        nextNodes: tn.nextNodes.map(x => ids[x]).concat(instance.external_next[String(i)] ?? []),
+        template: i === 0 ? node.template : undefined,
+        ...(instance.stats?.[String(i)] ? {stats: instance.stats[String(i)]} : {}),
+      });
+    });
+  }
+  return result;
+}
+
+// 分组节点的统计：耗时、op数、字节数相加，峰值取最大
+function sumStats(statsList) {
+  if (statsList.some(s => !s)) return null;
+  const peaks = statsList.map(s => s.peak_live_bytes).filter(p => p !== null);
+  return {
+    inclusive_time: statsList.reduce((a, s) => a + s.inclusive_time, 0),
+    self_time: 0,
+    op_count: statsList.reduce((a, s) => a + s.op_count, 0),
+    bytes_allocated: statsList.reduce((a, s) => a + s.bytes_allocated, 0),
+    peak_live_bytes: peaks.length ? peaks.reduce((a, p) => Math.max(a, p), -Infinity) : null,
+    input_bytes: statsList.reduce((a, s) => a + s.input_bytes, 0),
+    output_bytes: statsList.reduce((a, s) => a + s.output_bytes, 0),
+  };
+}
+
+// 同一父节点下结构相同的多个实例合并为一个“×N”分组节点，展开分组后再按需展开单个实例
+function groupRepeatedInstances(graph, nodes_json) {
+  // 不用Math.max(...keys)：展开为调用参数时节点数到十万级会超出参数个数上限（RangeError）
+  let nextId = 0;
+  for (const id of graph.nodes.keys()) nextId = Math.max(nextId, id + 1);
+  const byParent = new Map();
+  nodes_json.forEach(nj => {
+    if (nj.template === undefined) return;
+    const key = `${nj.parent}|${nj.template}`;
+    if (!byParent.has(key)) byParent.set(key, []);
+    byParent.get(key).push(nj.id);
+  });
+  for (const ids of byParent.values()) {
+    if (ids.length < 2) continue;
+    const first = graph.nodes.get(ids[0]);
+    const group = new Node({
+      id: nextId++,
+      start_time: ids.reduce((t, id) => Math.min(t, graph.nodes.get(id).start_time), Infinity),
+      end_time: ids.reduce((t, id) => Math.max(t, graph.nodes.get(id).end_time), -Infinity),
+      isTensor: false,
+      isLeaf: false,
+      label: `${first.label.replace(/_\d+$/, '')} ×${ids.length}`,
+      parent: first.parent,
+      children: ids,
+      nextNodes: [],
+      stats: sumStats(ids.map(id => graph.nodes.get(id).stats)),
+    });
+    graph.nodes.set(group.id, group);
+    ids.forEach(id => { graph.nodes.get(id).parent = group.id; });
+    const siblings = first.parent === null ? null : graph.nodes.get(group.parent).children;
+    if (siblings) {
+      const idSet = new Set(ids);
+      const before = siblings.slice(0, siblings.indexOf(ids[0])).filter(id => !idSet.has(id)).length;
+      const rest = siblings.filter(id => !idSet.has(id));
+      rest.splice(before, 0, group.id);
+      graph.nodes.get(group.parent).children = rest;
+    }
+  }
+}
+
@@ -0,0 +1,112 @@
+// *******************************************************************************************
+// live mode
+// 订阅/api/live/<name>/events，每步收到一个step事件（汇总+图的结构哈希），刷新滚动图表；
+// 结构哈希与已加载的图不同时才取图并交给render worker，图表只保留最近liveWindow步
+// *******************************************************************************************
+const liveWindow=120;
+const liveSelect=document.getElementById('liveSelect');
+const liveStatus=document.getElementById('liveStatus');
+const liveTopOps=document.getElementById('liveTopOps');
+const liveCharts=[
+  {canvas: document.getElementById('liveStepTime'), field: 'step_time', title: 'step time', format: v=>`${(v/1e6).toFixed(2)} ms`},
+  {canvas: document.getElementById('livePeakMemory'), field: 'peak_memory', title: 'peak memory', format: v=>`${(v/1e6).toFixed(1)} MB`},
+];
+let liveSource=null;
+let liveSteps=[];
+let liveStructureHash=null;
+
+function drawLiveChart({canvas, field, title, format}){
+  const ctx=canvas.getContext('2d');
+  const width=canvas.width, height=canvas.height, pad=16;
+  ctx.clearRect(0, 0, width, height);
+  ctx.fillStyle='#666';
+  ctx.font='12px Arial';
+  const values=liveSteps.map(s=>s[field]);
+  if(!values.length){
+    ctx.fillText(`${title}: waiting for steps`, 4, 12);
+    return;
+  }
+  const min=Math.min(...values), max=Math.max(...values);
+  const span=max-min||1;
+  ctx.fillText(`${title}: ${format(values[values.length-1])}  (min ${format(min)}, max ${format(max)})`, 4, 12);
+  ctx.strokeStyle='#4CAF50';
+  ctx.lineWidth=1.5;
+  ctx.beginPath();
+  values.forEach((v, i)=>{
+    const x=values.length>1?i/(liveWindow-1)*width:0;
+    const y=height-pad/2-(v-min)/span*(height-pad*1.5);
+    if(i===0)ctx.moveTo(x, y);else ctx.lineTo(x, y);
+  });
+  ctx.stroke();
+}
+
+function showLiveSteps(){
+  liveCharts.forEach(drawLiveChart);
+  const last=liveSteps[liveSteps.length-1];
+  if(!last)return;
+  liveStatus.textContent=`step ${last.step}, ${last.num_ops} ops`;
+  liveTopOps.textContent=last.top_ops.map(([name, time, count])=>`${(time/1e6).toFixed(3).padStart(10)} ms ${String(count).padStart(6)}x  ${name}`).join('\n');
+}
+
+async function loadLiveGraph(name, structureHash){
+  if(!structureHash||structureHash===liveStructureHash)return;
+  liveStructureHash=structureHash;
+  try{
+    const response=await fetch(`/api/live/${encodeURIComponent(name)}/graph`);
+    if(!response.ok){
+      liveStructureHash=null;
+      return;
+    }
+    loadGraphBuffer(await response.arrayBuffer());
+  }catch(err){
+    liveStructureHash=null;
+    console.error(err);
+  }
+}
+
+function addLiveSteps(name, steps){
+  liveSteps=liveSteps.concat(steps).slice(-liveWindow);
+  showLiveSteps();
+  const last=liveSteps[liveSteps.length-1];
+  if(last)loadLiveGraph(name, last.structure_hash);
+}
+
+function subscribeLive(name){
+  if(liveSource){
+    liveSource.close();
+    liveSource=null;
+  }
+  liveSteps=[];
+  liveStructureHash=null;
+  showLiveSteps();
+  if(!name)return;
+  // 断线后EventSource自动重连，重连时服务端重新发送snapshot
+  liveSource=new EventSource(`/api/live/${encodeURIComponent(name)}/events`);
+  liveSource.addEventListener('snapshot', e=>{
+    liveSteps=[];
+    addLiveSteps(name, JSON.parse(e.data).steps);
+  });
+  liveSource.addEventListener('step', e=>addLiveSteps(name, [JSON.parse(e.data)]));
+  liveSource.onerror=()=>{liveStatus.textContent='disconnected, retrying...';};
+}
+
+async function loadLiveRuns(){
+  try{
+    const runs=await (await fetch('/api/live')).json();
+    const current=liveSelect.value;
+    liveSelect.querySelectorAll('option:not([value=""])').forEach(o=>o.remove());
+    runs.forEach(run=>{
+      const option=document.createElement('option');
+      option.value=run.name;
+      option.textContent=run.last_step===null?run.name:`${run.name} (step ${run.last_step})`;
+      liveSelect.appendChild(option);
+    });
+    liveSelect.value=current;
+  }catch(err){
+    console.error(err);
+  }
+}
+liveSelect.addEventListener('focus', loadLiveRuns);
+liveSelect.addEventListener('change', ()=>subscribeLive(liveSelect.value));
+loadLiveRuns();
+showLiveSteps();
@@ -0,0 +1,126 @@
+// *******************************************************************************************
+// render worker
+// 在worker中完成加载、校验、图变换和Graphviz渲染，主线程只负责替换svg
+// 消息格式：
+//   主线程 -> worker: {type: 'load', requestId, buffer} | {type: 'toggle', requestId, nodeId}
+//                    | {type: 'filter', requestId, hiddenCategories}
+//   worker -> 主线程: {type: 'progress', requestId, stage} | {type: 'loaded', requestId, relativeMinTime, relativeMaxTime, categories}
+//                    | {type: 'rendered', requestId, svg, meta, flows} | {type: 'error', requestId, message}
+// svg和meta以ArrayBuffer的形式转移，避免大字符串的结构化拷贝
+// *******************************************************************************************
+importScripts('graph.js', 'https://cdn.jsdelivr.net/npm/@viz-js/viz@3.7.0/lib/viz-standalone.js');
+
+let originGraph = null;
+let vizInstance = null;
+// 不显示的tensor category，加载新图时重置
+let hiddenCategories = new Set();
+// 随渲染结果返回的数据流条数
+const maxFlows = 20;
+// 最新请求的id，渲染前发现有更新的请求时放弃当前渲染
+let latestRequestId = 0;
+// 每次加载递增，加载中的await之后发现有更新的加载开始时丢弃本次结果，只有最后开始的加载会替换originGraph
+let loadGeneration = 0;
+// 与core/validate.py的validation_version一致
+const validationVersion = 2;
+
+const encoder = new TextEncoder();
+
+function postBuffer(message, text) {
+  const buffer = encoder.encode(text).buffer;
+  self.postMessage({...message, buffer}, [buffer]);
+}
+
+function progress(requestId, stage) {
+  self.postMessage({type: 'progress', requestId, stage});
+}
+
+// 让出事件循环，使排队中的新请求有机会更新latestRequestId
+function isSuperseded(requestId) {
+  return new Promise(resolve => setTimeout(() => resolve(requestId !== latestRequestId), 0));
+}
+
+// 与core/validate.py的content_hash一致：对校验读取的字段按id排序后做sha256
+async function contentHash(nodes_json) {
+  const fields = [...nodes_json].sort((a, b) => a.id - b.id).map(n => [n.id, n.isTensor, n.isLeaf, n.children, n.nextNodes]);
+  const digest = await crypto.subtle.digest('SHA-256', encoder.encode(JSON.stringify(fields)));
+  return [...new Uint8Array(digest)].map(b => b.toString(16).padStart(2, '0')).join('');
+}
+
+// 只有校验版本一致且重新计算的哈希与标记一致时才信任validated标记，手动修改或截断的文件仍会校验
+async function isTrusted(data, nodes_json) {
+  if (!data.validated || data.validation_version !== validationVersion || !data.content_hash) return false;
+  return (await contentHash(nodes_json)) === data.content_hash;
+}
+
+// 渲染开始后有更新的请求，或者originGraph已被新加载的图替换时放弃
+async function render(requestId) {
+  const graph = originGraph;
+  const isStale = async () => (await isSuperseded(requestId)) || graph !== originGraph;
+  if (await isStale()) return;
+  progress(requestId, 'transform');
+  const renderGraph = graph.generate_new_graph();
+  const dot = renderGraph.generate_dot(null, [], hiddenCategories);
+
+  if (await isStale()) return;
+  progress(requestId, 'layout');
+  if (!vizInstance) vizInstance = await Viz.instance();
+  const svg = vizInstance.renderString(dot, {format: 'svg'});
+
+  if (await isStale()) return;
+  // 主线程悬停和时间轴高亮只需要这些字段
+  const meta = [...renderGraph.nodes.values()].map(n => [n.id, n.label, n.info, n.isLeaf, n.relative_start_time, n.relative_end_time]);
+  // 当前折叠状态下数据量最大的module间数据流
+  const flows = renderGraph.getHeaviestFlows(maxFlows);
+  postBuffer({type: 'rendered', requestId}, JSON.stringify({svg, meta, flows}));
+}
+
+// 折叠/过滤请求不会取消加载：加载成功后总是替换originGraph并重置状态，只有渲染会被之后的请求取代。
+// 之后开始的加载会取代当前加载，当前加载在await之后发现时直接放弃，不替换originGraph也不发送loaded
+async function load(requestId, buffer) {
+  const generation = ++loadGeneration;
+  progress(requestId, 'parse');
+  const data = JSON.parse(new TextDecoder().decode(buffer));
+  const nodes_json = expandDedupJson(data);
+
+  const trusted = await isTrusted(data, nodes_json);
+  if (generation !== loadGeneration) return;
+  progress(requestId, trusted ? 'build' : 'validate');
+  const graph = new Graph();
+  nodes_json.forEach(nj => graph.nodes.set(nj.id, new Node(nj)));
+  groupRepeatedInstances(graph, nodes_json);
+  if (!trusted && !graph.isLegalGraph()) {
+    self.postMessage({type: 'error', requestId, message: 'illegal graph'});
+    return;
+  }
+  minTime = -1;
+  maxTime = -1;
+  graph.setRelativeTime();
+  originGraph = graph;
+  hiddenCategories = new Set();
+  const categories = graph.getCategories().map(c => [c, categoryColor(c)]);
+  self.postMessage({type: 'loaded', requestId, relativeMinTime, relativeMaxTime, categories});
+  // 加载期间到达的折叠/过滤请求作用于旧图，以最新的请求id渲染新图
+  await render(latestRequestId);
+}
+
+self.onmessage = async (event) => {
+  const msg = event.data;
+  latestRequestId = Math.max(latestRequestId, msg.requestId);
+  try {
+    if (msg.type === 'load') {
+      await load(msg.requestId, msg.buffer);
+    } else if (msg.type === 'toggle') {
+      // 折叠状态立即生效，即使本次渲染被后续请求取代，状态也会体现在之后的渲染中
+      if (originGraph && originGraph.nodes.has(msg.nodeId)) {
+        const node = originGraph.nodes.get(msg.nodeId);
+        node.isCollapse = !node.isCollapse;
+        await render(msg.requestId);
+      }
+    } else if (msg.type === 'filter') {
+      hiddenCategories = new Set(msg.hiddenCategories);
+      if (originGraph) await render(msg.requestId);
+    }
+  } catch (err) {
+    self.postMessage({type: 'error', requestId: msg.requestId, message: String(err)});
+  }
+};
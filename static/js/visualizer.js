@@ -1,272 +1,3 @@
-// 全局变量
-let maxTime = -1;
-let minTime = -1;
-let relativeMaxTime = -1;
-let relativeMinTime = -1;
-let nsToS = 10000000;
-
-// *******************************************************************************************
-// node
-// 仅用于存储字段，不可以添加方法，因为拷贝node时只拷贝字符串
-// *******************************************************************************************
-class Node {
-  constructor(node_json) {
-    this.id = node_json.id;
-    this.start_time = node_json.start_time;
-    this.end_time = node_json.end_time
-    this.isTensor = !!node_json.isTensor;
-    this.isLeaf = !!node_json.isLeaf;
-    this.label = node_json.label ?? String(node_json.id);
-    this.parent = node_json.parent ?? null;
-    this.children = Array.isArray(node_json.children) ? [...node_json.children] : [];
-    this.nextNodes = Array.isArray(node_json.nextNodes) ? [...node_json.nextNodes] : [];
-    this.isCollapse = true;
-    if (this.isTensor && node_json?.info) {
-      const device = node_json.info.device ?? 'unknown';
-      const dtype = node_json.info.dtype ?? 'unknown';
-      const size = node_json.info.size ?? 'unknown';
-      const shape = node_json.info.shape ?? 'unknown';
-      this.info = `${device}\n${dtype}\n${size}\n${shape}`;
-    } else {
-      this.info = "";
-    }
-
-    // 相对时间（会在 Graph 初始化时计算）
-    this.relative_start_time = 0;
-    this.relative_end_time = 0;
-  }
-}
-
-// *******************************************************************************************
-// graph
-// *******************************************************************************************
-class Graph {
-  constructor() {
-    this.nodes = new Map();
-  }
-
-  isLegalGraph() {
-    const inDegree = new Map();
-
-    // 初始化入度表
-    for (const node of this.nodes.values()) {
-      inDegree.set(node.id, 0);
-    }
-
-    // 第一遍遍历：检查各种规则并计算入度
-    for (const [u, node] of this.nodes) {
-      // 规则1: 非叶子节点不应该有 nextNodes
-      if (!node.isLeaf && node.nextNodes.length > 0) {
-        console.log("subgraph should not have next nodes.");
-        return false;
-      }
-
-      // 规则2: 叶子节点不应该有 children
-      if (node.isLeaf && node.children.length > 0) {
-        console.log("leaf node should not have children.");
-        return false;
-      }
-
-      // 规则3: 非叶子节点应该有 children
-      if (!node.isLeaf && node.children.length === 0) {
-        console.log("non leaf node should have children.");
-        return false;
-      }
-
-      // 计算入度并检查规则4
-      for (const v of node.nextNodes) {
-        const nextNode = this.nodes.get(v);
-        if (!nextNode) {
-          console.log(`Next node ${v} not found in graph.`);
-          return false;
-        }
-
-        // 规则4: op节点的输出应该是tensor，tensor应该是op节点的输入
-        if (node.isTensor === nextNode.isTensor) {
-          console.log("op node's output should be tensor, tensor should be input of op node.");
-          return false;
-        }
-
-        // 更新入度
-        inDegree.set(v, (inDegree.get(v) || 0) + 1);
-      }
-    }
-
-    // 检查规则5: tensor节点入度不能超过1
-    for (const [nodeId, degree] of inDegree) {
-      const node = this.nodes.get(nodeId);
-      if (node.isTensor && degree > 1) {
-        console.log("tensor only has one producer.");
-        return false;
-      }
-    }
-
-    // 拓扑排序检查环
-    const queue = [];
-    for (const [nodeId, degree] of inDegree) {
-      if (degree === 0) {
-        queue.push(nodeId);
-      }
-    }
-
-    let count = 0;
-    while (queue.length > 0) {
-      const u = queue.shift();
-      count++;
-      const currentNode = this.nodes.get(u);
-      for (const v of currentNode.nextNodes) {
-        const currentDegree = inDegree.get(v) - 1;
-        inDegree.set(v, currentDegree);
-        if (currentDegree === 0) {
-          queue.push(v);
-        }
-      }
-    }
-    return count === this.nodes.size;
-  }
-
-  setRelativeTime() {
-    for (const node of this.nodes.values()) {
-      if (node.start_time !== -1) {
-        if (minTime == -1) {
-          minTime = node.start_time;
-        } else {
-          minTime = Math.min(minTime, node.start_time);
-        }
-        maxTime = Math.max(maxTime, node.start_time);
-      }
-      if (node.end_time !== -1) {
-        if (minTime == -1) {
-          minTime = node.end_time;
-        } else {
-          minTime = Math.min(minTime, node.end_time);
-        }
-        maxTime = Math.max(maxTime, node.end_time);
-      }
-    }
-    if (minTime !== -1 && maxTime !== -1) {
-      minTime = minTime - 10000000;
-      maxTime = maxTime + 10000000;
-    } else {
-      minTime = 0;
-      maxTime = 10000000;
-    }
-    relativeMinTime = 0;
-    // relativeMaxTime = ((maxTime - minTime) / nsToS).toFixed(3);
-    relativeMaxTime = maxTime - minTime;
-    for (const node of this.nodes.values()) {
-      if (node.start_time !== -1) {
-        // node.relative_start_time = ((node.start_time - minTime) / nsToS).toFixed(3);
-        node.relative_start_time = node.start_time - minTime;
-      } else {
-        node.relative_start_time = relativeMinTime;
-      }
-      if (node.end_time !== -1) {
-        // node.relative_end_time = ((node.end_time - minTime) / nsToS).toFixed(3);
-        node.relative_end_time = node.end_time - minTime;
-      } else {
-        // node.relative_end_time = (relativeMaxTime / nsToS).toFixed(3);
-        node.relative_end_time = relativeMaxTime;
-      }
-      node.info += `\n${node.relative_start_time},${node.relative_end_time}`;
-    }
-  }
-
-  // 获取在指定时间活跃的节点ID
-  getActiveNodesAtTime(currentTime) {
-    const activeNodes = new Set();
-    for (const [nodeId, node] of this.nodes) {
-      if (node.isLeaf && currentTime >= node.relative_start_time && currentTime <= node.relative_end_time) {
-        activeNodes.add(nodeId);
-      }
-    }
-    return activeNodes;
-  }
-
-  generate_dot(rootNodes = null, highlightNodes = []) {
-    const node_dot_lines = [], edges_dot_lines = [];
-
-    const dfs_generate_dot = (children, depth) => {
-      const sub = [];
-      children.forEach(node_id => {
-        const node = this.nodes.get(node_id);
-        if (!node) return;
-
-        // 构建包含时间信息的标签
-        let timeInfo = '';
-        if (node.relativeStart !== undefined && node.relativeEnd !== undefined) {
-          timeInfo = `\\n[${node.relativeStart.toFixed(1)}-${node.relativeEnd.toFixed(1)}ms]`;
-        }
-
-        const isHighlighted = highlightNodes.includes(node_id);
-        const colorAttr = isHighlighted ? 'color=green, style=filled, fillcolor=lightgreen' : '';
-
-        if (node.isLeaf) {
-          const shape = node.isTensor ? "ellipse" : "box";
-          const tooltip = `tooltip="${escapeDotLabel(node.info || node.label)}"`;
-          sub.push(`${"    ".repeat(depth)}"${node_id}" [label="${escapeDotLabel(node.label + timeInfo)}", shape=${shape}, ${tooltip}, ${colorAttr}];`);
-          node.nextNodes.forEach(id => { 
-              edges_dot_lines.push(`${"    "}"${node_id}" -> "${id}";`) 
-          });
-        } else {
-          const clusterLabel = node.label + timeInfo;
-          sub.push(`${"    ".repeat(depth)}subgraph cluster_${node_id} {`);
-          sub.push(`${"    ".repeat(depth+1)}label="${escapeDotLabel(clusterLabel)}";`);
-          sub.push(`${"    ".repeat(depth+1)}style=rounded;`);
-          if (isHighlighted) {
-            sub.push(`${"    ".repeat(depth+1)}color=green;`);
-            sub.push(`${"    ".repeat(depth+1)}style="rounded,filled";`);
-            sub.push(`${"    ".repeat(depth+1)}fillcolor=lightgreen;`);
-          } else {
-            sub.push(`${"    ".repeat(depth+1)}color=blue;`);
-          }
-          const clusterTooltip = `tooltip="${escapeDotLabel(node.info || `Cluster: ${node.label}`)}"`;
-          sub.push(`${"    ".repeat(depth+1)}${clusterTooltip};`);
-          sub.push(...dfs_generate_dot(node.children, depth+1));
-          sub.push(`${"    ".repeat(depth)}}`);
-        }
-      });
-      return sub;
-    };
-
-    if (!rootNodes) rootNodes = [...this.nodes.values()].filter(n => n.parent===null).map(n=>n.id);
-    node_dot_lines.push(...dfs_generate_dot(rootNodes, 1));
-    const root_dot_lines=[
-        "digraph G {",
-        '    rankdir=LR;',
-        '    node [fontname="Arial"];',
-        '    tooltip = "";',
-        " }"
-    ];
-    return [...root_dot_lines.slice(0,-1),...node_dot_lines,...edges_dot_lines,...root_dot_lines.slice(-1)].join("\n");
-  }
-  _get_out_tensors_of_collapse_node(root_id) {
-    const result=[];
-    const in_root=(node_id)=>{while(node_id!=null){if(node_id===root_id)return true;node_id=this.nodes.get(node_id)?.parent??null;}return false;}
-    const dfs=(nid)=>{const node=this.nodes.get(nid);if(!node)return;if(node.isLeaf){if(node.isTensor && node.nextNodes.some(n=>!in_root(n)))result.push(nid);}else{node.children.forEach(c=>dfs(c));}};
-    dfs(root_id);return result;
-  }
-  generate_new_graph() {
-    const new_graph = new Graph();
-    const roots = [...this.nodes.values()].filter(n => n.parent===null).map(n=>n.id);
-    const dfs_build = (node_id) => {
-      const node=this.nodes.get(node_id);if(!node)return[];
-      if(node.isLeaf){new_graph.nodes.set(node_id, deepCopyNode(node)); return [];}
-      if(node.isCollapse){const c=deepCopyNode(node);c.isLeaf=true;c.children=[];c.nextNodes=this._get_out_tensors_of_collapse_node(node_id);new_graph.nodes.set(node_id,c);return c.nextNodes||[];}
-      new_graph.nodes.set(node_id, deepCopyNode(node)); let extra=[]; node.children.forEach(child=>{extra=extra.concat(dfs_build(child))});
-      extra.forEach(cid=>{const o=this.nodes.get(cid);if(o){const copy=deepCopyNode(o);copy.parent=node_id;new_graph.nodes.set(cid,copy)}})
-      const ngNode=new_graph.nodes.get(node_id); if(ngNode){ngNode.children=Array.from(new Set([...(ngNode.children||[]),...extra]))}
-      return [];
-    };
-    let extra=[]; roots.forEach(r=>{extra=extra.concat(dfs_build(r))});
-    extra.forEach(cid=>{const o=this.nodes.get(cid);if(o){const copy=deepCopyNode(o);copy.parent=null;new_graph.nodes.set(cid,copy)}})
-    const find_ancestor=(nid)=>{while(nid!=null&&!new_graph.nodes.has(nid)){nid=this.nodes.get(nid)?.parent??null;}return nid;}
-    const dfs_edges=(nid)=>{const node=new_graph.nodes.get(nid);if(!node)return;const updated=new Set([...node.nextNodes].map(n=>find_ancestor(n)).filter(x=>x!=null));node.nextNodes=Array.from(updated);(node.children||[]).forEach(c=>dfs_edges(c));}
-    roots.forEach(r=>{if(new_graph.nodes.has(r))dfs_edges(r);});
-    return new_graph;
-  }
-}
-
 // *******************************************************************************************
 // timeline manager
 // *******************************************************************************************
@@ -330,8 +61,8 @@ class TimelineManager {
 
 const svgContainer=document.getElementById('svgContainer');
 const status=document.getElementById('status');
-let originGraph=new Graph();
-let currentRenderGraph=null;
+// 当前显示的图中每个节点的标签、详细信息和相对时间，由worker渲染后返回
+let renderMeta=new Map();
 let timelineManager=null;
 
 // 增加悬停显示功能，悬停显示tensor或者op的详细信息
@@ -365,7 +96,7 @@ function addHoverEffects(svgEl) {
     }
 
     const originalNodeId = extractNodeId(nodeId);
-    const originalNode = currentRenderGraph.nodes.get(originalNodeId) || originGraph.nodes.get(originalNodeId);
+    const originalNode = renderMeta.get(originalNodeId);
     
     if (originalNode) {
       // 添加悬停类名
@@ -418,19 +149,9 @@ function addHoverEffects(svgEl) {
   return tooltip;
 }
 
-function escapeDotLabel(s){
-  return String(s)
-    .replace(/\\/g,"\\\\")
-    .replace(/"/g,'\\"')
-    .replace(/\n/g,'\\n')
-    .replace(/\r/g,'\\r')
-    .replace(/\t/g,'\\t');
-}
-function deepCopyNode(node){return JSON.parse(JSON.stringify(node));}
-
 // 增加高亮功能，高亮显示当前时刻存在的tensor和正在运行的op，实时更新高亮节点
 function highlightNodesAtTime(currentTime) {
-  if (!currentRenderGraph) return;
+  if (!renderMeta.size) return;
 
   // 移除之前的高亮
   const svgEl = svgContainer.querySelector('svg');
@@ -449,7 +170,9 @@ function highlightNodesAtTime(currentTime) {
   });
 
   // 获取当前时间活跃的节点
-  const activeNodes = currentRenderGraph.getActiveNodesAtTime(currentTime);
+  const activeNodes = [...renderMeta].filter(([, node]) =>
+    node.isLeaf && currentTime >= node.relative_start_time && currentTime <= node.relative_end_time
+  ).map(([nodeId]) => nodeId);
 
   // 高亮活跃节点
   activeNodes.forEach(nodeId => {
@@ -499,32 +222,66 @@ function findSvgElementsByTitle(svgElement, titleText) {
 // 将高亮函数暴露给全局
 window.highlightNodesAtTime = highlightNodesAtTime;
 
-// 渲染图，添加交互函数，如点击事件和悬停效果
-async function renderFromOriginGraph() {
-  currentRenderGraph=originGraph.generate_new_graph();
-  const dot=currentRenderGraph.generate_dot();
-  try{
-    // 渲染 SVG 字符串
-    const svgString = await viz.renderString(dot, { format: "svg" });
-    // 将字符串转为 DOM 元素
-    const parser = new DOMParser();
-    const doc = parser.parseFromString(svgString, "image/svg+xml");
-    const svgEl = doc.documentElement;
-    // svg添加到container中
-    svgContainer.innerHTML='';
-    svgContainer.appendChild(svgEl);
-    // 添加点击事件
-    attachClickHandlersToRenderedSVG(svgEl);
-    // 添加悬停效果
-    addHoverEffects(svgEl);
-    // 初始高亮
-    highlightNodesAtTime(timelineManager ? timelineManager.currentTime : 0);
-  }catch(err){
-    console.error(err);
+// *******************************************************************************************
+// render worker client
+// 加载、校验、图变换和渲染都在worker中完成，主线程只替换svg；每个请求带递增id，过期的结果直接丢弃
+// *******************************************************************************************
+const renderWorker=new Worker(window.renderWorkerUrl);
+let latestRequestId=0;
+// 最新的加载请求，加载完成前有折叠/过滤请求时，它的loaded和error仍需处理
+let latestLoadRequestId=0;
+let requestStartTime=0;
+
+function postToWorker(message, transfer=[]){
+  latestRequestId+=1;
+  if(message.type==='load')latestLoadRequestId=latestRequestId;
+  requestStartTime=performance.now();
+  renderWorker.postMessage({...message, requestId: latestRequestId}, transfer);
+}
+
+renderWorker.onmessage = (event) => {
+  const msg=event.data;
+  const isLoadResult=(msg.type==='loaded'||msg.type==='error')&&msg.requestId===latestLoadRequestId;
+  if(msg.requestId!==latestRequestId&&!isLoadResult)return;
+  if(msg.type==='progress'){
+    status.textContent=`${msg.stage}...`;
+  }else if(msg.type==='loaded'){
+    // 初始化时间条管理器
+    if (!timelineManager) {
+      timelineManager = new TimelineManager();
+    }
+    timelineManager.updateTimeRange(msg.relativeMinTime, msg.relativeMaxTime);
+    buildCategoryFilter(msg.categories);
+  }else if(msg.type==='rendered'){
+    const {svg, meta, flows}=JSON.parse(new TextDecoder().decode(msg.buffer));
+    showRenderedSvg(svg, meta);
+    showFlows(flows);
+    status.textContent=`rendered in ${(performance.now()-requestStartTime).toFixed(0)} ms`;
+  }else if(msg.type==='error'){
+    console.log(`${msg.message}, exit!`);
+    status.textContent=msg.message;
   }
+};
+
+// 将worker渲染好的svg替换到页面中，添加交互函数，如点击事件和悬停效果
+function showRenderedSvg(svgString, meta) {
+  renderMeta=new Map(meta.map(([id, label, info, isLeaf, start, end])=>[String(id), {label, info, isLeaf, relative_start_time: start, relative_end_time: end}]));
+  // 将字符串转为 DOM 元素
+  const parser = new DOMParser();
+  const doc = parser.parseFromString(svgString, "image/svg+xml");
+  const svgEl = doc.documentElement;
+  // svg添加到container中
+  svgContainer.innerHTML='';
+  svgContainer.appendChild(svgEl);
+  // 添加点击事件
+  attachClickHandlersToRenderedSVG(svgEl);
+  // 添加悬停效果
+  addHoverEffects(svgEl);
+  // 初始高亮
+  highlightNodesAtTime(timelineManager ? timelineManager.currentTime : 0);
 }
 
-// 增加点击进行折叠或展开功能
+// 增加点击进行折叠或展开功能，快速连续点击时只有最后一次的渲染结果会显示
 function attachClickHandlersToRenderedSVG(svgEl){
   const nodeGroupList=svgEl.querySelectorAll('g.node');
   nodeGroupList.forEach(g=>{
@@ -535,12 +292,9 @@ function attachClickHandlersToRenderedSVG(svgEl){
     g.style.cursor='pointer';
     g.addEventListener('mouseenter',()=>g.style.opacity='0.7');
     g.addEventListener('mouseleave',()=>g.style.opacity='1');
-    g.addEventListener('click',async e=>{
+    g.addEventListener('click',e=>{
       e.stopPropagation();
-      if(originGraph.nodes.has(nid)){
-        originGraph.nodes.get(nid).isCollapse=!originGraph.nodes.get(nid).isCollapse;
-        await renderFromOriginGraph();
-      }
+      postToWorker({type: 'toggle', nodeId: nid});
     });
   });
   const clusterGroupList = svgEl.querySelectorAll('g.cluster');
@@ -554,48 +308,106 @@ function attachClickHandlersToRenderedSVG(svgEl){
       g.style.cursor = 'pointer';
       g.addEventListener('mouseenter', ()=> g.style.opacity='0.7');
       g.addEventListener('mouseleave', ()=> g.style.opacity='1');
-      g.addEventListener('click', async e => {
+      g.addEventListener('click', e => {
         e.stopPropagation();
-        if(originGraph.nodes.has(nid)){
-          originGraph.nodes.get(nid).isCollapse = !originGraph.nodes.get(nid).isCollapse;
-          await renderFromOriginGraph();
-        }
+        postToWorker({type: 'toggle', nodeId: nid});
       });
     }
   });
 }
 
-// 增加文件导入功能。导入文件后首先创建原始图并校验合法性，然后更新时间信息并初始化时间管理器
+// 当前折叠状态下数据量最大的module间数据流，折叠到stage粒度时可以看到跨stage的激活大小
+const flowList=document.getElementById('flowList');
+function showFlows(flows){
+  flowList.textContent=flows.map(f=>`${(f.bytes/1e6).toFixed(2).padStart(10)} MB ${String(f.tensors).padStart(5)} tensors  ${f.fromLabel} -> ${f.toLabel}`).join('\n');
+}
+
+// 按tensor category着色的图例，取消勾选的category不显示
+const categoryFilter=document.getElementById('categoryFilter');
+function buildCategoryFilter(categories){
+  categoryFilter.innerHTML='';
+  categories.forEach(([category, color])=>{
+    const label=document.createElement('label');
+    const checkbox=document.createElement('input');
+    checkbox.type='checkbox';
+    checkbox.checked=true;
+    checkbox.value=category;
+    checkbox.addEventListener('change', ()=>{
+      const hidden=[...categoryFilter.querySelectorAll('input:not(:checked)')].map(c=>c.value);
+      postToWorker({type: 'filter', hiddenCategories: hidden});
+    });
+    const swatch=document.createElement('span');
+    swatch.className='category-swatch';
+    swatch.style.background=color;
+    label.append(checkbox, swatch, category);
+    categoryFilter.appendChild(label);
+  });
+}
+
+// 将json文本交给worker，ArrayBuffer以转移的方式传递，不做拷贝
+function loadGraphBuffer(buffer){
+  postToWorker({type: 'load', buffer}, [buffer]);
+}
+
+// 正在读取的采集或文件，新的选择开始时中止，避免先发出的请求后返回时覆盖之后选择的图
+let pendingLoad=null;
+function startLoad(){
+  if(pendingLoad)pendingLoad.abort();
+  pendingLoad=new AbortController();
+  return pendingLoad;
+}
+
+// 增加文件导入功能
 document.getElementById('jsonFileInput').addEventListener('change', async (event)=>{
   const file=event.target.files[0];
   if(!file){return;}
-  const reader=new FileReader();
-  reader.onload = async function(e){
-    try{
-      // 创建原始图
-      const nodes_json=JSON.parse(e.target.result);
-      originGraph=new Graph();
-      nodes_json.forEach(nj=>{originGraph.nodes.set(nj.id,new Node(nj))});
-
-      // 更新时间为相对时间
-      originGraph.setRelativeTime();
-
-      // 判断图是否合法
-      const isValid = originGraph.isLegalGraph();
-      if (!isValid) {
-        console.log("illegal graph, exit!");
-        return;
-      }
+  const controller=startLoad();
+  try{
+    const buffer=await file.arrayBuffer();
+    if(controller.signal.aborted)return;
+    loadGraphBuffer(buffer);
+  }catch(err){
+    console.error(err);
+  }
+});
 
-      // 初始化时间条管理器
-      if (!timelineManager) {
-        timelineManager = new TimelineManager();
-        timelineManager.updateTimeRange(relativeMinTime, relativeMaxTime)
-      }
-      await renderFromOriginGraph();
-    }catch(err){
-      console.error(err);
+// 从服务端加载已有的采集结果，浏览器按ETag缓存，文件未变化时服务端返回304
+const captureSelect=document.getElementById('captureSelect');
+// 采集名 -> 可加载的文件：优先complex_graph.json，只有complex_graph_dedup.json时加载去重格式（worker中展开）
+const captureFiles=new Map();
+async function loadCaptureCatalog(){
+  try{
+    const response=await fetch('/api/captures');
+    const captures=await response.json();
+    captures.forEach(c=>{
+      captureFiles.set(c.name, 'complex_graph.json' in c.files ? 'complex_graph.json' : 'complex_graph_dedup.json');
+      const option=document.createElement('option');
+      option.value=c.name;
+      option.textContent=c.name;
+      captureSelect.appendChild(option);
+    });
+  }catch(err){
+    console.error(err);
+  }
+}
+captureSelect.addEventListener('change', async ()=>{
+  const name=captureSelect.value;
+  if(!name)return;
+  const controller=startLoad();
+  try{
+    const t0=performance.now();
+    const response=await fetch(`/data/${encodeURIComponent(name)}/${captureFiles.get(name)}`, {signal: controller.signal});
+    if(!response.ok){
+      status.textContent=`failed to load ${name}: ${response.status}`;
+      return;
     }
+    const buffer=await response.arrayBuffer();
+    if(controller.signal.aborted)return;
+    console.log(`${name}: fetch ${(performance.now()-t0).toFixed(0)} ms`);
+    loadGraphBuffer(buffer);
+  }catch(err){
+    // 被之后的选择中止的请求不需要提示
+    if(err.name!=='AbortError')console.error(err);
   }
-  reader.readAsText(file,'utf-8');
 });
+loadCaptureCatalog();
@@ -0,0 +1,80 @@
+# 构造测试用的小规模graph.json/tree.json，字段与core.extractor的输出一致
+from typing import Dict, List, Optional, Tuple
+
+
+def tensor(id: int, size: int, start_time: int = -1, end_time: int = -1, shape: str = "[]", version: int = 0,
+           device: str = "cuda:0", category: str = "activation", dtype: str = "torch.float32") -> Dict:
+    return {"id": id, "version": version, "device": device, "shape": shape, "dtype": dtype, "size": size,
+            "start_time": start_time, "end_time": end_time, "category": category}
+
+
+def op(id: int, name: str, start_time: int, end_time: int, in_edges: Optional[List[Dict]] = None,
+       out_edges: Optional[List[Dict]] = None, thread: Optional[int] = None, **fields) -> Dict:
+    node = {"id": id, "name": name, "start_time": start_time, "end_time": end_time}
+    if thread is not None:
+        node["thread"] = thread
+    node.update(fields)
+    node["in_edges"] = in_edges or []
+    node["out_edges"] = out_edges or []
+    return node
+
+
+def tree_node(id: int, name: str, start_time: int, end_time: int, parent: Optional[int] = None,
+              children: Optional[List[int]] = None, scope: str = "forward") -> Dict:
+    children = children or []
+    return {"id": id, "name": name, "start_time": start_time, "end_time": end_time, "is_leaf": not name.startswith("nn.Module"),
+            "scope": scope, "parent": parent, "children": children}
+
+
+def tree_from_graph(graph_data: List[Dict], modules: Dict[int, Dict]) -> List[Dict]:
+    """
+    op为叶子节点，modules为module id -> {"name", "children", "parent", "scope"}，起止时间取子节点的范围，
+    没有出现在任何module中的op作为对应scope的根节点（scope默认forward，op可带"scope"字段）
+    """
+    nodes: Dict[int, Dict] = {}
+    parent_of: Dict[int, int] = {}
+    for module_id, module in modules.items():
+        for child in module["children"]:
+            parent_of[child] = module_id
+    for node in graph_data:
+        nodes[node["id"]] = tree_node(node["id"], node["name"], node["start_time"], node["end_time"],
+                                      parent_of.get(node["id"]), scope=node.get("scope", "forward"))
+
+    def build(module_id: int) -> Dict:
+        module = modules[module_id]
+        children = [nodes[c] if c in nodes else build(c) for c in module["children"]]
+        nodes[module_id] = tree_node(module_id, f'nn.Module: {module["name"]}', min(c["start_time"] for c in children),
+                                     max(c["end_time"] for c in children), parent_of.get(module_id), module["children"],
+                                     module.get("scope", children[0]["scope"]))
+        return nodes[module_id]
+
+    for module_id in modules:
+        if module_id not in nodes:
+            build(module_id)
+    return sorted(nodes.values(), key=lambda n: (n["start_time"], n["id"]))
+
+
+def mlp_capture(slowdown: float = 1.0, gap: int = 1000) -> Tuple[List[Dict], List[Dict]]:
+    """
+    两层MLP的前向：Net_0下依次为Linear_0(aten::linear)、ReLU_0(aten::relu)、Linear_1(aten::linear)，
+    op之间间隔gap纳秒，每个op耗时100ns乘以slowdown（开始时间不变）
+    """
+    x = tensor(1, 4096, 0, 10000, "[8,128]")
+    w1, w2 = tensor(2, 65536, category="parameter", shape="[128,128]"), tensor(3, 5120, category="parameter", shape="[10,128]")
+    h = tensor(4, 4096, 1050, 10000, "[8,128]")
+    a = tensor(5, 4096, 2050, 10000, "[8,128]")
+    y = tensor(6, 320, 3050, -1, "[8,10]")
+    duration = int(100 * slowdown)
+    starts = [0, gap + 100, 2 * (gap + 100)]
+    graph_data = [
+        op(11, "aten::linear", starts[0] + 1000, starts[0] + 1000 + duration, [x, w1], [h]),
+        op(12, "aten::relu", starts[1] + 1000, starts[1] + 1000 + duration, [h], [a]),
+        op(13, "aten::linear", starts[2] + 1000, starts[2] + 1000 + duration, [a, w2], [y]),
+    ]
+    modules = {
+        1: {"name": "Net_0", "children": [2, 3, 4]},
+        2: {"name": "Linear_0", "children": [11]},
+        3: {"name": "ReLU_0", "children": [12]},
+        4: {"name": "Linear_1", "children": [13]},
+    }
+    return graph_data, tree_from_graph(graph_data, modules)
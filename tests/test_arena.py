@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+from core.arena import collect_lifetimes, plan_arena
+from tests.synthetic import op, tensor
+
+
+def _chain(sizes_and_times):
+    # 每个tensor由一个op产生，op之间没有数据依赖
+    return [op(i, "aten::empty", start, start + 1, [], [tensor(i, size, start, end)])
+            for i, (size, start, end) in enumerate(sizes_and_times)]
+
+
+def test_disjoint_lifetimes_reuse_one_block():
+    graph_data = _chain([(1000, 0, 10), (3000, 20, 30), (2000, 40, 50)])
+    plan = plan_arena(graph_data)
+    assert plan["lower_bound"] == 3072
+    assert plan["arena_size"] == plan["lower_bound"]
+    assert plan["fragmentation"] == 0.0
+    assert {a["offset"] for a in plan["allocations"]} == {0}
+
+
+def test_overlapping_tensors_never_share_bytes():
+    rng = random.Random(0)
+    items = []
+    for _ in range(60):
+        start = rng.randint(0, 1000)
+        items.append((rng.randint(1, 8) * 512, start, start + rng.randint(1, 200)))
+    plan = plan_arena(_chain(items))
+    assert plan["arena_size"] >= plan["lower_bound"]
+    allocations = plan["allocations"]
+    for i, a in enumerate(allocations):
+        for b in allocations[i + 1:]:
+            overlap_in_time = a["start_time"] < b["end_time"] and b["start_time"] < a["end_time"]
+            overlap_in_memory = a["offset"] < b["offset"] + b["size"] and b["offset"] < a["offset"] + a["size"]
+            assert not (overlap_in_time and overlap_in_memory)
+        assert a["offset"] + a["size"] <= plan["arena_size"]
+
+
+def test_persistent_tensors_stay_outside_the_arena():
+    graph_data = [op(1, "aten::linear", 0, 10, [tensor(1, 4096, category="parameter")], [tensor(2, 512, 5, 20)])]
+    blocks, persistent = collect_lifetimes(graph_data)
+    assert persistent == 4096
+    assert [b["key"] for b in blocks] == ["2_cuda:0"]
+    assert plan_arena(graph_data)["planned_peak"] == 4096 + 512
+
+
+def test_usage_lifetime_ends_at_the_last_consumer():
+    # a在30时最后一次被使用，直到1000才释放；b在500申请
+    a = tensor(1, 512, 0, 1000)
+    graph_data = [
+        op(1, "aten::relu", 0, 10, [], [a]),
+        op(2, "aten::sum", 20, 30, [a], []),
+        op(3, "aten::relu", 500, 510, [], [tensor(2, 512, 500, 600)]),
+    ]
+    usage, _ = collect_lifetimes(graph_data, lifetime="usage")
+    assert {b["key"]: (b["start_time"], b["end_time"]) for b in usage}["1_cuda:0"] == (0, 30)
+    assert plan_arena(graph_data)["arena_size"] == 1024
+    assert plan_arena(graph_data, lifetime="usage")["arena_size"] == 512
+
+
+def test_unknown_lifetime_mode_raises():
+    with pytest.raises(ValueError):
+        plan_arena([], lifetime="optimal")
@@ -0,0 +1,28 @@
+# 在CPU上运行真实的示例并采集，运行方式：python -m pytest tests
+import json
+
+import torch
+
+from core.transfer import find_transfers
+from hijack_function.hijack_profiler import capture
+
+
+def test_dnn_example_captures_on_cpu(tmp_path):
+    from examples.DNN.model import train
+
+    # 保留cpu上的tensor，否则CPU上采集到的graph.json为空
+    with capture("DNN", str(tmp_path), devices=["*"]):
+        train("dataflow")
+
+    graph_data = json.loads((tmp_path / "DNN" / "graph.json").read_text())
+    tree_data = json.loads((tmp_path / "DNN" / "tree.json").read_text())
+    assert graph_data and tree_data
+
+    report = find_transfers(graph_data, tree_data)
+    if torch.cuda.is_available():
+        # 输入和标签从主机拷贝到GPU
+        assert report["transfers"]
+        assert {d["direction"] for d in report["directions"]} >= {"H2D"}
+    else:
+        # 只有cpu时示例中的.to(device)不产生拷贝
+        assert report == {"transfers": [], "directions": [], "modules": []}
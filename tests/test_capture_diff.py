@@ -0,0 +1,53 @@
+from core.capture_diff import _delta, check_regressions, diff_captures
+from tests.synthetic import mlp_capture, op, tensor, tree_from_graph
+
+
+def test_uniform_op_slowdown_trips_op_time_gate():
+    base_graph, base_tree = mlp_capture()
+    new_graph, new_tree = mlp_capture(slowdown=1.5)
+    report = diff_captures(base_graph, base_tree, new_graph, new_tree)
+
+    summary = report["summary"]["delta"]
+    assert summary["op_time_ratio"] == 0.5
+    # op之间的空隙不变，step的起止时间差几乎不变
+    assert summary["duration_ratio"] < 0.05
+    assert check_regressions(report, {"duration": 0.1}) == []
+    assert check_regressions(report, {"op_time": 0.1}) == ["step op_time increased by 50.00% (limit 10.00%)"]
+
+
+def test_per_module_op_time():
+    base_graph, base_tree = mlp_capture()
+    new_graph, new_tree = mlp_capture(slowdown=1.5)
+    violations = check_regressions(diff_captures(base_graph, base_tree, new_graph, new_tree), {"op_time": 0.1}, per_module=True)
+    assert "[forward]/nn.Module: Net_0#0/nn.Module: ReLU_0#0 op_time increased by 50.00% (limit 10.00%)" in violations
+
+
+def test_delta_growth_from_zero():
+    delta = _delta({"tensor_bytes": 0}, {"tensor_bytes": 512}, ["tensor_bytes"])
+    assert delta == {"tensor_bytes": 512, "tensor_bytes_ratio": None}
+    report = {"summary": {"delta": delta}, "modules": [], "ops": []}
+    assert check_regressions(report, {"tensor_bytes": 0.5}) == ["step tensor_bytes grew from 0 by 512"]
+    unchanged = {"summary": {"delta": _delta({"tensor_bytes": 0}, {"tensor_bytes": 0}, ["tensor_bytes"])}, "modules": [], "ops": []}
+    assert check_regressions(unchanged, {"tensor_bytes": 0.5}) == []
+
+
+def test_added_op_is_flagged():
+    base_graph, base_tree = mlp_capture()
+    new_graph, _ = mlp_capture()
+    # 在ReLU_0中插入一个新op，之后的op仍然对齐
+    new_graph.insert(2, op(20, "aten::dropout", 2300, 2400, [new_graph[1]["out_edges"][0]], [tensor(7, 4096, 2350, 10000, "[8,128]")]))
+    new_tree = tree_from_graph(new_graph, {
+        1: {"name": "Net_0", "children": [2, 3, 4]},
+        2: {"name": "Linear_0", "children": [11]},
+        3: {"name": "ReLU_0", "children": [12, 20]},
+        4: {"name": "Linear_1", "children": [13]},
+    })
+    report = diff_captures(base_graph, base_tree, new_graph, new_tree)
+    added = [r["path"] for r in report["ops"] if r["status"] == "added"]
+    assert added == ["[forward]/nn.Module: Net_0#0/nn.Module: ReLU_0#0/aten::dropout#0"]
+    assert all(r["status"] == "matched" for r in report["ops"] if r["name"] != "aten::dropout")
+
+    assert check_regressions(report, {"op_time": 1.0}) == []
+    violations = check_regressions(report, {"op_time": 1.0}, per_module=True)
+    assert violations[-1] == "[forward]/nn.Module: Net_0#0/nn.Module: ReLU_0#0/aten::dropout#0 was added (100ns)"
+    assert check_regressions(report, {"op_time": 1.0}, per_module=True, min_module_duration=1000) == []
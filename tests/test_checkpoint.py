@@ -0,0 +1,49 @@
+from core.checkpoint import find_saved_activations, plan_checkpoints
+from tests.synthetic import op, tensor, tree_from_graph
+
+
+def _two_block_capture():
+    """
+    Block_0和Block_1各有一个只在块内使用、直到反向才释放的400字节激活，前向之后的loss申请1000字节
+    """
+    x = tensor(1, 10, category="input")
+    a1, o1 = tensor(2, 400, 150, 2000), tensor(3, 10, 350, 2000)
+    a2, o2 = tensor(4, 400, 550, 2000), tensor(5, 10, 750, 2000)
+    loss = tensor(6, 1000, 950, -1)
+    graph_data = [
+        op(11, "aten::linear", 100, 200, [x], [a1]),
+        op(12, "aten::relu", 300, 400, [a1], [o1]),
+        op(21, "aten::linear", 500, 600, [o1], [a2]),
+        op(22, "aten::relu", 700, 800, [a2], [o2]),
+        op(31, "aten::mse_loss", 900, 1000, [o2], [loss]),
+        op(41, "ReluBackward0", 2000, 2100, [a1, a2], [tensor(7, 10, 2050, -1, category="gradient")], scope="backward"),
+    ]
+    modules = {1: {"name": "Block_0", "children": [11, 12]}, 2: {"name": "Block_1", "children": [21, 22]}}
+    return graph_data, tree_from_graph(graph_data, modules)
+
+
+def test_saved_activations_exclude_module_outputs():
+    graph_data, tree_data = _two_block_capture()
+    # 块的输出o1、o2被块外的op使用，不能释放
+    assert find_saved_activations(graph_data, tree_data) == {1: {"2_cuda:0"}, 2: {"4_cuda:0"}}
+
+
+def test_checkpointing_both_blocks_lowers_the_peak():
+    graph_data, tree_data = _two_block_capture()
+    plan = plan_checkpoints(graph_data, tree_data)
+    assert plan["base_peak"] == 10 + 400 + 10 + 400 + 10 + 1000
+    assert [c["saved_bytes"] for c in plan["candidates"]] == [400, 400]
+
+    last = plan["curve"][-1]
+    assert len(last["modules"]) == 2
+    # 两个块的激活在块结束时释放，反向时重算一份
+    assert last["peak"] == 10 + 10 + 10 + 1000 + 400
+    assert last["recompute_time"] == 400
+    assert last["step_time"] == plan["base_step_time"] + 400
+
+
+def test_budget_selects_the_cheapest_point_that_fits():
+    graph_data, tree_data = _two_block_capture()
+    assert plan_checkpoints(graph_data, tree_data, budget=5000)["selected"]["modules"] == []
+    assert len(plan_checkpoints(graph_data, tree_data, budget=1500)["selected"]["modules"]) == 2
+    assert plan_checkpoints(graph_data, tree_data, budget=1000)["selected"] is None
@@ -0,0 +1,59 @@
+import gzip
+import json
+
+from core.chrome_trace import export_chrome_trace
+from tests.synthetic import op, tensor, tree_from_graph
+
+
+def _write_capture(capture_dir):
+    """
+    op1产生的tensor 1在300ns被op2读取后释放，之后op3的输出复用了id 1，由op4读取；参数w在采集开始前已申请
+    """
+    w = tensor(9, 1000, category="parameter")
+    first, second = tensor(1, 512, 50, 300), tensor(1, 512, 450, 700)
+    graph_data = [
+        op(1, "aten::linear", 0, 100, [w], [first]),
+        op(2, "aten::relu", 200, 300, [first], []),
+        op(3, "aten::linear", 400, 500, [w], [second]),
+        op(4, "aten::relu", 600, 700, [second], []),
+    ]
+    tree_data = tree_from_graph(graph_data, {10: {"name": "Net_0", "children": [1, 2, 3, 4]}})
+    for name, data in (("graph", graph_data), ("tree", tree_data)):
+        with open(capture_dir / f"{name}.json", "w") as f:
+            json.dump(data, f)
+
+
+def _export(tmp_path, name="trace.json"):
+    _write_capture(tmp_path)
+    out = tmp_path / name
+    count = export_chrome_trace(str(tmp_path), str(out))
+    opener = gzip.open if name.endswith(".gz") else open
+    with opener(out, "rt") as f:
+        events = json.load(f)["traceEvents"]
+    assert count == len(events)
+    return events
+
+
+def test_slices(tmp_path):
+    events = _export(tmp_path)
+    ops = [(e["name"], e["ts"], e["dur"]) for e in events if e.get("cat") == "op"]
+    assert ops == [("aten::linear", 0, 0.1), ("aten::relu", 0.2, 0.1), ("aten::linear", 0.4, 0.1), ("aten::relu", 0.6, 0.1)]
+    modules = [(e["name"], e["ts"], e["dur"]) for e in events if e.get("cat") == "module"]
+    assert modules == [("nn.Module: Net_0", 0, 0.7)]
+    assert [e["name"] for e in events if e.get("cat") == "scope"] == ["[forward]"]
+
+
+def test_flows_follow_reused_tensor_ids(tmp_path):
+    events = _export(tmp_path)
+    starts = {e["id"]: e["ts"] for e in events if e["ph"] == "s"}
+    finishes = {e["id"]: e["ts"] for e in events if e["ph"] == "f"}
+    # op4读取的是op3的输出，不能连到已释放的op1的输出
+    assert sorted((starts[i], finishes[i]) for i in starts) == [(0.099, 0.2), (0.499, 0.6)]
+
+
+def test_memory_counters(tmp_path):
+    events = _export(tmp_path, "trace.json.gz")
+    counters = [(e["ts"], e["args"]) for e in events if e["ph"] == "C"]
+    assert [ts for ts, _ in counters] == [0, 0.05, 0.3, 0.45, 0.7]
+    assert all(args["parameter"] == 1000 for _, args in counters)
+    assert [args.get("activation", 0) for _, args in counters] == [0, 512, 0, 512, 0]
@@ -0,0 +1,41 @@
+from core.concurrency import analyze_concurrency
+from tests.synthetic import op, tensor
+
+
+def _two_threads():
+    """
+    线程1：op1(0-100)、op2(100-200)、op6(400-500)；线程2：op3(50-150)与线程1并行，
+    op4(250-300)读取op1的输出但线程2在op1结束后才空闲，op5(520-600)在线程2空闲(300起)时等待op6的输出
+    """
+    t1, t6 = tensor(1, 512, 50, 300), tensor(6, 512, 450, 600)
+    return [
+        op(1, "aten::mm", 0, 100, [], [t1], thread=1),
+        op(2, "aten::relu", 100, 200, [], [tensor(2, 512, 150, -1)], thread=1),
+        op(3, "aten::mm", 50, 150, [], [tensor(3, 512, 100, -1)], thread=2),
+        op(4, "aten::add", 250, 300, [t1], [tensor(4, 512, 280, -1)], thread=2),
+        op(6, "aten::mm", 400, 500, [], [t6], thread=1),
+        op(5, "aten::add", 520, 600, [t6], [tensor(5, 512, 550, -1)], thread=2),
+    ]
+
+
+def test_lanes_and_parallel_windows():
+    report = analyze_concurrency(_two_threads())
+    assert [(lane["thread"], lane["ops"], lane["busy"]) for lane in report["lanes"]] == [(1, 3, 300), (2, 3, 230)]
+    assert report["active_threads"] == [{"threads": 1, "time": 330}, {"threads": 2, "time": 100}]
+    assert report["windows"] == [{"start_time": 50, "end_time": 150, "duration": 100, "threads": [1, 2]}]
+
+
+def test_cross_thread_wait():
+    report = analyze_concurrency(_two_threads())
+    # op4不算等待：线程2在op1结束之后才空闲
+    assert [(w["op"], w["waited_for_op"], w["wait_time"], w["handoff_latency"]) for w in report["waits"]] == [(5, 6, 220, 20)]
+    pair = report["pairs"][0]
+    assert pair["threads"] == [1, 2]
+    assert (pair["overlap"], pair["dependencies"], pair["waits"], pair["wait_time"]) == (100, 2, 1, 220)
+
+
+def test_without_thread_field():
+    graph_data = [op(1, "aten::mm", 0, 100), op(2, "aten::relu", 200, 300)]
+    report = analyze_concurrency(graph_data)
+    assert [(lane["thread"], lane["busy"]) for lane in report["lanes"]] == [(None, 200)]
+    assert report["pairs"] == [] and report["windows"] == [] and report["waits"] == []
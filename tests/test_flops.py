@@ -0,0 +1,46 @@
+from core.flops import estimate_capture, estimate_op_flops
+from tests.synthetic import op, tensor, tree_from_graph
+
+
+def _t(id: int, shape: str) -> dict:
+    dims = [int(d) for d in shape.strip("[]").split(",")]
+    size = 4
+    for d in dims:
+        size *= d
+    return tensor(id, size, shape=shape)
+
+
+def test_linear_with_unflattened_input():
+    # x在view之前的shape为[10,1,28,28]，按元素数与[10,784]匹配
+    linear = op(1, "aten::linear", 0, 10, [_t(1, "[10,1,28,28]"), _t(2, "[128,784]"), _t(3, "[128]")], [_t(4, "[10,128]")])
+    assert estimate_op_flops(linear) == (2 * 10 * 784 * 128, "formula")
+
+
+def test_addmm_backward_does_not_depend_on_input_order():
+    # 第一层的AddmmBackward0只计算权重梯度，输出梯度在输入中的位置与第二层不同
+    first = op(1, "AddmmBackward0", 0, 10, [_t(1, "[10,1,28,28]"), _t(2, "[10,128]")], [_t(3, "[784,128]")])
+    assert estimate_op_flops(first) == (2007040, "formula")
+    reordered = op(1, "AddmmBackward0", 0, 10, [_t(2, "[10,128]"), _t(1, "[10,1,28,28]")], [_t(3, "[784,128]")])
+    assert estimate_op_flops(reordered) == (2007040, "formula")
+    # 输入梯度和权重梯度各一次
+    second = op(2, "AddmmBackward0", 0, 10, [_t(4, "[10,128]"), _t(5, "[10,128]"), _t(6, "[10,10]")],
+                [_t(7, "[10,128]"), _t(8, "[128,10]")])
+    assert estimate_op_flops(second) == (2 * 2 * 10 * 10 * 128, "formula")
+
+
+def test_profiler_flops_take_precedence():
+    assert estimate_op_flops(op(1, "aten::linear", 0, 10, flops=123)) == (123, "profiler")
+
+
+def test_unresolved_ops_are_reported():
+    graph_data = [
+        op(1, "aten::mm", 0, 10, [_t(1, "[3,5]"), _t(2, "[7,11]")], [_t(3, "[3,13]")]),
+        op(2, "aten::unknown_op", 10, 20, [_t(3, "[3,13]")], [_t(4, "[3,13]")]),
+        op(3, "aten::mm", 20, 30, [_t(5, "[3,5]"), _t(6, "[5,7]")], [_t(7, "[3,7]")]),
+    ]
+    report = estimate_capture(graph_data, tree_from_graph(graph_data, {10: {"name": "Net_0", "children": [1, 2, 3]}}))
+    assert report["ops"][0]["flops_source"] == "unresolved"
+    assert report["summary"]["unresolved"] == {"aten::mm": 1}
+    assert report["summary"]["unestimated"] == {"aten::unknown_op": 1}
+    assert report["summary"]["flops"] == 2 * 3 * 5 * 7
+    assert report["modules"][0]["unestimated_ops"] == 2
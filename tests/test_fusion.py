@@ -0,0 +1,57 @@
+from core.fusion import find_fusion_groups
+from tests.synthetic import op, tensor, tree_from_graph
+
+
+def _t(id: int, start_time: int) -> dict:
+    return tensor(id, 4096, start_time, 10000, "[8,128]")
+
+
+def _capture(extra_consumer: bool = False, saved_for_backward: bool = False):
+    """
+    Mlp_0中：linear -> add -> gelu -> dropout -> linear，extra_consumer时gelu的输出还被另一个op使用，
+    saved_for_backward时gelu的输出被反向使用
+    """
+    x, w = _t(1, -1), tensor(2, 65536, shape="[128,128]", category="parameter")
+    h, b, g, d, y = _t(3, 10), _t(4, 30), _t(5, 50), _t(6, 70), _t(7, 90)
+    graph_data = [
+        op(11, "aten::linear", 0, 20, [x, w], [h]),
+        op(12, "aten::add", 20, 40, [h], [b]),
+        op(13, "aten::gelu", 40, 60, [b], [g]),
+        op(14, "aten::dropout", 60, 80, [g], [d]),
+        op(15, "aten::linear", 80, 100, [d, w], [y]),
+    ]
+    if extra_consumer:
+        graph_data.append(op(16, "aten::sum", 100, 110, [g], [_t(8, 105)]))
+    if saved_for_backward:
+        graph_data.append(op(21, "GeluBackward0", 200, 220, [g], [_t(9, 210)], scope="backward"))
+    modules = {1: {"name": "Mlp_0", "children": [op["id"] for op in graph_data if op.get("scope") is None]}}
+    return graph_data, tree_from_graph(graph_data, modules)
+
+
+def test_elementwise_chain_is_one_group():
+    report = find_fusion_groups(*_capture())
+    assert len(report["groups"]) == 1
+    group = report["groups"][0]
+    assert group["names"] == ["aten::add", "aten::gelu", "aten::dropout"]
+    assert group["module"] == "[forward]/nn.Module: Mlp_0#0"
+    # add和gelu的输出只在组内使用，各省一次写和一次读
+    assert group["saved_allocations"] == 2
+    assert group["saved_traffic"] == 2 * 2 * 4096
+    assert 0 < group["estimated_time_saved"] <= group["op_time"]
+    assert report["modules"][0]["groups"] == [0]
+
+
+def test_tensor_with_two_consumers_splits_the_chain():
+    groups = find_fusion_groups(*_capture(extra_consumer=True))["groups"]
+    assert [g["names"] for g in groups] == [["aten::add", "aten::gelu"]]
+
+
+def test_tensor_saved_for_backward_is_not_an_intermediate():
+    groups = find_fusion_groups(*_capture(saved_for_backward=True))["groups"]
+    # gelu的输出被反向使用，不能省掉；反向op不与前向的op连在一起
+    assert [g["names"] for g in groups] == [["aten::add", "aten::gelu"]]
+    assert groups[0]["saved_allocations"] == 1
+
+
+def test_min_ops():
+    assert find_fusion_groups(*_capture(), min_ops=4)["groups"] == []
@@ -0,0 +1,54 @@
+from core.memory_category import analyze_memory_categories, collect_categorized_tensors
+from tests.synthetic import op, tensor, tree_from_graph
+
+
+def _capture():
+    """
+    Net_0下Linear_0产生激活a（op1输出时未归类，op2读取时归为activation），Linear_1产生梯度g和一个cpu上的tensor，
+    参数w在采集开始前已申请
+    """
+    w = tensor(9, 1000, category="parameter")
+    graph_data = [
+        op(1, "aten::linear", 0, 100, [w], [tensor(1, 512, 50, 400, category="unknown")]),
+        op(2, "aten::mm", 200, 300, [tensor(1, 512, 50, 400, version=1)],
+           [tensor(2, 2048, 250, 350, category="gradient"), tensor(3, 100, 260, -1, device="cpu")]),
+    ]
+    modules = {
+        10: {"name": "Net_0", "children": [11, 12]},
+        11: {"name": "Linear_0", "children": [1]},
+        12: {"name": "Linear_1", "children": [2]},
+    }
+    return graph_data, tree_from_graph(graph_data, modules)
+
+
+def test_collect_fills_unknown_category():
+    tensors = collect_categorized_tensors(_capture()[0], "cuda:0")
+    assert {key: t["category"] for key, t in tensors.items()} == {
+        "9_cuda:0": "parameter", "1_cuda:0": "activation", "2_cuda:0": "gradient"}
+
+
+def test_category_curves():
+    report = analyze_memory_categories(*_capture(), device="cuda:0")
+    assert report["categories"] == ["activation", "gradient", "parameter"]
+    assert report["times"] == [50, 250, 350, 400]
+    assert report["live"] == {"activation": [512, 512, 512, 0], "gradient": [0, 2048, 0, 0], "parameter": [1000] * 4}
+    assert report["base"] == {"activation": 0, "gradient": 0, "parameter": 1000}
+    assert (report["total_peak"], report["total_peak_time"]) == (3560, 250)
+    assert report["at_total_peak"] == {"activation": 512, "gradient": 2048, "parameter": 1000}
+
+
+def test_module_peaks_and_produced():
+    modules = {r["name"]: r for r in analyze_memory_categories(*_capture(), device="cuda:0")["modules"]}
+    assert modules["nn.Module: Linear_0"]["peak_live"] == 1512
+    assert modules["nn.Module: Linear_0"]["peak_live_by_category"] == {"activation": 512, "parameter": 1000}
+    assert modules["nn.Module: Linear_0"]["produced_by_category"] == {"activation": 512}
+    assert modules["nn.Module: Linear_1"]["peak_live"] == 3560
+    assert modules["nn.Module: Linear_1"]["produced_by_category"] == {"gradient": 2048}
+    # 父module汇总子module产生的tensor
+    assert modules["nn.Module: Net_0"]["produced_by_category"] == {"activation": 512, "gradient": 2048}
+
+
+def test_all_devices():
+    report = analyze_memory_categories(*_capture())
+    assert (report["total_peak"], report["total_peak_time"]) == (3660, 260)
+    assert report["at_total_peak"]["activation"] == 612
@@ -0,0 +1,68 @@
+import itertools
+import random
+
+import pytest
+
+from core.pipeline import partition_stages
+
+
+def _brute_force(times, memory, cut_bytes, parts, memory_limit=None):
+    best = None
+    for cuts in itertools.combinations(range(1, len(times)), parts - 1):
+        bounds = [0, *cuts, len(times)]
+        spans = [range(bounds[s], bounds[s + 1]) for s in range(parts)]
+        if memory_limit is not None and any(sum(memory[i] for i in span) > memory_limit for span in spans):
+            continue
+        cost = (max(sum(times[i] for i in span) for span in spans), sum(cut_bytes[c - 1] for c in cuts))
+        if best is None or cost < best[0]:
+            best = (cost, [0, *cuts])
+    return best
+
+
+def _cost(times, cut_bytes, starts):
+    bounds = starts + [len(times)]
+    return max(sum(times[bounds[s]:bounds[s + 1]]) for s in range(len(starts))), sum(cut_bytes[c - 1] for c in starts[1:])
+
+
+def test_balances_the_slowest_stage():
+    assert partition_stages([4, 1, 1, 4], [0] * 4, [0] * 4, 2) == [0, 2]
+    assert partition_stages([2, 1, 1, 2], [0] * 4, [0] * 4, 3) in ([0, 1, 3], [0, 2, 3])
+
+
+def test_ties_prefer_smaller_activations_at_the_cuts():
+    # 切在单元0或单元1之后最慢stage的耗时相同，单元1之后传递的激活更少
+    assert partition_stages([1, 0, 1], [0] * 3, [5, 1, 0], 2) == [0, 2]
+
+
+def test_matches_brute_force():
+    rng = random.Random(0)
+    for _ in range(200):
+        n = rng.randint(2, 8)
+        parts = rng.randint(1, n)
+        times = [rng.randint(0, 20) for _ in range(n)]
+        memory = [rng.randint(0, 10) for _ in range(n)]
+        cut_bytes = [rng.randint(0, 10) for _ in range(n)]
+        limit = rng.choice([None, 15, 25])
+        expected = _brute_force(times, memory, cut_bytes, parts, limit)
+        if expected is None:
+            with pytest.raises(ValueError):
+                partition_stages(times, memory, cut_bytes, parts, limit)
+            continue
+        starts = partition_stages(times, memory, cut_bytes, parts, limit)
+        assert _cost(times, cut_bytes, starts) == expected[0]
+
+
+def test_memory_limit_moves_the_split():
+    # 不限内存时切在中间，单元0、1的内存之和超过限制后只能切在单元0之后
+    assert partition_stages([3, 3, 3, 3], [5, 5, 1, 1], [0] * 4, 2) == [0, 2]
+    assert partition_stages([3, 3, 3, 3], [5, 5, 1, 1], [0] * 4, 2, memory_limit=7) == [0, 1]
+
+
+def test_infeasible_memory_limit_raises():
+    with pytest.raises(ValueError, match="memory limit"):
+        partition_stages([1, 1, 1], [10, 10, 10], [0] * 3, 2, memory_limit=15)
+
+
+def test_more_stages_than_units_raises():
+    with pytest.raises(ValueError, match="cannot split"):
+        partition_stages([1, 1], [0, 0], [0, 0], 3)
@@ -0,0 +1,63 @@
+from core.transfer import find_transfers, transfer_direction
+from tests.synthetic import op, tensor, tree_from_graph
+
+
+def _t(id: int, device: str, start_time: int) -> dict:
+    return tensor(id, 4096, start_time, 10000, "[8,128]", device=device)
+
+
+def _capture():
+    """
+    pin_memory后non_blocking拷贝到GPU，拷贝结束到第一次使用之间有一个op在执行；
+    可分页内存上的tensor阻塞拷贝；结果拷贝回主机
+    """
+    pinned_src, pageable_src = _t(1, "cpu", 10), _t(2, "cpu", 30)
+    pinned_dst, pageable_dst = _t(3, "cuda:0", 110), _t(4, "cuda:0", 310)
+    y, host = _t(5, "cuda:0", 510), _t(6, "cpu", 710)
+    graph_data = [
+        op(1, "aten::pin_memory", 0, 20, [_t(7, "cpu", -1)], [pinned_src]),
+        op(2, "aten::rand", 20, 40, [], [pageable_src]),
+        op(3, "aten::to", 100, 200, [pinned_src], [pinned_dst], non_blocking=True),
+        op(4, "aten::relu", 210, 260, [_t(8, "cuda:0", -1)], [_t(9, "cuda:0", 220)]),
+        op(5, "aten::to", 300, 400, [pageable_src], [pageable_dst], non_blocking=False),
+        op(6, "aten::add", 500, 600, [pinned_dst, pageable_dst], [y]),
+        op(7, "aten::to", 700, 800, [y], [host]),
+    ]
+    return graph_data, tree_from_graph(graph_data, {1: {"name": "Net_0", "children": [6]}})
+
+
+def test_direction():
+    assert transfer_direction("cpu", "cuda:0") == "H2D"
+    assert transfer_direction("cuda:0", "cpu") == "D2H"
+    assert transfer_direction("cuda:0", "cuda:1") == "D2D"
+
+
+def test_copies_are_classified():
+    report = find_transfers(*_capture())
+    transfers = {t["op"]: t for t in report["transfers"]}
+    assert sorted(transfers) == [3, 5, 7]
+
+    assert transfers[3]["direction"] == "H2D"
+    assert transfers[3]["memory"] == "pinned"
+    assert transfers[3]["bytes"] == 4096
+    assert transfers[3]["bandwidth"] == 4096 / 100
+    # 拷贝结束(200)到第一次使用(500)之间执行了relu(210-260)，另一次拷贝不算计算
+    assert transfers[3]["first_use"] == 500
+    assert transfers[3]["overlapped_ops"] == 1 and transfers[3]["overlapped_time"] == 50
+    assert transfers[3]["overlaps_compute"]
+
+    assert transfers[5]["memory"] == "pageable"
+    # 阻塞拷贝返回时已完成，不算与计算重叠
+    assert not transfers[5]["overlaps_compute"]
+
+    assert transfers[7]["direction"] == "D2H"
+    assert transfers[7]["memory"] == "unknown"
+
+
+def test_summaries():
+    report = find_transfers(*_capture())
+    directions = {d["direction"]: d for d in report["directions"]}
+    assert directions["H2D"]["count"] == 2
+    assert directions["H2D"]["pinned"] == 1 and directions["H2D"]["pageable"] == 1
+    assert directions["D2H"]["count"] == 1
+    assert {m["module"] for m in report["modules"]} == {"[forward]"}
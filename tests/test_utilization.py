@@ -0,0 +1,57 @@
+from core.utilization import analyze_utilization, merge_intervals, phase_segments
+from tests.synthetic import op, tensor, tree_from_graph
+
+
+def _capture():
+    """
+    前向Net_0中两个op之间空闲50ns，前向到反向空闲150ns，反向到参数更新空闲50ns，参数更新到下一步前向空闲400ns
+    """
+    graph_data = [
+        op(1, "aten::linear", 0, 100, [], [tensor(1, 512, 50, -1)]),
+        op(2, "aten::relu", 150, 250, [], [tensor(2, 512, 200, -1)]),
+        op(3, "ReluBackward0", 400, 500, [], [tensor(3, 512, 450, -1)], scope="backward"),
+        op(4, "aten::add_", 550, 600, [], [tensor(4, 512, 560, -1)], scope="postprocess"),
+        op(5, "aten::linear", 1000, 1100, [], [tensor(5, 512, 1050, -1)]),
+    ]
+    return graph_data, tree_from_graph(graph_data, {10: {"name": "Net_0", "children": [1, 2]}})
+
+
+def test_merge_intervals():
+    assert merge_intervals([(5, 8), (0, 2), (1, 3), (8, 9)]) == [(0, 3), (5, 9)]
+
+
+def test_phase_segments():
+    phases = [(s["phase"], s["start_time"], s["end_time"]) for s in phase_segments(*_capture())]
+    assert phases == [
+        ("forward", 0, 250), ("forward->backward", 250, 400), ("backward", 400, 500),
+        ("backward->postprocess", 500, 550), ("postprocess", 550, 600), ("data_loading", 600, 1000), ("forward", 1000, 1100),
+    ]
+
+
+def test_gaps_are_attributed():
+    report = analyze_utilization(*_capture())
+    gaps = [(g["duration"], g["phase"], g["module"]) for g in report["gaps"]]
+    assert gaps == [
+        (400, "data_loading", ""),
+        (150, "forward->backward", ""),
+        (50, "forward", "[forward]/nn.Module: Net_0#0"),
+        (50, "backward->postprocess", ""),
+    ]
+    assert [g["duration"] for g in analyze_utilization(*_capture(), min_gap=100)["gaps"]] == [400, 150]
+
+
+def test_utilization_per_device_and_phase():
+    report = analyze_utilization(*_capture())
+    device = report["devices"][0]
+    assert device["device"] == "cuda:0"
+    assert device["busy"] == 450 and device["idle"] == 650
+    assert device["longest_gap"] == 400
+    phases = {p["phase"]: p for p in report["phases"]}
+    # 前向两段共350ns，其中300ns有op执行
+    assert phases["forward"]["duration"] == 350
+    assert phases["forward"]["utilization"]["cuda:0"] == 300 / 350
+    assert phases["data_loading"]["utilization"]["cuda:0"] == 0.0
+
+
+def test_empty_capture():
+    assert analyze_utilization([], [])["devices"] == []
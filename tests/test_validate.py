@@ -0,0 +1,96 @@
+import copy
+
+import pytest
+
+from core.validate import content_hash, read_complex_json, stamp_complex_json, validate_complex_graph, validate_tree
+from tests.synthetic import tree_node
+
+
+def complex_node(id, is_tensor, next_nodes=(), parent=None, children=()):
+    return {"id": id, "isTensor": is_tensor, "isLeaf": not children, "label": f"node {id}", "parent": parent,
+            "children": list(children), "nextNodes": list(next_nodes)}
+
+
+def _complex_graph():
+    # Linear_0(0)中op 1 -> tensor 2 -> op 3 -> tensor 4
+    return [
+        complex_node(0, False, parent=None, children=[1, 2, 3]),
+        complex_node(1, False, [2], parent=0),
+        complex_node(2, True, [3], parent=0),
+        complex_node(3, False, [4], parent=0),
+        complex_node(4, True),
+    ]
+
+
+def _rules(issues):
+    return sorted((issue["node"], issue["rule"]) for issue in issues)
+
+
+def test_legal_complex_graph():
+    assert validate_complex_graph(_complex_graph()) == []
+
+
+def test_cycle_is_reported():
+    nodes = _complex_graph()
+    # tensor 4 -> op 1 构成环，op 3的另一个输出tensor 5在环的下游但不在环上
+    nodes[4]["nextNodes"] = [1]
+    nodes[3]["nextNodes"].append(5)
+    nodes.append(complex_node(5, True))
+    assert _rules(validate_complex_graph(nodes)) == [
+        (node_id, "graph should be acyclic, node is on a cycle") for node_id in (1, 2, 3, 4)]
+
+
+def test_complex_graph_rules():
+    nodes = _complex_graph()
+    nodes[0]["nextNodes"] = [4]
+    nodes[1]["nextNodes"] = [2, 3, 9]
+    assert _rules(validate_complex_graph(nodes)) == [
+        (0, "subgraph should not have next nodes"),
+        (1, "next node 9 not found"),
+        (1, "op node's output should be tensor, tensor should be input of op node"),
+        (4, "tensor only has one producer"),
+    ]
+
+
+def test_validate_tree():
+    tree_data = [
+        tree_node(1, "nn.Module: Net_0", 0, 100, children=[2, 3]),
+        tree_node(2, "aten::linear", 0, 50, parent=1),
+        tree_node(3, "AddmmBackward0", 50, 100, parent=7, scope="backward"),
+        tree_node(4, "nn.Module: ReLU_0", 100, 200),
+    ]
+    assert _rules(validate_tree(tree_data)) == [
+        (3, "parent should be 1"),
+        (4, "non leaf node should have children"),
+    ]
+    tree_data[2]["parent"] = 1
+    assert _rules(validate_tree(tree_data[:3])) == [(3, "ancestors of backward node should be backward")]
+
+
+def test_stamp_and_read():
+    nodes = _complex_graph()
+    stamped = stamp_complex_json(nodes)
+    assert read_complex_json(stamped) == (nodes, True)
+    assert read_complex_json(nodes) == (nodes, False)
+
+    # 修改校验读取的字段后标记不再可信，只改label不影响
+    tampered = copy.deepcopy(stamped)
+    tampered["nodes"][4]["nextNodes"] = [1]
+    assert read_complex_json(tampered)[1] is False
+    relabeled = copy.deepcopy(stamped)
+    relabeled["nodes"][1]["label"] = "aten::relu"
+    assert read_complex_json(relabeled)[1] is True
+    outdated = dict(stamped, validation_version=1)
+    assert read_complex_json(outdated)[1] is False
+
+
+def test_stamp_rejects_illegal_graph():
+    nodes = _complex_graph()
+    nodes[4]["nextNodes"] = [1]
+    with pytest.raises(ValueError, match="acyclic"):
+        stamp_complex_json(nodes)
+
+
+def test_content_hash_ignores_order():
+    nodes = _complex_graph()
+    assert content_hash(nodes) == content_hash(list(reversed(nodes)))
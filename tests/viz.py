@@ -2,8 +2,11 @@ from typing import Optional, Dict, List, Tuple, Set
 from collections import defaultdict, deque
 import json
 import copy
+from pathlib import Path
 from graphviz import Source
 
+from core.validate import read_complex_json
+
 class Node:
     id: int
     isTensor: bool
@@ -365,21 +368,26 @@ class Graph:
 def get_graph_from_file(path: str):
     graph = Graph()
     with open(path, 'r') as graph_json_file:
-        nodes_json = json.load(graph_json_file)
+        # 兼容列表、带校验标记和去重三种格式
+        nodes_json, _ = read_complex_json(json.load(graph_json_file))
 
     for node in nodes_json:
         graph.nodes[node["id"]] = Node(node)
     return graph
 
 
+# 从仓库根目录运行：python -m tests.viz
+tests_dir = Path(__file__).resolve().parent
+
+
 def draw(graph: Graph, id) -> None:
     svg_content = graph.generate_svg()
-    with open(f'./sample_{id}.svg', "w", encoding="utf-8") as svg_file:
+    with open(tests_dir / f'sample_{id}.svg', "w", encoding="utf-8") as svg_file:
         svg_file.write(svg_content)
-        print(f"Generated ./sample_{id}.svg")
+        print(f"Generated {tests_dir / f'sample_{id}.svg'}")
 
 
-origin_graph = get_graph_from_file("../data/DNN/complex_graph.json")
+origin_graph = get_graph_from_file(str(tests_dir.parent / "data/DNN/complex_graph.json"))
 
 draw(origin_graph.click(-1), 0)
 draw(origin_graph.click(1), 1)